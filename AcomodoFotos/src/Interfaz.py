@@ -1,9 +1,17 @@
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
 import webbrowser
-import os
 import logging
-import organizador
+import queue
+import threading
+import time
+import registro
+from transferencia import TRANSFER_MODES
+
+# Cada cuánto (ms) la interfaz vacía la cola de eventos del organizador y se redibuja
+REFRESH_MS = 100
+# organizador y sus dependencias pesadas se cargan en segundo plano tras mostrar la ventana
+PRELOAD_DELAY_MS = 200
 
 # Diccionario que agrupa todos los textos de la interfaz por idioma
 LANG_DICT = {
@@ -14,7 +22,13 @@ LANG_DICT = {
         "photos_label": "Photos folder:",
         "destination_label": "Destination folder:",
         "select_button": "Select",
+        "transfer_label": "Transfer mode:",
+        "transfer_modes": ["Copy", "Move", "Hard link", "Reflink (clone)", "Fast copy"],
         "start_button": "Start organization",
+        "cancel_button": "Cancel",
+        "cancelling_text": "Cancelling...",
+        "scanning_text": "Scanning the photos folder...",
+        "stats_text": "{done}/{total} files · {files_s:.1f} files/s · {mb_s:.1f} MB/s · ETA {eta}",
         "help_button": "Documentation",
         "error_no_data_title": "Error",
         "error_no_data_text": "All fields are required.",
@@ -22,6 +36,8 @@ LANG_DICT = {
         "error_text": "An error occurred",
         "success_title": "Success",
         "success_text": "Organization completed",
+        "cancelled_title": "Cancelled",
+        "cancelled_text": "Organization cancelled",
     },
     "Español": {
         "title": "Organizador de Fotos",
@@ -30,7 +46,13 @@ LANG_DICT = {
         "photos_label": "Carpeta de fotos:",
         "destination_label": "Carpeta de destino:",
         "select_button": "Seleccionar",
+        "transfer_label": "Modo de transferencia:",
+        "transfer_modes": ["Copiar", "Mover", "Enlace duro", "Reflink (clonar)", "Copia rápida"],
         "start_button": "Iniciar organización",
+        "cancel_button": "Cancelar",
+        "cancelling_text": "Cancelando...",
+        "scanning_text": "Recorriendo la carpeta de fotos...",
+        "stats_text": "{done}/{total} archivos · {files_s:.1f} archivos/s · {mb_s:.1f} MB/s · Restante {eta}",
         "help_button": "Documentacion",
         "error_no_data_title": "Error",
         "error_no_data_text": "Todos los campos son obligatorios.",
@@ -38,24 +60,33 @@ LANG_DICT = {
         "error_text": "Ha ocurrido un error",
         "success_title": "Éxito",
         "success_text": "Organización completada",
+        "cancelled_title": "Cancelado",
+        "cancelled_text": "Organización cancelada",
     }
 }
 
 
+def _preload():
+    import organizador
+    organizador.preload()
+
+
 class LabelLogHandler(logging.Handler):
     """
-    Handler personalizado que muestra SOLO el último mensaje
-    en un label (status_label). Cada log nuevo sobreescribe el anterior.
+    Handler personalizado que guarda SOLO el último mensaje para el label
+    (status_label). Puede llamarse desde cualquier hilo: no toca Tk, la
+    interfaz lee el mensaje en su siguiente refresco.
     """
-    def __init__(self, label):
+    def __init__(self):
         super().__init__()
-        self.label = label
+        self.last_message = None
 
     def emit(self, record):
-        msg = self.format(record)
-        # Actualizamos el label con el último mensaje
-        self.label.configure(text=msg)
-        self.label.update_idletasks()
+        self.last_message = self.format(record)
+
+    def pop_message(self):
+        msg, self.last_message = self.last_message, None
+        return msg
 
 
 class OrganizadorApp:
@@ -67,7 +98,7 @@ class OrganizadorApp:
         self.root = root
 
         # Ajustes de ventana
-        self.root.geometry("700x550")
+        self.root.geometry("700x600")
         self.root.resizable(True, True)
         ctk.set_appearance_mode("System")
         ctk.set_default_color_theme("blue")
@@ -77,6 +108,12 @@ class OrganizadorApp:
         self.lang_texts = LANG_DICT[self.selected_language]
         self.root.title(self.lang_texts["title"])
 
+        # Estado de la organización en curso (se ejecuta en un hilo aparte)
+        self.events = queue.Queue()
+        self.worker = None
+        self.organizer = None
+        self.cancel_requested = threading.Event()
+
         # Creamos la interfaz
         self.create_header()
         self.create_main_frame()
@@ -84,6 +121,9 @@ class OrganizadorApp:
         # Agregamos el handler de logging que actualizará el label
         self.attach_logger_to_label()
 
+        # El organizador se importa en segundo plano, con la ventana ya dibujada
+        self.root.after(PRELOAD_DELAY_MS, self.preload_organizer)
+
     def create_header(self):
         self.header_frame = ctk.CTkFrame(self.root, fg_color="transparent")
         self.header_frame.pack(fill="x", padx=10, pady=10)
@@ -184,6 +224,26 @@ class OrganizadorApp:
         )
         self.output_folder_button.pack(side="left", anchor="center", padx=5)
 
+        # Modo de transferencia (copiar, mover, enlace duro...)
+        self.transfer_frame = ctk.CTkFrame(self.main_frame, fg_color="transparent")
+        self.transfer_frame.pack(pady=(10, 0))
+
+        self.transfer_label = ctk.CTkLabel(
+            self.transfer_frame,
+            text=self.lang_texts["transfer_label"],
+            font=("aptos", 15, "bold")
+        )
+        self.transfer_label.pack(side="left", padx=(0, 5))
+
+        self.transfer_combobox = ctk.CTkComboBox(
+            self.transfer_frame,
+            values=self.lang_texts["transfer_modes"],
+            state="readonly",
+            width=180
+        )
+        self.transfer_combobox.set(self.lang_texts["transfer_modes"][0])
+        self.transfer_combobox.pack(side="left")
+
         # Botón iniciar organización
         self.start_button = ctk.CTkButton(
             self.main_frame,
@@ -195,7 +255,17 @@ class OrganizadorApp:
             text_color="black",
             font=("aptos", 15, "bold")
         )
-        self.start_button.pack(pady=20)
+        self.start_button.pack(pady=(20, 5))
+
+        # Botón cancelar (sólo activo mientras se organiza)
+        self.cancel_button = ctk.CTkButton(
+            self.main_frame,
+            text=self.lang_texts["cancel_button"],
+            command=self.cancel_organizing,
+            width=100,
+            state="disabled"
+        )
+        self.cancel_button.pack(pady=(0, 10))
 
         # Barra de progreso
         self.progress_bar = ctk.CTkProgressBar(
@@ -206,6 +276,10 @@ class OrganizadorApp:
         self.progress_bar.pack(pady=10)
         self.progress_bar.set(0)
 
+        # Archivos procesados, velocidad y tiempo restante
+        self.stats_label = ctk.CTkLabel(self.main_frame, text="", fg_color="transparent")
+        self.stats_label.pack()
+
         # Label para mostrar el ÚLTIMO mensaje de logging
         self.status_label = ctk.CTkLabel(
             self.main_frame,
@@ -217,18 +291,18 @@ class OrganizadorApp:
 
     def attach_logger_to_label(self):
         """
-        Crea un handler que captura los logs y muestra el último mensaje en self.status_label
-        en el nivel DEBUG (para ver todos).
+        Crea (una sola vez) un handler que captura los logs y muestra el último mensaje
+        en self.status_label. El nivel global lo decide el organizador (INFO por defecto).
         """
-        label_handler = LabelLogHandler(self.status_label)
-        label_handler.setLevel(logging.DEBUG)  # Mostrar todos los niveles en el label
+        label_handler = LabelLogHandler()
+        label_handler.setLevel(logging.INFO)
 
-        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s', '%d-%m-%Y %H:%M:%S')
+        formatter = logging.Formatter(registro.LOG_FORMAT, registro.LOG_DATEFMT)
         label_handler.setFormatter(formatter)
 
         logger = logging.getLogger()          # Root logger
-        logger.setLevel(logging.DEBUG)        # Nivel DEBUG global
         logger.addHandler(label_handler)
+        self.label_handler = label_handler
 
     def start_organizing(self):
         api_key = self.api_key_entry.get()
@@ -241,52 +315,162 @@ class OrganizadorApp:
                 self.lang_texts["error_no_data_text"]
             )
             return
+        if self.worker is not None:
+            return
 
+        import organizador
         # Actualizamos variables globales (opcional)
         organizador.OPENCAGE_API_KEY = api_key
         organizador.BASE_FOLDER = base_folder
         organizador.OUTPUT_FOLDER = output_folder
 
-        self.total_files = self.count_files(base_folder)
+        self.total_files = None
         self.processed_files = 0
-
-        if self.total_files == 0:
-            messagebox.showinfo("Info", "No hay archivos de foto o video en la carpeta origen.")
-            return
-
+        self.processed_bytes = 0
+        self.started_at = None
+        self.report_text = None
+        self.cancel_requested.clear()
         self.progress_bar.set(0)
+        self.stats_label.configure(text=self.lang_texts["scanning_text"])
+        self.start_button.configure(state="disabled")
+        self.cancel_button.configure(state="normal")
+
+        self.worker = threading.Thread(
+            target=self.run_organizer,
+            args=(api_key, base_folder, output_folder, self.selected_transfer_mode()),
+            name="organizador",
+            daemon=True
+        )
+        self.worker.start()
+        self.root.after(REFRESH_MS, self.refresh)
 
+    def run_organizer(self, api_key, base_folder, output_folder, transfer_mode):
+        """Hilo de trabajo: no toca Tk, sólo deja eventos en self.events."""
+        import organizador
         try:
-            organizador.main(
+            # Un solo recorrido de la carpeta: da el total del progreso y la lista de trabajo
+            entries = organizador.build_work_manifest(base_folder)
+            self.events.put(("total", len(entries)))
+            if not entries or self.cancel_requested.is_set():
+                self.events.put(("fin", None))
+                return
+
+            organizer = organizador.PhotoVideoOrganizer(
                 api_key,
                 base_folder,
                 output_folder,
-                progress_callback=self.file_processed_callback
+                progress_callback=self.file_processed_callback,
+                transfer_mode=transfer_mode
             )
+            self.organizer = organizer
+            if self.cancel_requested.is_set():
+                organizer.cancel()
+            try:
+                organizer.organize(entries)
+            finally:
+                organizer.close()
+            if organizer.last_report is not None:
+                self.events.put(("informe", organizador.format_report(organizer.last_report)))
+            self.events.put(("fin", None))
+        except Exception as e:
+            self.events.put(("fin", e))
+
+    def cancel_organizing(self):
+        self.cancel_requested.set()
+        if self.organizer is not None:
+            self.organizer.cancel()
+        self.cancel_button.configure(state="disabled")
+        self.stats_label.configure(text=self.lang_texts["cancelling_text"])
+
+    def selected_transfer_mode(self):
+        indice = self.lang_texts["transfer_modes"].index(self.transfer_combobox.get())
+        return TRANSFER_MODES[indice]
+
+    def file_processed_callback(self, size):
+        # Se llama desde el hilo de trabajo: sólo encola, la interfaz agrupa en refresh()
+        self.events.put(("archivo", size))
+
+    def refresh(self):
+        """
+        Vacía la cola de eventos y redibuja una sola vez por refresco, sin importar
+        cuántos archivos se hayan terminado desde el anterior.
+        """
+        fin = False
+        error = None
+        while True:
+            try:
+                tipo, valor = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "archivo":
+                self.processed_files += 1
+                self.processed_bytes += valor
+            elif tipo == "total":
+                self.total_files = valor
+                self.started_at = time.monotonic()
+            elif tipo == "informe":
+                self.report_text = valor
+            elif tipo == "fin":
+                fin, error = True, valor
+
+        msg = self.label_handler.pop_message()
+        if msg is not None:
+            self.status_label.configure(text=msg)
+        if self.total_files:
+            self.progress_bar.set(self.processed_files / self.total_files)
+            if not self.cancel_requested.is_set():
+                self.stats_label.configure(text=self.format_stats())
+
+        if fin:
+            self.finish_organizing(error)
+        else:
+            self.root.after(REFRESH_MS, self.refresh)
+
+    def format_stats(self):
+        transcurrido = max(time.monotonic() - self.started_at, 1e-6)
+        files_s = self.processed_files / transcurrido
+        restantes = self.total_files - self.processed_files
+        if files_s > 0:
+            eta = time.strftime("%H:%M:%S", time.gmtime(restantes / files_s))
+        else:
+            eta = "--:--:--"
+        return self.lang_texts["stats_text"].format(
+            done=self.processed_files,
+            total=self.total_files,
+            files_s=files_s,
+            mb_s=self.processed_bytes / 1048576 / transcurrido,
+            eta=eta
+        )
+
+    def finish_organizing(self, error):
+        self.worker.join()
+        self.worker = None
+        self.organizer = None
+        self.start_button.configure(state="normal")
+        self.cancel_button.configure(state="disabled")
+
+        import organizador
+        if isinstance(error, organizador.OrganizacionCancelada) or (
+                error is None and self.cancel_requested.is_set()):
+            self.stats_label.configure(text=self.lang_texts["cancelled_text"])
             messagebox.showinfo(
-                self.lang_texts["success_title"],
-                self.lang_texts["success_text"]
+                self.lang_texts["cancelled_title"],
+                self.lang_texts["cancelled_text"]
             )
-        except Exception as e:
+        elif error is not None:
             messagebox.showerror(
                 self.lang_texts["error_title"],
-                f'{self.lang_texts["error_text"]} {e}'
+                f'{self.lang_texts["error_text"]} {error}'
             )
-
-    def file_processed_callback(self):
-        self.processed_files += 1
-        fraction = self.processed_files / self.total_files
-        self.progress_bar.set(fraction)
-        self.root.update_idletasks()
-
-    def count_files(self, folder):
-        valid_extensions = ('.jpg', '.jpeg', '.png', '.mp4', '.mov', '.mkv', '.avi')
-        total = 0
-        for root, _, files in os.walk(folder):
-            for f in files:
-                if os.path.splitext(f)[1].lower() in valid_extensions:
-                    total += 1
-        return total
+        elif self.total_files == 0:
+            self.stats_label.configure(text="")
+            messagebox.showinfo("Info", "No hay archivos de foto o video en la carpeta origen.")
+        else:
+            # Resumen de métricas de la ejecución (tiempos por etapa, caché, bytes copiados)
+            texto = self.lang_texts["success_text"]
+            if self.report_text:
+                texto = f"{texto}\n\n{self.report_text}"
+            messagebox.showinfo(self.lang_texts["success_title"], texto)
 
     def select_base_folder(self):
         folder = filedialog.askdirectory()
@@ -307,6 +491,7 @@ class OrganizadorApp:
         webbrowser.open("https://github.com/Diegoflores1591/Organizador_De_Google_Fotos")
 
     def select_language(self, selected_language):
+        indice_transferencia = self.lang_texts["transfer_modes"].index(self.transfer_combobox.get())
         self.selected_language = selected_language
         self.lang_texts = LANG_DICT[self.selected_language]
 
@@ -317,9 +502,16 @@ class OrganizadorApp:
         self.base_folder_button.configure(text=self.lang_texts["select_button"])
         self.output_folder_label.configure(text=self.lang_texts["destination_label"])
         self.output_folder_button.configure(text=self.lang_texts["select_button"])
+        self.transfer_label.configure(text=self.lang_texts["transfer_label"])
+        self.transfer_combobox.configure(values=self.lang_texts["transfer_modes"])
+        self.transfer_combobox.set(self.lang_texts["transfer_modes"][indice_transferencia])
         self.start_button.configure(text=self.lang_texts["start_button"])
+        self.cancel_button.configure(text=self.lang_texts["cancel_button"])
         self.help_button.configure(text=self.lang_texts["help_button"])
 
+    def preload_organizer(self):
+        threading.Thread(target=_preload, name="precarga", daemon=True).start()
+
 
 if __name__ == "__main__":
     root = ctk.CTk()
@@ -0,0 +1,279 @@
+"""
+Mide cada etapa del organizador sobre un corpus sintético (corpus_sintetico.py)
+y escribe un JSON con segundos, archivos/s y MB/s por etapa, cuánto subió cada
+una el pico de memoria y el pico de toda la ejecución, para comparar ejecuciones
+antes y después de un cambio.
+
+    python benchmark.py --files 5000 --output resultados.json
+    python benchmark.py --corpus /tmp/corpus --video-scaling
+    python benchmark.py --startup
+
+--startup mide con "python -X importtime" lo que cuesta importar los puntos de
+entrada y termina con código 1 si alguno supera su presupuesto o carga alguna
+dependencia que debería importarse al primer uso.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import corpus_sintetico
+import organizador
+from escaner import build_work_manifest
+from geocodificacion import FakeGeocoder
+from indice_fechas import DateLocationIndex
+from metadatos import CountingReader, read_video_metadata
+from registro import setup_logging, shutdown_logging
+from transferencia import Transferer
+
+# Tamaños (MB) de los MP4 de la prueba de escalado: leer sus metadatos no debe depender del tamaño
+VIDEO_SCALING_MB = (1, 16, 256, 2048)
+# Presupuesto de importación (ms, mediana de STARTUP_RUNS procesos) de cada punto de entrada
+STARTUP_BUDGET_MS = {"organizador": 150, "Interfaz": 300}
+STARTUP_RUNS = 5
+# Paquetes que ningún punto de entrada debe cargar al importarse, salvo las excepciones
+# de STARTUP_ALLOWED (customtkinter importa PIL para sus imágenes)
+FORBIDDEN_AT_STARTUP = ("PIL", "numpy", "exifread", "opencage", "requests", "aiohttp")
+STARTUP_ALLOWED = {"Interfaz": ("PIL",)}
+
+
+def peak_rss_mb():
+    """Pico de memoria residente del proceso en MB (None si la plataforma no lo informa)."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo da en KB y macOS en bytes
+    return round(pico / (1048576 if sys.platform == "darwin" else 1024), 1)
+
+
+class _Etapa:
+    def __init__(self, resultados, nombre, files=0, bytes_=0):
+        self.resultados = resultados
+        self.nombre = nombre
+        self.files = files
+        self.bytes = bytes_
+
+    def __enter__(self):
+        self.pico_inicial = peak_rss_mb()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        segundos = time.perf_counter() - self.inicio
+        pico = peak_rss_mb()
+        self.resultados[self.nombre] = {
+            "seconds": round(segundos, 4),
+            "files": self.files,
+            "files_per_s": round(self.files / segundos, 1) if segundos else None,
+            "mb_per_s": round(self.bytes / 1048576 / segundos, 1) if segundos and self.bytes else None,
+            # ru_maxrss es del proceso y nunca baja: sólo se atribuye a la etapa lo que lo hizo subir
+            "peak_rss_increase_mb": round(pico - self.pico_inicial, 1) if pico is not None else None,
+        }
+        return False
+
+
+def run_stages(corpus, work_dir, workers=organizador.METADATA_WORKERS, transfer_mode="copy",
+               log_level="WARNING"):
+    etapas = {}
+    organizador.DATABASE_FILE = os.path.join(work_dir, "location_cache.db")
+    organizer = organizador.PhotoVideoOrganizer(
+        "", corpus, os.path.join(work_dir, "salida"),
+        geocoder=FakeGeocoder(latency=0), geocode_rate=None, transfer_mode=transfer_mode,
+        log_level=log_level
+    )
+    try:
+        with _Etapa(etapas, "scan") as etapa:
+            entries = build_work_manifest(corpus)
+            etapa.files = len(entries)
+        total_bytes = sum(e.size for e in entries)
+
+        with _Etapa(etapas, "metadata", len(entries)):
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                metadatos = list(pool.map(lambda e: organizer._get_final_metadata(e.path, e.sidecar), entries))
+        etapas["metadata"]["bytes_read"] = sum(s["bytes"] for s in organizer.read_stats.values())
+
+        coordenadas = sorted({coords for _, coords in metadatos if coords})
+        with _Etapa(etapas, "geocode", len(coordenadas)):
+            ubicaciones = {coords: organizer._get_city_state_name(*coords) for coords in coordenadas}
+        etapas["geocode"]["geocoder_calls"] = organizer.geocoder.calls
+        etapas["geocode"]["cache"] = organizer.location_cache.stats()
+
+        with _Etapa(etapas, "sin_ubicacion_merge", len(entries)):
+            indice = DateLocationIndex()
+            for entry, (date, coords) in zip(entries, metadatos):
+                if coords:
+                    indice.add(entry.path, date, ubicaciones[coords])
+            for date, coords in metadatos:
+                if not coords:
+                    indice.location_for(date)
+
+        copia = os.path.join(work_dir, "copia")
+        transferer = Transferer(transfer_mode)
+        with _Etapa(etapas, "copy", len(entries), total_bytes):
+            for i in range(0, len(entries), 1000):
+                os.makedirs(os.path.join(copia, str(i // 1000)), exist_ok=True)
+            with ThreadPoolExecutor(max_workers=organizador.COPY_WORKERS) as pool:
+                list(pool.map(
+                    lambda par: transferer.transfer(
+                        par[1].path, os.path.join(copia, str(par[0] // 1000), f"{par[0]}_{par[1].name}")
+                    ),
+                    enumerate(entries)
+                ))
+        shutil.rmtree(copia)
+
+        # Ejecución completa del pipeline, con una caché de ubicaciones vacía
+        organizer.close()
+        os.remove(organizador.DATABASE_FILE)
+        organizer = organizador.PhotoVideoOrganizer(
+            "", corpus, os.path.join(work_dir, "salida"),
+            geocoder=FakeGeocoder(latency=0), geocode_rate=None, transfer_mode=transfer_mode,
+            log_level=log_level
+        )
+        with _Etapa(etapas, "organize", len(entries), total_bytes):
+            organizer.organize(entries)
+        etapas["organize"]["duplicates"] = organizer.duplicate_files
+        etapas["organize"]["renamed"] = organizer.renamed_files
+    finally:
+        organizer.close()
+    return etapas
+
+
+def video_scaling(work_dir, sizes_mb=VIDEO_SCALING_MB):
+    """Bytes leídos y tiempo de read_video_metadata para MP4 (dispersos) de tamaño creciente."""
+    filas = []
+    fecha = datetime(2021, 6, 15, 18, 30)
+    for mb in sizes_mb:
+        path = os.path.join(work_dir, f"escala_{mb}mb.mp4")
+        corpus_sintetico.write_mp4(path, fecha, (40.4168, -3.7038), mb * 1048576)
+        inicio = time.perf_counter()
+        with open(path, "rb") as f:
+            lector = CountingReader(f)
+            date, coords = read_video_metadata(lector, os.fstat(f.fileno()).st_size)
+        filas.append({
+            "size_mb": mb,
+            "bytes_read": lector.bytes_read,
+            "ms": round((time.perf_counter() - inicio) * 1000, 3),
+            "found": date is not None and coords is not None,
+        })
+        os.remove(path)
+    leidos = {fila["bytes_read"] for fila in filas}
+    return {"files": filas, "constant_bytes_read": len(leidos) == 1}
+
+
+def import_time(modulo):
+    """
+    (milisegundos acumulados, paquetes cargados) al importar modulo en un proceso
+    nuevo, según "python -X importtime". None si el módulo no se puede importar.
+    """
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if proceso.returncode != 0:
+        return None
+    total = None
+    paquetes = set()
+    # "import time: self [us] | cumulative | imported package", sangrado según la profundidad
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if not acumulado.strip().isdigit():
+            continue
+        paquetes.add(nombre.strip().split(".")[0])
+        if nombre == f" {modulo}":
+            total = int(acumulado) / 1000
+    return total, paquetes
+
+
+def startup_check(runs=STARTUP_RUNS):
+    """Tiempo de importación de cada punto de entrada frente a su presupuesto."""
+    resultados = {}
+    for modulo, presupuesto in STARTUP_BUDGET_MS.items():
+        medidas = [import_time(modulo) for _ in range(runs)]
+        if any(m is None for m in medidas):
+            # Interfaz necesita customtkinter y una pantalla: no siempre se puede medir
+            resultados[modulo] = {"skipped": True}
+            continue
+        tiempos = sorted(total for total, _ in medidas)
+        prohibidos = set(FORBIDDEN_AT_STARTUP) - set(STARTUP_ALLOWED.get(modulo, ()))
+        prohibidos = sorted(set().union(*(p for _, p in medidas)) & prohibidos)
+        mediana = tiempos[len(tiempos) // 2]
+        resultados[modulo] = {
+            "median_ms": round(mediana, 1),
+            "max_ms": round(tiempos[-1], 1),
+            "budget_ms": presupuesto,
+            "forbidden_loaded": prohibidos,
+            "ok": mediana <= presupuesto and not prohibidos,
+        }
+    return resultados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de las etapas del organizador.")
+    parser.add_argument("--corpus", help="Corpus ya generado (si no, se crea uno temporal)")
+    parser.add_argument("--files", type=int, default=corpus_sintetico.DEFAULTS["files"])
+    parser.add_argument("--seed", type=int, default=corpus_sintetico.DEFAULTS["seed"])
+    parser.add_argument("--photo-kb", type=int, default=corpus_sintetico.DEFAULTS["photo_kb"])
+    parser.add_argument("--video-kb", type=int, default=corpus_sintetico.DEFAULTS["video_kb"])
+    parser.add_argument("--workers", type=int, default=organizador.METADATA_WORKERS)
+    parser.add_argument("--transfer-mode", choices=organizador.TRANSFER_MODES, default="copy")
+    parser.add_argument("--video-scaling", action="store_true", help="Incluir la prueba de escalado de videos")
+    parser.add_argument("--output", help="Archivo JSON de salida (por defecto, stdout)")
+    parser.add_argument("--log-level", default="WARNING")
+    parser.add_argument("--startup", action="store_true",
+                        help="Sólo comprueba el tiempo de importación de los puntos de entrada")
+    args = parser.parse_args(argv)
+
+    if args.startup:
+        resultados = startup_check()
+        print(json.dumps(resultados, indent=2, ensure_ascii=False))
+        return 0 if all(r.get("ok", True) for r in resultados.values()) else 1
+
+    with tempfile.TemporaryDirectory(prefix="bench_organizador_") as work_dir:
+        # Antes de crear el organizador: el log va a la carpeta temporal y no a organizacion.log
+        setup_logging(os.path.join(work_dir, "benchmark.log"), args.log_level)
+        corpus = args.corpus
+        resumen_corpus = None
+        if corpus is None:
+            corpus = os.path.join(work_dir, "corpus")
+            inicio = time.perf_counter()
+            resumen_corpus = corpus_sintetico.generate(
+                corpus, files=args.files, seed=args.seed, photo_kb=args.photo_kb, video_kb=args.video_kb
+            )
+            resumen_corpus["generation_seconds"] = round(time.perf_counter() - inicio, 2)
+
+        resultado = {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "corpus": resumen_corpus or {"path": os.path.abspath(corpus)},
+            "stages": run_stages(corpus, work_dir, args.workers, args.transfer_mode, args.log_level),
+        }
+        if args.video_scaling:
+            resultado["video_scaling"] = video_scaling(work_dir)
+        resultado["peak_rss_mb"] = peak_rss_mb()
+        shutdown_logging()
+
+    texto = json.dumps(resultado, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(texto + "\n")
+    else:
+        print(texto)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
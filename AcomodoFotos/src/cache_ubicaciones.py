@@ -0,0 +1,215 @@
+import logging
+import math
+import sqlite3
+import threading
+from collections import OrderedDict
+
+LRU_SIZE = 10000
+BATCH_SIZE = 100
+INDEX_NAME = "idx_location_cache_coords"
+# Lado (en metros) de la celda cuyas coordenadas se responden con una sola consulta
+PROXIMITY_RADIUS_M = 250
+METERS_PER_DEGREE = 111320.0
+# Decimales del centro de celda: la misma clave exacta en todos los procesos
+ANCHOR_DIGITS = 7
+
+
+class ProximityGrid:
+    """
+    Rejilla de celdas de tamaño fijo (en grados). Todas las coordenadas de una celda
+    se resuelven con su centro, que queda a menos de radius_m de cualquiera de ellas:
+    la respuesta depende sólo de la coordenada, no del orden en que se procesan las
+    fotos (ejecución normal, por lotes, por partes o plan + aplicar dan lo mismo).
+    """
+    def __init__(self, radius_m):
+        self.radius_m = radius_m
+        self.cell_deg = radius_m / METERS_PER_DEGREE
+
+    def cell(self, lat, lon):
+        return math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+
+    def anchor(self, lat, lon):
+        fila, columna = self.cell(lat, lon)
+        return (
+            round((fila + 0.5) * self.cell_deg, ANCHOR_DIGITS),
+            round((columna + 0.5) * self.cell_deg, ANCHOR_DIGITS),
+        )
+
+
+class LocationCache:
+    """
+    Caché de ubicaciones (lat, lon) -> (ciudad, estado) respaldada por SQLite.
+    Usa una sola conexión compartida entre hilos (protegida con un lock) en modo WAL,
+    agrupa las inserciones en transacciones y mantiene delante una capa LRU en memoria
+    que se precarga desde la base de datos al iniciar.
+
+    Si radius_m > 0, una coordenada que no está en la caché se responde con la del centro
+    de su celda de la rejilla (ver anchor()), evitando llamadas a la API de geocodificación.
+    """
+    def __init__(self, db_file, lru_size=LRU_SIZE, batch_size=BATCH_SIZE,
+                 radius_m=PROXIMITY_RADIUS_M):
+        self.db_file = db_file
+        self.lru_size = lru_size
+        self.batch_size = batch_size
+
+        self._lock = threading.RLock()
+        self._lru = OrderedDict()
+        self._pendientes = []
+        self._celdas = ProximityGrid(radius_m) if radius_m > 0 else None
+        self.exact_hits = 0
+        self.nearby_hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._preload()
+
+    def _migrate(self):
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS location_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    lat REAL,
+                    lon REAL,
+                    city TEXT,
+                    state TEXT
+                )
+                """
+            )
+            existe_indice = self._conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?",
+                (INDEX_NAME,)
+            ).fetchone()
+            if existe_indice:
+                return
+
+            # Las bases anteriores no tenían índice y pueden traer filas repetidas:
+            # se conserva la primera resolución de cada coordenada.
+            borradas = self._conn.execute(
+                """
+                DELETE FROM location_cache
+                WHERE id NOT IN (SELECT MIN(id) FROM location_cache GROUP BY lat, lon)
+                """
+            ).rowcount
+            # IF NOT EXISTS: varios procesos (las partes de una ejecución repartida) pueden migrar a la vez
+            self._conn.execute(
+                f"CREATE UNIQUE INDEX IF NOT EXISTS {INDEX_NAME} ON location_cache (lat, lon)"
+            )
+        logging.info(
+            f"Caché de ubicaciones migrada: índice único creado, {borradas} filas duplicadas eliminadas."
+        )
+
+    def _preload(self):
+        with self._lock:
+            filas = self._conn.execute(
+                "SELECT lat, lon, city, state FROM location_cache ORDER BY id"
+            ).fetchall()
+        for lat, lon, city, state in filas[-self.lru_size:]:
+            self._lru[(lat, lon)] = (city, state)
+        logging.debug(f"Caché de ubicaciones precargada con {len(filas)} entradas.")
+
+    def _remember(self, key, value):
+        self._lru[key] = value
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def anchor(self, lat, lon):
+        """
+        Coordenada que se geocodifica (y se guarda) en nombre de (lat, lon): el centro
+        de su celda, o ella misma sin rejilla. También agrupa las consultas por lotes.
+        """
+        if self._celdas is None:
+            return (lat, lon)
+        return self._celdas.anchor(lat, lon)
+
+    def _lookup(self, key):
+        value = self._lru.get(key)
+        if value is not None:
+            self._lru.move_to_end(key)
+            return value
+        fila = self._conn.execute(
+            "SELECT city, state FROM location_cache WHERE lat = ? AND lon = ?",
+            key
+        ).fetchone()
+        if fila:
+            value = (fila[0], fila[1])
+            self._remember(key, value)
+        return value
+
+    def get(self, lat, lon):
+        with self._lock:
+            value = self._lookup((lat, lon))
+            if value is not None:
+                self.exact_hits += 1
+                return value
+
+            if self._celdas is not None:
+                value = self._lookup(self._celdas.anchor(lat, lon))
+                if value is not None:
+                    self.nearby_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, lat, lon, city, state):
+        with self._lock:
+            self._remember((lat, lon), (city, state))
+            self._pendientes.append((lat, lon, city, state))
+            if len(self._pendientes) >= self.batch_size:
+                self.flush()
+
+    def merge(self, db_file):
+        """
+        Incorpora las ubicaciones de otra caché (p. ej. la de otra máquina de una
+        ejecución repartida); las coordenadas ya conocidas conservan su valor.
+        Devuelve cuántas entradas eran nuevas.
+        """
+        otra = sqlite3.connect(db_file, timeout=30)
+        try:
+            filas = otra.execute("SELECT lat, lon, city, state FROM location_cache ORDER BY id").fetchall()
+        finally:
+            otra.close()
+        with self._lock:
+            self.flush()
+            conocidas = set(self._conn.execute("SELECT lat, lon FROM location_cache"))
+            nuevas = 0
+            for lat, lon, city, state in filas:
+                if (lat, lon) not in conocidas:
+                    conocidas.add((lat, lon))
+                    self.put(lat, lon, city, state)
+                    nuevas += 1
+            self.flush()
+        logging.info(f"Caché {db_file} unida: {nuevas} ubicaciones nuevas de {len(filas)}.")
+        return nuevas
+
+    def flush(self):
+        with self._lock:
+            if not self._pendientes:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO location_cache (lat, lon, city, state) VALUES (?, ?, ?, ?)",
+                    self._pendientes
+                )
+            logging.debug(f"Caché de ubicaciones: {len(self._pendientes)} entradas guardadas.")
+            self._pendientes.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "exact_hits": self.exact_hits,
+                "nearby_hits": self.nearby_hits,
+                "misses": self.misses,
+                # Sólo lo que ahorra la rejilla: los aciertos exactos ya los evitaba la caché sin ella
+                "api_calls_saved": self.nearby_hits,
+            }
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
@@ -0,0 +1,197 @@
+import logging
+import os
+import posixpath
+import queue
+import shutil
+import tarfile
+import threading
+import zipfile
+from datetime import datetime
+
+from escaner import MEDIA_EXTENSIONS, MediaEntry
+from sidecars import SIDECAR_EXTENSION, SidecarIndex
+
+ARCHIVE_EXTENSIONS = ('.zip', '.tgz', '.tar.gz', '.tar')
+ARCHIVE_WORKERS = 2
+# Bloque de copia al extraer: la memoria no depende del tamaño del miembro
+CHUNK_SIZE = 1024 * 1024
+# Miembros de un .tar/.tgz que una foto espera a que aparezca su sidecar antes de
+# entregarse sin él; acota lo extraído a staging que todavía no se puede organizar
+SIDECAR_LOOKAHEAD = 256
+_FIN = object()
+
+
+def is_archive(path):
+    return os.path.isfile(path) and path.lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def _es_media(nombre):
+    return os.path.splitext(nombre.lower())[1] in MEDIA_EXTENSIONS
+
+
+class _Extractor:
+    """
+    Extrae los miembros multimedia de un comprimido a staging_dir, que debe
+    estar en el mismo sistema de archivos que el destino: después el organizador
+    los mueve con rename, así que cada byte se escribe una sola vez.
+    """
+    def __init__(self, archive, staging_dir, skip=None):
+        self.archive = os.path.abspath(archive)
+        self.staging_dir = staging_dir
+        self.skip = skip
+        self._n = 0
+
+    def _entry(self, miembro, size, mtime_ns):
+        # El origen "comprimido/miembro" identifica al archivo en el manifiesto entre ejecuciones
+        return MediaEntry(
+            None, posixpath.basename(miembro), size, mtime_ns, None, None,
+            source=os.path.join(self.archive, *miembro.split("/"))
+        )
+
+    def _stage(self, origen, nombre):
+        self._n += 1
+        path = os.path.join(self.staging_dir, f"{self._n:07d}_{nombre}")
+        with open(path, "wb") as destino:
+            shutil.copyfileobj(origen, destino, CHUNK_SIZE)
+        return path
+
+    def entries(self):
+        os.makedirs(self.staging_dir, exist_ok=True)
+        if zipfile.is_zipfile(self.archive):
+            return self._zip_entries()
+        return self._tar_entries()
+
+    def _zip_entries(self):
+        with zipfile.ZipFile(self.archive) as zf:
+            miembros = [i for i in zf.infolist() if not i.is_dir()]
+            # El directorio central lista todo: los sidecars se indexan antes de extraer nada
+            indices = {}
+            for info in miembros:
+                if info.filename.lower().endswith(SIDECAR_EXTENSION):
+                    carpeta, nombre = posixpath.split(info.filename)
+                    indices.setdefault(carpeta, SidecarIndex("")).add(nombre)
+
+            for info in miembros:
+                if not _es_media(info.filename):
+                    continue
+                mtime_ns = int(datetime(*info.date_time).timestamp() * 1e9)
+                entry = self._entry(info.filename, info.file_size, mtime_ns)
+                if self.skip is None or not self.skip(entry):
+                    with zf.open(info) as origen:
+                        entry.path = self._stage(origen, entry.name)
+                    carpeta = posixpath.dirname(info.filename)
+                    sidecar = indices[carpeta].find(entry.name) if carpeta in indices else None
+                    if sidecar is not None:
+                        with zf.open(posixpath.join(carpeta, sidecar)) as origen:
+                            entry.sidecar = self._stage(origen, posixpath.basename(sidecar))
+                yield entry
+
+    def _tar_entries(self):
+        # Lectura secuencial ("r|*"): un .tgz no permite saltar. Cada foto se entrega en
+        # cuanto se extrae si su sidecar ya apareció; si no, espera hasta SIDECAR_LOOKAHEAD
+        # miembros más (Takeout escribe el JSON junto a su foto) y después sigue sin él
+        sidecars = {}
+        # número de miembro -> (carpeta, entry), en orden de llegada
+        pendientes = {}
+        with tarfile.open(self.archive, mode="r|*") as tar:
+            for n, miembro in enumerate(tar):
+                if not miembro.isfile():
+                    continue
+                nombre = miembro.name
+                carpeta, base = posixpath.split(nombre)
+                if nombre.lower().endswith(SIDECAR_EXTENSION):
+                    indice = sidecars.get(carpeta)
+                    if indice is None:
+                        indice = sidecars[carpeta] = (SidecarIndex(""), {})
+                    indice[0].add(base)
+                    indice[1][base] = self._stage(tar.extractfile(miembro), base)
+                    listos = [
+                        k for k, (carpeta_foto, entry) in pendientes.items()
+                        if carpeta_foto == carpeta and self._attach_sidecar(sidecars, carpeta, entry)
+                    ]
+                    for k in listos:
+                        yield pendientes.pop(k)[1]
+                elif _es_media(nombre):
+                    entry = self._entry(nombre, miembro.size, int(miembro.mtime * 1e9))
+                    if self.skip is None or not self.skip(entry):
+                        entry.path = self._stage(tar.extractfile(miembro), entry.name)
+                    if entry.path is None or self._attach_sidecar(sidecars, carpeta, entry):
+                        yield entry
+                    else:
+                        pendientes[n] = (carpeta, entry)
+                while pendientes:
+                    k = next(iter(pendientes))
+                    if n - k < SIDECAR_LOOKAHEAD:
+                        break
+                    yield pendientes.pop(k)[1]
+
+        yield from (entry for _, entry in pendientes.values())
+
+    @staticmethod
+    def _attach_sidecar(sidecars, carpeta, entry):
+        indice = sidecars.get(carpeta)
+        sidecar = indice[0].find(entry.name) if indice is not None else None
+        if sidecar is None:
+            return False
+        entry.sidecar = indice[1][sidecar]
+        return True
+
+
+def scan_archives(archives, staging_dir, skip=None, workers=ARCHIVE_WORKERS, queue_size=256):
+    """
+    Recorre varios comprimidos en paralelo (un hilo por comprimido, hasta `workers`)
+    y devuelve un MediaEntry por cada foto o video, ya extraído a staging_dir.
+    Si skip(entry) es verdadero el miembro no se extrae y se devuelve con path=None.
+    """
+    cola = queue.Queue(maxsize=queue_size)
+    detener = threading.Event()
+    pendientes = list(enumerate(archives))
+    lock = threading.Lock()
+
+    def poner(item):
+        while not detener.is_set():
+            try:
+                cola.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def trabajador():
+        try:
+            while not detener.is_set():
+                with lock:
+                    if not pendientes:
+                        break
+                    i, archive = pendientes.pop(0)
+                logging.info(f"Leyendo comprimido {archive}")
+                extractor = _Extractor(archive, os.path.join(staging_dir, str(i)), skip)
+                for entry in extractor.entries():
+                    if detener.is_set():
+                        break
+                    poner(entry)
+        except Exception as e:
+            logging.error(f"Error al leer comprimido: {e}")
+            poner(e)
+        finally:
+            poner(_FIN)
+
+    hilos = [
+        threading.Thread(target=trabajador, name=f"comprimidos-{i}", daemon=True)
+        for i in range(max(1, min(workers, len(archives))))
+    ]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        activos = len(hilos)
+        while activos:
+            item = cola.get()
+            if item is _FIN:
+                activos -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        detener.set()
+        for hilo in hilos:
+            hilo.join()
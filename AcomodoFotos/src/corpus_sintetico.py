@@ -0,0 +1,291 @@
+"""
+Genera árboles tipo Google Takeout reproducibles para medir el organizador:
+JPEG con EXIF (fecha y GPS), PNG con eXIf, MP4 mínimos con mvhd/©xyz, sidecars
+JSON (con nombres recortados, copias numeradas y ".supplemental-metadata"),
+duplicados entre álbumes y colisiones de nombre. Los archivos se arman a mano,
+sin Pillow, y con la misma semilla se obtiene exactamente el mismo árbol.
+
+    python corpus_sintetico.py /tmp/corpus --files 10000 --seed 1
+"""
+import argparse
+import json
+import os
+import random
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+
+# Cuerpo de un JPEG gris de 8x8 (DQT, SOF0, DHT, SOS y datos) sin el SOI
+_JPEG_BODY = bytes.fromhex(
+    "ffdb004300100b0c0e0c0a100e0d0e1211101318281a181616183123251d283a333d3c3933383740485c"
+    "4e404457453738506d51575f626768673e4d71797064785c656763ffc0000b080008000801011100ffc400"
+    "1f0000010501010101010100000000000000000102030405060708090a0bffc400b5100002010303020403"
+    "050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f0243362"
+    "7282090a161718191a25262728292a3435363738393a434445464748494a535455565758595a6364656667"
+    "68696a737475767778797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7"
+    "b8b9bac2c3c4c5c6c7c8c9cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda"
+    "0008010100003f002bffd9"
+)
+# Segundos entre 1904-01-01 (época de MP4) y 1970-01-01
+_MP4_EPOCH_OFFSET = 2082844800
+_COM_MAX = 65533
+_TAKEOUT_NAME_LIMIT = 46
+
+DEFAULTS = {
+    "files": 1000,
+    "seed": 1,
+    "years": (2015, 2024),
+    "cities": 40,
+    "photo_kb": 64,
+    "video_kb": 512,
+    "png_fraction": 0.05,
+    "video_fraction": 0.05,
+    "gps_fraction": 0.6,
+    "sidecar_fraction": 0.8,
+    "duplicate_fraction": 0.1,
+    "long_name_fraction": 0.05,
+}
+
+
+# -------------------------- Formatos --------------------------
+
+def _rational(valor):
+    return struct.pack(">II", int(round(valor * 1000)), 1000)
+
+
+def _dms(valor):
+    valor = abs(valor)
+    grados = int(valor)
+    minutos = int((valor - grados) * 60)
+    segundos = (valor - grados - minutos / 60) * 3600
+    return _rational(grados) + _rational(minutos) + _rational(segundos)
+
+
+def exif_tiff(date, coords):
+    """Bloque TIFF big-endian con DateTimeOriginal y, si hay coords, el IFD GPS."""
+    entradas0 = 1 + (coords is not None)
+    exif_off = 8 + 2 + 12 * entradas0 + 4
+    gps_off = exif_off + 2 + 12 + 4 + 20
+
+    ifd0 = struct.pack(">H", entradas0) + struct.pack(">HHII", 0x8769, 4, 1, exif_off)
+    if coords is not None:
+        ifd0 += struct.pack(">HHII", 0x8825, 4, 1, gps_off)
+    ifd0 += b"\0\0\0\0"
+
+    fecha = date.strftime("%Y:%m:%d %H:%M:%S").encode() + b"\0"
+    exif = struct.pack(">HHHII", 1, 0x9003, 2, 20, exif_off + 18) + b"\0\0\0\0" + fecha
+
+    gps = b""
+    if coords is not None:
+        lat, lon = coords
+        datos = gps_off + 2 + 12 * 4 + 4
+        gps = (
+            struct.pack(">H", 4)
+            + struct.pack(">HHI", 1, 2, 2) + (b"N" if lat >= 0 else b"S") + b"\0\0\0"
+            + struct.pack(">HHII", 2, 5, 3, datos)
+            + struct.pack(">HHI", 3, 2, 2) + (b"E" if lon >= 0 else b"W") + b"\0\0\0"
+            + struct.pack(">HHII", 4, 5, 3, datos + 24)
+            + b"\0\0\0\0" + _dms(lat) + _dms(lon)
+        )
+    return b"MM\0\x2a" + struct.pack(">I", 8) + ifd0 + exif + gps
+
+
+def jpeg_bytes(date, coords, relleno):
+    """JPEG válido: SOI, APP1 Exif, segmentos COM con `relleno` y la imagen de 8x8."""
+    partes = [b"\xff\xd8"]
+    if date is not None:
+        app1 = b"Exif\0\0" + exif_tiff(date, coords)
+        partes.append(b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1)
+    for i in range(0, len(relleno), _COM_MAX):
+        trozo = relleno[i:i + _COM_MAX]
+        partes.append(b"\xff\xfe" + struct.pack(">H", len(trozo) + 2) + trozo)
+    partes.append(_JPEG_BODY)
+    return b"".join(partes)
+
+
+def _png_chunk(tipo, datos):
+    return struct.pack(">I", len(datos)) + tipo + datos + struct.pack(">I", zlib.crc32(tipo + datos))
+
+
+def png_bytes(date, coords, relleno):
+    """PNG de 1x1 con eXIf (si hay fecha) y un chunk tEXt con `relleno`."""
+    partes = [b"\x89PNG\r\n\x1a\n", _png_chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0))]
+    if date is not None:
+        partes.append(_png_chunk(b"eXIf", exif_tiff(date, coords)))
+    texto = relleno.hex()[:len(relleno)]
+    partes.append(_png_chunk(b"tEXt", b"Comment\0" + texto.encode("latin-1")))
+    partes.append(_png_chunk(b"IDAT", zlib.compress(b"\0\x80")))
+    partes.append(_png_chunk(b"IEND", b""))
+    return b"".join(partes)
+
+
+def _box(tipo, datos):
+    return struct.pack(">I4s", 8 + len(datos), tipo) + datos
+
+
+def write_mp4(path, date, coords, mdat_size, moov_last=True):
+    """MP4 mínimo (ftyp, mdat disperso y moov con mvhd y ©xyz); mdat no se escribe realmente."""
+    segundos = int(date.replace(tzinfo=timezone.utc).timestamp()) + _MP4_EPOCH_OFFSET if date else 0
+    hijos = _box(b"mvhd", b"\0\0\0\0" + struct.pack(">II", segundos, segundos) + b"\0" * 88)
+    if coords is not None:
+        xyz = f"{coords[0]:+08.4f}{coords[1]:+09.4f}/".encode()
+        hijos += _box(b"udta", _box(b"\xa9xyz", struct.pack(">HH", len(xyz), 0x15c7) + xyz))
+    moov = _box(b"moov", hijos)
+    with open(path, "wb") as f:
+        f.write(_box(b"ftyp", b"isom\0\0\0\0isommp41"))
+        if not moov_last:
+            f.write(moov)
+        f.write(struct.pack(">I4s", 8 + mdat_size, b"mdat"))
+        f.truncate(f.tell() + mdat_size)
+        f.seek(0, os.SEEK_END)
+        if moov_last:
+            f.write(moov)
+
+
+def sidecar_json(title, date, coords):
+    geo = {"latitude": 0.0, "longitude": 0.0, "altitude": 0.0}
+    if coords is not None:
+        geo = {"latitude": coords[0], "longitude": coords[1], "altitude": 0.0}
+    datos = {"title": title, "geoData": geo, "geoDataExif": geo}
+    if date is not None:
+        timestamp = int(date.replace(tzinfo=timezone.utc).timestamp())
+        datos["photoTakenTime"] = {"timestamp": str(timestamp), "formatted": ""}
+    return json.dumps(datos)
+
+
+# -------------------------- Árbol --------------------------
+
+def _sidecar_name(stem, ext, n, supplemental):
+    """
+    Nombre del sidecar como lo escribe Takeout: "IMG(1).jpg" -> "IMG.jpg(1).json" o
+    "IMG.jpg.supplemental-metadata(1).json", recortado a 46 caracteres antes de ".json".
+    """
+    base = stem + ext
+    if supplemental:
+        base += ".supplemental-metadata"
+    if n:
+        base += f"({n})"
+    return base[:_TAKEOUT_NAME_LIMIT] + ".json"
+
+
+def generate(root, **opciones):
+    """
+    Crea el corpus en root y devuelve un resumen (dict) con lo generado. Las
+    opciones son las de DEFAULTS.
+    """
+    cfg = dict(DEFAULTS, **opciones)
+    rnd = random.Random(cfg["seed"])
+    fotos = os.path.join(root, "Takeout", "Google Fotos")
+    ciudades = [(rnd.uniform(-50, 60), rnd.uniform(-120, 140)) for _ in range(cfg["cities"])]
+    inicio = datetime(cfg["years"][0], 1, 1)
+    dias = (datetime(cfg["years"][1], 12, 31) - inicio).days
+
+    resumen = {"files": 0, "bytes": 0, "jpeg": 0, "png": 0, "mp4": 0, "sidecars": 0,
+               "with_gps": 0, "without_date": 0, "duplicates": 0, "long_names": 0}
+    creados = []
+    nombres_usados = set()
+
+    def escribir(path, datos=None, fecha_mtime=None):
+        if datos is not None:
+            with open(path, "wb") as f:
+                f.write(datos)
+        # mtime fijo para que el corpus sea idéntico entre generaciones
+        mtime = (fecha_mtime or inicio).replace(tzinfo=timezone.utc).timestamp()
+        os.utime(path, (mtime, mtime))
+
+    for i in range(cfg["files"]):
+        if creados and rnd.random() < cfg["duplicate_fraction"]:
+            # Takeout repite en cada álbum la foto que ya está en "Photos from AAAA"
+            origen, nombre = rnd.choice(creados)
+            carpeta = os.path.join(fotos, f"Album {rnd.randrange(1, 20)}")
+            os.makedirs(carpeta, exist_ok=True)
+            destino = os.path.join(carpeta, nombre)
+            if not os.path.exists(destino):
+                with open(origen, "rb") as f:
+                    escribir(destino, f.read())
+                resumen["duplicates"] += 1
+                resumen["files"] += 1
+                resumen["bytes"] += os.path.getsize(destino)
+            continue
+
+        fecha = None
+        if rnd.random() > 0.03:
+            fecha = inicio + timedelta(days=rnd.randrange(dias), seconds=rnd.randrange(86400))
+        coords = None
+        if fecha is not None and rnd.random() < cfg["gps_fraction"]:
+            lat, lon = rnd.choice(ciudades)
+            # Unos cientos de metros alrededor de la ciudad: ejercita la caché por cercanía
+            coords = (round(lat + rnd.uniform(-0.003, 0.003), 6), round(lon + rnd.uniform(-0.003, 0.003), 6))
+
+        carpeta = os.path.join(fotos, f"Photos from {(fecha or inicio).year}")
+        os.makedirs(carpeta, exist_ok=True)
+
+        tipo = rnd.random()
+        if tipo < cfg["video_fraction"]:
+            ext = ".mp4"
+        elif tipo < cfg["video_fraction"] + cfg["png_fraction"]:
+            ext = ".png"
+        else:
+            ext = ".jpg"
+
+        # Pocos nombres distintos por año: colisiones de nombre como en los IMG_0001 de cada cámara
+        stem = f"IMG_{rnd.randrange(max(10, cfg['files'] // 4)):04d}"
+        if rnd.random() < cfg["long_name_fraction"]:
+            stem = f"{stem}_vacaciones_con_la_familia_en_la_playa_{i}"
+            resumen["long_names"] += 1
+        nombre = stem + ext
+        n = 0
+        while os.path.join(carpeta, nombre) in nombres_usados:
+            n += 1
+            nombre = f"{stem}({n}){ext}"
+        path = os.path.join(carpeta, nombre)
+        nombres_usados.add(path)
+
+        # Sólo los sidecars llevan GPS en la mitad de los casos, como ocurre con fotos editadas
+        coords_archivo = coords if coords is not None and rnd.random() < 0.5 else None
+        relleno_kb = cfg["video_kb"] if ext == ".mp4" else cfg["photo_kb"]
+        tamano = max(1, int(relleno_kb * 1024 * rnd.uniform(0.5, 1.5)))
+        if ext == ".mp4":
+            write_mp4(path, fecha, coords_archivo, tamano)
+            escribir(path, fecha_mtime=fecha)
+            resumen["mp4"] += 1
+            relleno = None
+        else:
+            relleno = rnd.randbytes(tamano)
+        if ext == ".png":
+            escribir(path, png_bytes(fecha, coords_archivo, relleno), fecha)
+            resumen["png"] += 1
+        elif ext == ".jpg":
+            escribir(path, jpeg_bytes(fecha, coords_archivo, relleno), fecha)
+            resumen["jpeg"] += 1
+
+        if rnd.random() < cfg["sidecar_fraction"]:
+            sidecar = os.path.join(carpeta, _sidecar_name(stem, ext, n, rnd.random() < 0.5))
+            escribir(sidecar, sidecar_json(nombre, fecha, coords).encode("utf-8"))
+            resumen["sidecars"] += 1
+
+        resumen["files"] += 1
+        resumen["bytes"] += os.path.getsize(path)
+        resumen["with_gps"] += coords is not None
+        resumen["without_date"] += fecha is None
+        creados.append((path, nombre))
+
+    resumen["config"] = {k: v for k, v in cfg.items()}
+    return resumen
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un corpus sintético tipo Google Takeout.")
+    parser.add_argument("root", help="Carpeta donde crear el corpus")
+    for clave, valor in DEFAULTS.items():
+        if clave == "years":
+            continue
+        parser.add_argument(f"--{clave.replace('_', '-')}", type=type(valor), default=valor)
+    args = parser.parse_args(argv)
+    opciones = {clave: getattr(args, clave) for clave in DEFAULTS if clave != "years"}
+    resumen = generate(args.root, **opciones)
+    print(json.dumps(resumen, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+import hashlib
+import os
+import threading
+
+# Bytes leídos del principio y del final del archivo para el hash parcial
+PARTIAL_CHUNK = 64 * 1024
+FULL_CHUNK = 1024 * 1024
+
+
+def partial_hash(path, size):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(size.to_bytes(8, "little"))
+    with open(path, "rb") as f:
+        h.update(f.read(PARTIAL_CHUNK))
+        if size > 2 * PARTIAL_CHUNK:
+            f.seek(size - PARTIAL_CHUNK)
+            h.update(f.read(PARTIAL_CHUNK))
+    return h.digest()
+
+
+def full_hash(path):
+    h = hashlib.blake2b(digest_size=32)
+    with open(path, "rb") as f:
+        while True:
+            bloque = f.read(FULL_CHUNK)
+            if not bloque:
+                break
+            h.update(bloque)
+    return h.digest()
+
+
+def same_content(path_a, path_b, size):
+    """Compara dos archivos por tamaño, hash parcial y, si coinciden, hash completo."""
+    if os.path.getsize(path_b) != size:
+        return False
+    if size <= 2 * PARTIAL_CHUNK:
+        return full_hash(path_a) == full_hash(path_b)
+    return (partial_hash(path_a, size) == partial_hash(path_b, size) and
+            full_hash(path_a) == full_hash(path_b))
+
+
+class _Contenido:
+    __slots__ = ("path", "source", "partial", "full")
+
+    def __init__(self, path, source=None):
+        self.path = path
+        # Archivo del que se leen los hashes si path todavía no existe (plan sin aplicar)
+        self.source = source or path
+        self.partial = None
+        self.full = None
+
+
+class _GrupoTamano:
+    __slots__ = ("lock", "contenidos")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.contenidos = []
+
+
+class ContentIndex:
+    """
+    Índice de contenidos ya organizados, por tamaño -> hash parcial (inicio y final)
+    -> hash completo. Los hashes se calculan sólo cuando hay una colisión en el
+    nivel anterior, así que la mayoría de los archivos nunca se leen para esto.
+    Con hash_sources=True (al planificar) los contenidos colocados se leen desde
+    su origen, porque el destino todavía no existe.
+    """
+    def __init__(self, hash_sources=False):
+        self.hash_sources = hash_sources
+        self._lock = threading.Lock()
+        self._grupos = {}
+
+    def _grupo(self, size):
+        with self._lock:
+            grupo = self._grupos.get(size)
+            if grupo is None:
+                grupo = self._grupos[size] = _GrupoTamano()
+            return grupo
+
+    def add(self, path, size):
+        """Registra un archivo que ya existe en el destino (p. ej. de una ejecución anterior)."""
+        grupo = self._grupo(size)
+        with grupo.lock:
+            grupo.contenidos.append(_Contenido(path))
+
+    def rename(self, old_path, new_path, size):
+        """Un archivo registrado se movió dentro del destino."""
+        grupo = self._grupo(size)
+        with grupo.lock:
+            for contenido in grupo.contenidos:
+                if contenido.path == old_path:
+                    contenido.path = contenido.source = new_path
+
+    def place(self, path, size, place_fn):
+        """
+        Si el contenido de `path` ya está en el índice devuelve la ruta existente.
+        Si no, llama a place_fn() para guardarlo (devuelve la ruta final), lo registra
+        y devuelve None. Los archivos del mismo tamaño se procesan de a uno para que
+        dos copias idénticas simultáneas no se guarden dos veces.
+        """
+        grupo = self._grupo(size)
+        with grupo.lock:
+            if grupo.contenidos:
+                parcial = partial_hash(path, size)
+                completo = None
+                for contenido in list(grupo.contenidos):
+                    try:
+                        if contenido.partial is None:
+                            contenido.partial = partial_hash(contenido.source, size)
+                        if contenido.partial != parcial:
+                            continue
+                        if completo is None:
+                            completo = full_hash(path)
+                        if contenido.full is None:
+                            contenido.full = full_hash(contenido.source)
+                    except OSError:
+                        # El archivo registrado ya no está en el destino
+                        grupo.contenidos.remove(contenido)
+                        continue
+                    if contenido.full == completo:
+                        return contenido.path
+
+            grupo.contenidos.append(_Contenido(place_fn(), path if self.hash_sources else None))
+            return None
@@ -0,0 +1,84 @@
+import logging
+import os
+
+from sidecars import SIDECAR_EXTENSION, SidecarIndex
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi')
+MEDIA_EXTENSIONS = IMAGE_EXTENSIONS + VIDEO_EXTENSIONS
+
+
+class MediaEntry:
+    """
+    Archivo multimedia encontrado al escanear, con los datos de stat ya obtenidos.
+    source identifica el archivo en el manifiesto; coincide con path salvo en los
+    miembros de un comprimido, que se leen desde una copia temporal.
+    """
+    __slots__ = ("path", "name", "size", "mtime_ns", "dev", "ino", "sidecar", "source")
+
+    def __init__(self, path, name, size, mtime_ns, dev, ino, sidecar=None, source=None):
+        self.path = path
+        self.name = name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.dev = dev
+        self.ino = ino
+        self.sidecar = sidecar
+        self.source = source or path
+
+
+def _scan_folder(carpeta):
+    """(subcarpetas, medios) de una sola carpeta; los medios son MediaEntry con su sidecar."""
+    subcarpetas = []
+    medios = []
+    sidecars = SidecarIndex(carpeta)
+    try:
+        with os.scandir(carpeta) as it:
+            for entrada in it:
+                if entrada.is_dir(follow_symlinks=False):
+                    subcarpetas.append(entrada.path)
+                    continue
+                nombre = entrada.name.lower()
+                if nombre.endswith(SIDECAR_EXTENSION):
+                    sidecars.add(entrada.name)
+                elif os.path.splitext(nombre)[1] in MEDIA_EXTENSIONS:
+                    medios.append(entrada)
+    except OSError as e:
+        logging.warning(f"No se pudo leer la carpeta {carpeta}: {e}")
+        return [], []
+
+    entries = []
+    for entrada in medios:
+        try:
+            st = entrada.stat()
+        except OSError as e:
+            logging.warning(f"No se pudo leer {entrada.path}: {e}")
+            continue
+        entries.append(MediaEntry(
+            entrada.path, entrada.name, st.st_size, st.st_mtime_ns, st.st_dev,
+            entrada.inode(), sidecars.find(entrada.name)
+        ))
+    return subcarpetas, entries
+
+
+def scan_folder(folder):
+    """Los MediaEntry de folder, sin entrar en sus subcarpetas."""
+    return _scan_folder(os.path.abspath(folder))[1]
+
+
+def scan_media(folder):
+    """
+    Recorre folder con os.scandir en una sola pasada y va devolviendo un MediaEntry
+    por cada foto o video, con su sidecar de Takeout ya asociado. Es un generador:
+    quien lo consume puede empezar a procesar antes de que termine el recorrido.
+    """
+    pendientes = [os.path.abspath(folder)]
+    while pendientes:
+        subcarpetas, entries = _scan_folder(pendientes.pop())
+        yield from entries
+        pendientes.extend(reversed(subcarpetas))
+
+
+def build_work_manifest(folder):
+    """Lista completa de archivos a organizar: sirve para el total del progreso y para el organizador."""
+    return list(scan_media(folder))
@@ -0,0 +1,196 @@
+import json
+import logging
+import math
+import os
+
+import numpy as np
+
+# Versión del formato del índice serializado; cambiarla invalida los índices existentes
+INDEX_VERSION = 1
+CELL_DEG = 1.0
+ROWS = int(180 / CELL_DEG)
+COLS = int(360 / CELL_DEG)
+# Más allá de esta distancia no se considera que la foto esté en la ciudad más cercana
+MAX_DISTANCE_M = 50000
+EARTH_RADIUS_M = 6371008.8
+ADMIN1_FILENAME = "admin1CodesASCII.txt"
+_ARRAYS = ("lat", "lon", "cell_start", "city_offsets", "city_blob", "state_idx",
+           "state_offsets", "state_blob")
+
+
+def _pack_strings(values):
+    """Concatena cadenas UTF-8 en un blob de bytes más un arreglo de desplazamientos."""
+    codificadas = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(codificadas) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(c) for c in codificadas])
+    blob = np.frombuffer(b"".join(codificadas), dtype=np.uint8)
+    return offsets, blob
+
+
+def _cells(lat, lon):
+    fila = np.clip(((lat + 90.0) // CELL_DEG).astype(np.int64), 0, ROWS - 1)
+    columna = np.clip(((lon + 180.0) // CELL_DEG).astype(np.int64), 0, COLS - 1)
+    return fila * COLS + columna
+
+
+def _read_admin1(path):
+    nombres = {}
+    if not os.path.exists(path):
+        logging.warning(f"No se encontró {path}; las ubicaciones offline no tendrán estado.")
+        return nombres
+    with open(path, encoding="utf-8") as f:
+        for linea in f:
+            campos = linea.rstrip("\n").split("\t")
+            if len(campos) >= 2:
+                nombres[campos[0]] = campos[1]
+    return nombres
+
+
+def build_index(cities_path, admin1_path, index_dir):
+    """
+    Convierte un volcado de ciudades estilo GeoNames (cities500.txt, cities1000.txt...)
+    y su admin1CodesASCII.txt en arreglos NumPy ordenados por celda de 1 grado,
+    guardados como .npy en index_dir para abrirlos con memory-map en ejecuciones siguientes.
+    """
+    estados = _read_admin1(admin1_path)
+    lats, lons, ciudades, estado_idx = [], [], [], []
+    nombres_estado = []
+    indice_estado = {}
+
+    with open(cities_path, encoding="utf-8") as f:
+        for linea in f:
+            campos = linea.rstrip("\n").split("\t")
+            if len(campos) < 11 or campos[6] != "P":
+                continue
+            estado = estados.get(f"{campos[8]}.{campos[10]}")
+            if estado is None:
+                idx = -1
+            else:
+                idx = indice_estado.setdefault(estado, len(nombres_estado))
+                if idx == len(nombres_estado):
+                    nombres_estado.append(estado)
+            lats.append(float(campos[4]))
+            lons.append(float(campos[5]))
+            ciudades.append(campos[1])
+            estado_idx.append(idx)
+
+    lat = np.array(lats, dtype=np.float64)
+    lon = np.array(lons, dtype=np.float64)
+    celdas = _cells(lat, lon)
+    orden = np.argsort(celdas, kind="stable")
+
+    city_offsets, city_blob = _pack_strings([ciudades[i] for i in orden])
+    state_offsets, state_blob = _pack_strings(nombres_estado)
+    arrays = {
+        "lat": lat[orden].astype(np.float32),
+        "lon": lon[orden].astype(np.float32),
+        "cell_start": np.searchsorted(celdas[orden], np.arange(ROWS * COLS + 1)).astype(np.int64),
+        "city_offsets": city_offsets,
+        "city_blob": city_blob,
+        "state_idx": np.array(estado_idx, dtype=np.int32)[orden],
+        "state_offsets": state_offsets,
+        "state_blob": state_blob,
+    }
+
+    os.makedirs(index_dir, exist_ok=True)
+    for nombre, arreglo in arrays.items():
+        np.save(os.path.join(index_dir, f"{nombre}.npy"), arreglo)
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(_source_signature(cities_path, admin1_path), f)
+    logging.info(f"Índice offline creado con {len(lats)} ciudades en {index_dir}")
+
+
+def _source_signature(cities_path, admin1_path):
+    firma = {"version": INDEX_VERSION}
+    for clave, path in (("cities", cities_path), ("admin1", admin1_path)):
+        if os.path.exists(path):
+            st = os.stat(path)
+            firma[clave] = [st.st_size, st.st_mtime_ns]
+    return firma
+
+
+class OfflineGeocoder:
+    """
+    Geocodificador inverso sin red basado en un volcado local de GeoNames.
+    Responde con el mismo formato que OpenCageGeocode.reverse_geocode para que
+    el organizador genere los mismos nombres de carpeta "ciudad - estado".
+    """
+    def __init__(self, cities_path, admin1_path=None, index_dir=None,
+                 max_distance_m=MAX_DISTANCE_M):
+        self.cities_path = cities_path
+        self.admin1_path = admin1_path or os.path.join(os.path.dirname(cities_path), ADMIN1_FILENAME)
+        self.index_dir = index_dir or f"{cities_path}.idx"
+        self.max_distance_m = max_distance_m
+
+        if not self._index_is_current():
+            build_index(self.cities_path, self.admin1_path, self.index_dir)
+
+        for nombre in _ARRAYS:
+            setattr(self, f"_{nombre}", np.load(os.path.join(self.index_dir, f"{nombre}.npy"), mmap_mode="r"))
+        logging.debug(f"Índice offline cargado desde {self.index_dir} ({len(self._lat)} ciudades)")
+
+    def _index_is_current(self):
+        try:
+            with open(os.path.join(self.index_dir, "meta.json"), encoding="utf-8") as f:
+                firma = json.load(f)
+        except (OSError, ValueError):
+            return False
+        return firma == _source_signature(self.cities_path, self.admin1_path)
+
+    @staticmethod
+    def _string(offsets, blob, i):
+        return bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8")
+
+    def _candidates(self, fila, columna, radio):
+        rangos = []
+        for i in range(max(0, fila - radio), min(ROWS - 1, fila + radio) + 1):
+            borde = abs(i - fila) == radio
+            paso = 1 if borde else 2 * radio
+            for j in range(columna - radio, columna + radio + 1, max(1, paso)):
+                celda = i * COLS + j % COLS
+                inicio, fin = self._cell_start[celda], self._cell_start[celda + 1]
+                if fin > inicio:
+                    rangos.append(np.arange(inicio, fin))
+        return np.concatenate(rangos) if rangos else None
+
+    def nearest(self, lat, lon):
+        """Devuelve (ciudad, estado o None, distancia en metros) o None si no hay ciudad cercana."""
+        fila = min(int((lat + 90.0) // CELL_DEG), ROWS - 1)
+        columna = int((lon + 180.0) // CELL_DEG) % COLS
+        phi = math.radians(lat)
+        mejor, mejor_distancia = None, float("inf")
+
+        # Se exploran anillos de celdas hasta que ningún punto fuera del anillo puede estar más cerca
+        for radio in range(0, COLS // 2 + 1):
+            indices = self._candidates(fila, columna, radio)
+            if indices is not None:
+                phi2 = np.radians(self._lat[indices].astype(np.float64))
+                dlambda = np.radians(self._lon[indices].astype(np.float64) - lon)
+                a = (np.sin((phi2 - phi) / 2) ** 2 +
+                     math.cos(phi) * np.cos(phi2) * np.sin(dlambda / 2) ** 2)
+                distancias = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+                k = int(np.argmin(distancias))
+                if distancias[k] < mejor_distancia:
+                    mejor, mejor_distancia = int(indices[k]), float(distancias[k])
+
+            cos_lat = max(math.cos(math.radians(min(abs(lat) + radio * CELL_DEG, 90.0))), 0.0)
+            cota = radio * math.radians(CELL_DEG) * EARTH_RADIUS_M * cos_lat
+            if mejor_distancia <= cota or cota > self.max_distance_m:
+                break
+
+        if mejor is None or mejor_distancia > self.max_distance_m:
+            return None
+        ciudad = self._string(self._city_offsets, self._city_blob, mejor)
+        idx = int(self._state_idx[mejor])
+        estado = self._string(self._state_offsets, self._state_blob, idx) if idx >= 0 else None
+        return ciudad, estado, mejor_distancia
+
+    def reverse_geocode(self, lat, lng, **kwargs):
+        resultado = self.nearest(lat, lng)
+        if resultado is None:
+            return []
+        ciudad, estado, _ = resultado
+        components = {"city": ciudad}
+        if estado:
+            components["state"] = estado
+        return [{"components": components}]
@@ -0,0 +1,96 @@
+import logging
+import random
+import sys
+import threading
+import time
+
+# Plan gratuito de OpenCage: 1 petición por segundo
+OPENCAGE_RATE_LIMIT = 1.0
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# Errores de opencage.geocoder en los que reintentar no sirve (clave inválida, cuenta
+# suspendida, petición mal formada)
+NON_RETRYABLE_ERRORS = ("ForbiddenError", "InvalidInputError", "NotAuthorizedError")
+
+
+def _non_retryable(error):
+    # Sin importar opencage (arrastra requests y aiohttp): si no está cargado, el error no es suyo
+    modulo = sys.modules.get("opencage.geocoder")
+    if modulo is None:
+        return False
+    return isinstance(error, tuple(getattr(modulo, nombre) for nombre in NON_RETRYABLE_ERRORS))
+
+
+class TokenBucket:
+    """
+    Limitador de ritmo compartido entre hilos: permite `rate` peticiones por segundo
+    con ráfagas de hasta `capacity` peticiones.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                ahora = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (ahora - self._ultimo) * self.rate)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                espera = (1 - self._tokens) / self.rate
+            time.sleep(espera)
+
+
+def reverse_geocode(geocoder, lat, lon, rate_limiter=None, retries=MAX_RETRIES):
+    """
+    Llama a geocoder.reverse_geocode respetando el limitador y reintentando con
+    backoff exponencial (con jitter) los errores transitorios y de cuota.
+    """
+    intento = 0
+    while True:
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+        try:
+            return geocoder.reverse_geocode(lat, lon)
+        except Exception as e:
+            if _non_retryable(e) or intento >= retries:
+                raise
+            espera = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** intento) * random.uniform(0.5, 1.5)
+            logging.warning(
+                f"Error al geocodificar ({lat}, {lon}): {e}. Reintento {intento + 1} en {espera:.1f}s"
+            )
+            time.sleep(espera)
+            intento += 1
+
+
+class FakeGeocoder:
+    """
+    Sustituto local de OpenCageGeocode para pruebas y mediciones sin red.
+    Devuelve una ciudad/estado determinista por celda de `cell_deg` grados
+    tras esperar `latency` segundos, imitando el formato de respuesta de OpenCage.
+    """
+    def __init__(self, latency=0.05, cell_deg=0.1):
+        self.latency = latency
+        self.cell_deg = cell_deg
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def reverse_geocode(self, lat, lng, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        fila = int(lat // self.cell_deg)
+        columna = int(lng // self.cell_deg)
+        return [{
+            "components": {
+                "city": f"Ciudad {fila}_{columna}",
+                "state": f"Estado {int(lat // 1)}_{int(lng // 1)}",
+            }
+        }]
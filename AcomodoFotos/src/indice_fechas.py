@@ -0,0 +1,45 @@
+from collections import Counter
+
+SIN_UBICACION = "Sin_Ubicacion"
+SIN_FECHA = "Sin_Fecha"
+DATE_FOLDER_FORMAT = '%d-%m-%y'
+
+
+def date_folder(date):
+    """Nombre de la carpeta de fecha (dd-mm-aa) o "Sin_Fecha"."""
+    return date.strftime(DATE_FOLDER_FORMAT) if date else SIN_FECHA
+
+
+class DateLocationIndex:
+    """
+    Ubicaciones conocidas por carpeta de fecha. Un archivo sin ubicación se
+    coloca en la ubicación con más archivos ese mismo día; a igualdad de
+    archivos, en la primera en orden alfabético. No es thread-safe: lo usa
+    sólo el hilo de planificación.
+    """
+    def __init__(self):
+        self._por_origen = {}
+        self._conteos = None
+
+    def add(self, source, date, location):
+        if date is None or location == SIN_UBICACION:
+            return
+        # Por origen, para que un archivo reprocesado no cuente dos veces
+        self._por_origen[source] = (date_folder(date), location)
+        self._conteos = None
+
+    def discard(self, source):
+        if self._por_origen.pop(source, None) is not None:
+            self._conteos = None
+
+    def location_for(self, date):
+        if date is None:
+            return SIN_UBICACION
+        if self._conteos is None:
+            self._conteos = {}
+            for fecha, location in self._por_origen.values():
+                self._conteos.setdefault(fecha, Counter())[location] += 1
+        conteo = self._conteos.get(date_folder(date))
+        if not conteo:
+            return SIN_UBICACION
+        return min(conteo.items(), key=lambda par: (-par[1], par[0]))[0]
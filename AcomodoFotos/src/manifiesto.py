@@ -0,0 +1,191 @@
+import logging
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from indice_fechas import SIN_UBICACION
+
+MANIFEST_FILENAME = ".organizador_manifest.db"
+BATCH_SIZE = 500
+
+
+def _read_only_uri(db_file):
+    """
+    URI de sólo lectura para los manifiestos ajenos (el de otra parte, el del destino
+    al planificar). En modo WAL una conexión así crea "-wal" y "-shm" y, como no puede
+    escribir, no los borra al cerrar: si el archivo está cerrado del todo (sin "-wal")
+    se abre como inmutable, sin crear nada a su lado.
+    """
+    uri = pathlib.Path(os.path.abspath(db_file)).as_uri() + "?mode=ro"
+    if not os.path.exists(db_file + "-wal"):
+        uri += "&immutable=1"
+    return uri
+
+
+class Manifest:
+    """
+    Registro persistente de los archivos ya organizados en una carpeta destino:
+    origen, tamaño, mtime, metadatos extraídos y destino. Permite saltar en
+    ejecuciones posteriores los archivos que no cambiaron sin volver a abrirlos.
+    """
+    def __init__(self, db_file, batch_size=BATCH_SIZE):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self._lock = threading.RLock()
+        self._pendientes = []
+
+        # uri=True: para poder adjuntar otros manifiestos en modo de sólo lectura (merge)
+        self._conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False, uri=True)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS files (
+                    source TEXT PRIMARY KEY,
+                    size INTEGER,
+                    mtime_ns INTEGER,
+                    date TEXT,
+                    lat REAL,
+                    lon REAL,
+                    location TEXT,
+                    destination TEXT,
+                    updated REAL
+                )
+                """
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_files_destination ON files (destination)"
+            )
+
+        # Sólo lo necesario para decidir si un archivo cambió, sin tocar SQLite por archivo
+        self._conocidos = {
+            source: (size, mtime_ns, destination)
+            for source, size, mtime_ns, destination in self._conn.execute(
+                "SELECT source, size, mtime_ns, destination FROM files"
+            )
+        }
+        logging.debug(f"Manifiesto cargado desde {db_file} ({len(self._conocidos)} archivos).")
+
+    def preload(self, db_file):
+        """
+        Suma a los archivos conocidos los de otro manifiesto, sin escribir en él:
+        una parte de una ejecución repartida conoce así lo ya organizado por todas.
+        """
+        if not os.path.exists(db_file):
+            return
+        conn = sqlite3.connect(_read_only_uri(db_file), timeout=30, uri=True)
+        try:
+            filas = conn.execute("SELECT source, size, mtime_ns, destination FROM files").fetchall()
+        finally:
+            conn.close()
+        with self._lock:
+            for source, size, mtime_ns, destination in filas:
+                self._conocidos.setdefault(source, (size, mtime_ns, destination))
+
+    def is_unchanged(self, source, size, mtime_ns):
+        conocido = self._conocidos.get(source)
+        return conocido is not None and conocido[0] == size and conocido[1] == mtime_ns
+
+    def destination(self, source):
+        conocido = self._conocidos.get(source)
+        return conocido[2] if conocido else None
+
+    def destinations(self):
+        """Pares (destino, tamaño) distintos de los archivos ya organizados."""
+        vistos = {}
+        for size, _, destination in self._conocidos.values():
+            if destination:
+                vistos[destination] = size
+        return vistos.items()
+
+    def located_files(self):
+        """Filas (origen, fecha, ubicación) de los archivos organizados que tenían coordenadas."""
+        with self._lock:
+            self.flush()
+            filas = self._conn.execute(
+                "SELECT source, date, location FROM files "
+                "WHERE date IS NOT NULL AND lat IS NOT NULL AND location IS NOT NULL"
+            ).fetchall()
+        return [(source, datetime.fromisoformat(date), location) for source, date, location in filas]
+
+    def unlocated_files(self):
+        """Pares (destino, fecha) de los archivos con fecha guardados en "Sin_Ubicacion"."""
+        with self._lock:
+            self.flush()
+            filas = self._conn.execute(
+                "SELECT DISTINCT destination, date FROM files "
+                "WHERE location = ? AND date IS NOT NULL AND destination IS NOT NULL ORDER BY destination",
+                (SIN_UBICACION,)
+            ).fetchall()
+        return [(destination, datetime.fromisoformat(date)) for destination, date in filas]
+
+    def record(self, source, size, mtime_ns, date, coordinates, location, destination):
+        # Destinos absolutos: así se comparan igual aunque cada ejecución usara otra ruta al destino
+        destination = os.path.abspath(destination) if destination else destination
+        lat, lon = coordinates if coordinates else (None, None)
+        fila = (
+            source, size, mtime_ns, date.isoformat() if date else None,
+            lat, lon, location, destination, time.time()
+        )
+        with self._lock:
+            self._conocidos[source] = (size, mtime_ns, destination)
+            self._pendientes.append(fila)
+            if len(self._pendientes) >= self.batch_size:
+                self.flush()
+
+    def update_destination(self, old_destination, new_destination, location=None):
+        """old_destination tal como está guardado; new_destination se guarda absoluto."""
+        new_destination = os.path.abspath(new_destination)
+        with self._lock:
+            self.flush()
+            with self._conn:
+                filas = self._conn.execute(
+                    "SELECT source FROM files WHERE destination = ?", (old_destination,)
+                ).fetchall()
+                self._conn.execute(
+                    "UPDATE files SET destination = ?, location = COALESCE(?, location) WHERE destination = ?",
+                    (new_destination, location, old_destination)
+                )
+            for (source,) in filas:
+                size, mtime_ns, _ = self._conocidos[source]
+                self._conocidos[source] = (size, mtime_ns, new_destination)
+
+    def merge(self, db_file):
+        """Copia las filas de otro manifiesto (p. ej. el de una parte); devuelve cuántas."""
+        with self._lock:
+            self.flush()
+            self._conn.execute("ATTACH DATABASE ? AS otro", (_read_only_uri(db_file),))
+            try:
+                with self._conn:
+                    filas = self._conn.execute(
+                        "INSERT OR REPLACE INTO files SELECT * FROM otro.files"
+                    ).rowcount
+                for source, size, mtime_ns, destination in self._conn.execute(
+                    "SELECT source, size, mtime_ns, destination FROM otro.files"
+                ):
+                    self._conocidos[source] = (size, mtime_ns, destination)
+            finally:
+                self._conn.execute("DETACH DATABASE otro")
+        return filas
+
+    def flush(self):
+        with self._lock:
+            if not self._pendientes:
+                return
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO files "
+                    "(source, size, mtime_ns, date, lat, lon, location, destination, updated) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._pendientes
+                )
+            self._pendientes.clear()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._conn.close()
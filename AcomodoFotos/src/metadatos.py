@@ -0,0 +1,321 @@
+import re
+import struct
+from datetime import datetime
+
+# Máximo de bytes que se leen del principio del archivo buscando el bloque EXIF
+EXIF_PREFIX_BYTES = 256 * 1024
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_GPS_LATITUDE_REF = 1
+TAG_GPS_LATITUDE = 2
+TAG_GPS_LONGITUDE_REF = 3
+TAG_GPS_LONGITUDE = 4
+# Tamaño en bytes de cada tipo TIFF (BYTE, ASCII, SHORT, LONG, RATIONAL...)
+TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+
+class NeedsFullParser(Exception):
+    """El lector rápido no pudo resolver el archivo; hay que usar el parser completo."""
+
+
+class CountingReader:
+    """Envuelve un archivo binario contando los bytes realmente leídos."""
+    def __init__(self, f):
+        self._f = f
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        datos = self._f.read(size)
+        self.bytes_read += len(datos)
+        return datos
+
+    def seek(self, offset, whence=0):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+
+def dms_to_decimal(degrees, minutes, seconds, direction):
+    dd = float(degrees) + float(minutes) / 60 + float(seconds) / 3600
+    if direction in ['S', 'W']:
+        dd *= -1
+    return dd
+
+
+def _find_jpeg_exif(f, max_bytes):
+    while f.tell() < max_bytes:
+        cabecera = f.read(4)
+        if len(cabecera) < 4 or cabecera[0] != 0xFF:
+            raise NeedsFullParser("estructura JPEG inesperada")
+        marcador = cabecera[1]
+        longitud = struct.unpack(">H", cabecera[2:])[0]
+        # Inicio de los datos de imagen: ya no puede haber un APP1 con EXIF
+        if marcador in (0xDA, 0xD9):
+            return None
+        if marcador == 0xE1:
+            datos = f.read(longitud - 2)
+            if datos.startswith(b"Exif\x00\x00"):
+                return datos[6:]
+        else:
+            f.seek(longitud - 2, 1)
+    raise NeedsFullParser("no se encontró EXIF en el prefijo leído")
+
+
+def _find_png_exif(f, max_bytes):
+    while f.tell() < max_bytes:
+        cabecera = f.read(8)
+        if len(cabecera) < 8:
+            return None
+        longitud, tipo = struct.unpack(">I4s", cabecera)
+        if tipo == b"eXIf":
+            datos = f.read(longitud)
+            # Algunos programas escriben el prefijo de JPEG también en PNG
+            return datos[6:] if datos.startswith(b"Exif\x00\x00") else datos
+        if tipo in (b"IDAT", b"IEND"):
+            return None
+        f.seek(longitud + 4, 1)
+    raise NeedsFullParser("no se encontró eXIf en el prefijo leído")
+
+
+class _Tiff:
+    def __init__(self, datos):
+        if datos[:2] == b"II":
+            self.orden = "<"
+        elif datos[:2] == b"MM":
+            self.orden = ">"
+        else:
+            raise NeedsFullParser("cabecera TIFF inválida")
+        self.datos = datos
+
+    def unpack(self, formato, offset):
+        return struct.unpack_from(self.orden + formato, self.datos, offset)
+
+    def ifd(self, offset):
+        entradas = {}
+        cantidad = self.unpack("H", offset)[0]
+        for i in range(cantidad):
+            base = offset + 2 + i * 12
+            tag, tipo, cuenta = self.unpack("HHI", base)
+            tamano = TIFF_TYPE_SIZES.get(tipo, 1) * cuenta
+            valor = base + 8 if tamano <= 4 else self.unpack("I", base + 8)[0]
+            entradas[tag] = (tipo, cuenta, valor)
+        return entradas
+
+    def long(self, entrada):
+        tipo, _, offset = entrada
+        return self.unpack("H" if tipo == 3 else "I", offset)[0]
+
+    def ascii(self, entrada):
+        _, cuenta, offset = entrada
+        return self.datos[offset:offset + cuenta].split(b"\x00")[0].decode("ascii", "replace").strip()
+
+    def rationals(self, entrada):
+        _, cuenta, offset = entrada
+        valores = self.unpack("I" * (2 * cuenta), offset)
+        return [valores[i] / valores[i + 1] for i in range(0, len(valores), 2)]
+
+
+def _parse_tiff(datos):
+    tiff = _Tiff(datos)
+    ifd0 = tiff.ifd(tiff.unpack("I", 4)[0])
+
+    date = None
+    if TAG_EXIF_IFD in ifd0:
+        exif = tiff.ifd(tiff.long(ifd0[TAG_EXIF_IFD]))
+        if TAG_DATETIME_ORIGINAL in exif:
+            try:
+                date = datetime.strptime(tiff.ascii(exif[TAG_DATETIME_ORIGINAL]), "%Y:%m:%d %H:%M:%S")
+            except ValueError:
+                date = None
+
+    coords = None
+    if TAG_GPS_IFD in ifd0:
+        gps = tiff.ifd(tiff.long(ifd0[TAG_GPS_IFD]))
+        if TAG_GPS_LATITUDE in gps and TAG_GPS_LONGITUDE in gps:
+            try:
+                lat_ref = tiff.ascii(gps[TAG_GPS_LATITUDE_REF]) if TAG_GPS_LATITUDE_REF in gps else 'N'
+                lon_ref = tiff.ascii(gps[TAG_GPS_LONGITUDE_REF]) if TAG_GPS_LONGITUDE_REF in gps else 'E'
+                lat = tiff.rationals(gps[TAG_GPS_LATITUDE])
+                lon = tiff.rationals(gps[TAG_GPS_LONGITUDE])
+                # Sin grados, minutos y segundos el GPS está mal formado: se ignora y se conserva la fecha
+                if len(lat) >= 3 and len(lon) >= 3:
+                    coords = (dms_to_decimal(*lat[:3], lat_ref), dms_to_decimal(*lon[:3], lon_ref))
+            except ZeroDivisionError:
+                coords = None
+    return date, coords
+
+
+def read_exif_header(f, max_bytes=EXIF_PREFIX_BYTES):
+    """
+    Lee sólo el bloque EXIF (APP1 de JPEG o eXIf de PNG) dentro de los primeros
+    max_bytes del archivo y extrae DateTimeOriginal y las coordenadas GPS, sin
+    decodificar MakerNotes ni miniaturas. Devuelve (fecha, (lat, lon)) con None
+    en lo que no exista; lanza NeedsFullParser si el formato no es reconocible.
+    """
+    firma = f.read(8)
+    if firma[:2] == b"\xff\xd8":
+        f.seek(2)
+        datos = _find_jpeg_exif(f, max_bytes)
+    elif firma == PNG_SIGNATURE:
+        datos = _find_png_exif(f, max_bytes)
+    else:
+        raise NeedsFullParser("formato no soportado por el lector rápido")
+
+    if datos is None:
+        return None, None
+    try:
+        return _parse_tiff(datos)
+    except struct.error as e:
+        raise NeedsFullParser(f"EXIF truncado o corrupto: {e}")
+
+
+# -------------------------- VIDEO (ISO-BMFF: MP4 / MOV) --------------------------
+# Segundos entre 1904-01-01 (época de QuickTime) y 1970-01-01
+QUICKTIME_EPOCH_OFFSET = 2082844800
+APPLE_LOCATION_KEY = "com.apple.quicktime.location.ISO6709"
+APPLE_CREATIONDATE_KEY = "com.apple.quicktime.creationdate"
+ISO6709_PATTERN = re.compile(r"([+-]\d+(?:\.\d+)?)([+-]\d+(?:\.\d+)?)")
+# Fracción de segundos de creationdate ("12:00:00.123+0300"), que strptime no acepta junto a %z
+_FRACTIONAL_SECONDS = re.compile(r"(T\d{2}:\d{2}:\d{2})\.\d+")
+_TOP_LEVEL_BOXES = (b"ftyp", b"moov", b"mdat", b"free", b"skip", b"wide", b"uuid", b"pnot")
+
+
+def _boxes(f, inicio, fin):
+    """Recorre las cajas hijas entre inicio y fin leyendo sólo sus cabeceras."""
+    pos = inicio
+    while pos + 8 <= fin:
+        f.seek(pos)
+        cabecera = f.read(8)
+        if len(cabecera) < 8:
+            return
+        tamano, tipo = struct.unpack(">I4s", cabecera)
+        largo_cabecera = 8
+        if tamano == 1:
+            tamano = struct.unpack(">Q", f.read(8))[0]
+            largo_cabecera = 16
+        elif tamano == 0:
+            tamano = fin - pos
+        if tamano < largo_cabecera:
+            return
+        yield tipo, pos + largo_cabecera, min(pos + tamano, fin)
+        pos += tamano
+
+
+def _parse_iso6709(texto):
+    m = ISO6709_PATTERN.match(texto.strip())
+    if not m:
+        return None
+    lat, lon = float(m.group(1)), float(m.group(2))
+    if (lat, lon) == (0.0, 0.0):
+        return None
+    return lat, lon
+
+
+def _parse_apple_date(texto):
+    try:
+        # Hora local de la cámara, igual que DateTimeOriginal en EXIF; %z acepta "+0300" y "+03:00"
+        texto = _FRACTIONAL_SECONDS.sub(r"\1", texto.strip().rstrip("\x00"))
+        return datetime.strptime(texto, "%Y-%m-%dT%H:%M:%S%z").replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _read_mvhd(f, inicio):
+    f.seek(inicio)
+    cabecera = f.read(12)
+    if len(cabecera) < 12:
+        return None
+    if cabecera[0] == 1:
+        segundos = struct.unpack(">Q", cabecera[4:12])[0]
+    else:
+        segundos = struct.unpack(">I", cabecera[4:8])[0]
+    if segundos <= QUICKTIME_EPOCH_OFFSET:
+        return None
+    # mvhd está en UTC; se convierte a hora local como los sidecars
+    return datetime.fromtimestamp(segundos - QUICKTIME_EPOCH_OFFSET)
+
+
+def _read_udta_location(f, inicio, fin):
+    for tipo, ini, fn in _boxes(f, inicio, fin):
+        if tipo == b"\xa9xyz":
+            f.seek(ini)
+            datos = f.read(min(fn - ini, 256))
+            if len(datos) > 4:
+                largo = struct.unpack(">H", datos[:2])[0]
+                return _parse_iso6709(datos[4:4 + largo].decode("utf-8", "replace"))
+    return None
+
+
+def _read_mdta_meta(f, inicio, fin):
+    """Lee las claves Apple (keys + ilst) de una caja meta de QuickTime."""
+    # En MP4 'meta' es una full box (versión y flags antes de los hijos); en QuickTime no
+    f.seek(inicio)
+    if f.read(8)[4:8] != b"hdlr":
+        inicio += 4
+
+    claves = []
+    valores = {}
+    for tipo, ini, fn in _boxes(f, inicio, fin):
+        if tipo == b"keys":
+            f.seek(ini)
+            datos = f.read(min(fn - ini, 64 * 1024))
+            cantidad = struct.unpack(">I", datos[4:8])[0]
+            pos = 8
+            for _ in range(cantidad):
+                if pos + 8 > len(datos):
+                    break
+                largo = struct.unpack(">I", datos[pos:pos + 4])[0]
+                if largo < 8:
+                    break
+                claves.append(datos[pos + 8:pos + largo].decode("utf-8", "replace"))
+                pos += largo
+        elif tipo == b"ilst":
+            for item, item_ini, item_fn in _boxes(f, ini, fn):
+                indice = struct.unpack(">I", item)[0]
+                for sub, sub_ini, sub_fn in _boxes(f, item_ini, item_fn):
+                    if sub == b"data":
+                        f.seek(sub_ini + 8)
+                        valores[indice] = f.read(min(sub_fn - sub_ini - 8, 256))
+                        break
+
+    resultado = {}
+    for indice, clave in enumerate(claves, start=1):
+        if indice in valores:
+            resultado[clave] = valores[indice].decode("utf-8", "replace")
+    return resultado
+
+
+def read_video_metadata(f, size):
+    """
+    Extrae fecha de creación y ubicación de un MP4/MOV saltando entre cajas
+    ISO-BMFF (moov/mvhd, moov/udta/©xyz y las claves Apple mdta) sin leer
+    nunca los datos multimedia: el costo no depende del tamaño del archivo.
+    """
+    date = None
+    coords = None
+    primera = True
+    for tipo, inicio, fin in _boxes(f, 0, size):
+        if primera and tipo not in _TOP_LEVEL_BOXES:
+            raise NeedsFullParser("no es un contenedor ISO-BMFF")
+        primera = False
+        if tipo != b"moov":
+            continue
+
+        fecha_apple = None
+        for hijo, ini, fn in _boxes(f, inicio, fin):
+            if hijo == b"mvhd":
+                date = _read_mvhd(f, ini)
+            elif hijo == b"udta" and coords is None:
+                coords = _read_udta_location(f, ini, fn)
+            elif hijo == b"meta":
+                claves = _read_mdta_meta(f, ini, fn)
+                if APPLE_LOCATION_KEY in claves:
+                    coords = _parse_iso6709(claves[APPLE_LOCATION_KEY]) or coords
+                if APPLE_CREATIONDATE_KEY in claves:
+                    fecha_apple = _parse_apple_date(claves[APPLE_CREATIONDATE_KEY])
+        return fecha_apple or date, coords
+    return date, coords
@@ -0,0 +1,197 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Funciones listadas en el informe de perfil y de muestreo
+TOP_FUNCTIONS = 25
+# Marcos de estas rutas (o funciones) no cuentan en el muestreo: son hilos esperando en una cola
+_ESPERA = (os.sep + "threading.py", os.sep + "queue.py")
+_ESPERA_FUNCIONES = ("dequeue",)
+
+
+class Metrics:
+    """
+    Contadores y tiempos acumulados por etapa, pensados para llamarse por archivo:
+    cada registro es un perf_counter y una suma bajo un lock. Opcionalmente
+    perfila cada hilo con cProfile o muestrea periódicamente qué se ejecuta.
+    """
+    def __init__(self, profile=False, sample_interval=None):
+        self._lock = threading.Lock()
+        self.counters = Counter()
+        self.timers = {}
+        self.started = time.perf_counter()
+        self.finished = None
+        self.profile = profile
+        self._perfiles = []
+        self._muestreador = Sampler(sample_interval) if sample_interval else None
+
+    def count(self, name, n=1):
+        with self._lock:
+            self.counters[name] += n
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            total = self.timers.get(stage)
+            if total is None:
+                self.timers[stage] = [1, seconds, seconds]
+            else:
+                total[0] += 1
+                total[1] += seconds
+                if seconds > total[2]:
+                    total[2] = seconds
+
+    @contextmanager
+    def timer(self, stage):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.perf_counter() - inicio)
+
+    # ---------------- Perfilado ----------------
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self._muestreador:
+            self._muestreador.start()
+
+    def stop(self):
+        self.finished = time.perf_counter()
+        if self._muestreador:
+            self._muestreador.stop()
+
+    def profiled(self, funcion):
+        """Envuelve el cuerpo de un hilo para perfilarlo con cProfile si está activado."""
+        if not self.profile:
+            return funcion
+
+        def envoltura(*args, **kwargs):
+            perfil = cProfile.Profile()
+            perfil.enable()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                perfil.disable()
+                with self._lock:
+                    self._perfiles.append(perfil)
+        return envoltura
+
+    def profile_stats(self):
+        """pstats.Stats con los perfiles de todos los hilos, o None."""
+        with self._lock:
+            perfiles = list(self._perfiles)
+        if not perfiles:
+            return None
+        stats = pstats.Stats(perfiles[0], stream=io.StringIO())
+        for perfil in perfiles[1:]:
+            stats.add(perfil)
+        return stats
+
+    # ---------------- Informe ----------------
+
+    def report(self, **extra):
+        fin = self.finished or time.perf_counter()
+        with self._lock:
+            etapas = {
+                etapa: {
+                    "calls": n,
+                    "seconds": round(total, 4),
+                    "avg_ms": round(total / n * 1000, 3),
+                    "max_ms": round(maximo * 1000, 3),
+                }
+                for etapa, (n, total, maximo) in sorted(self.timers.items())
+            }
+            contadores = dict(sorted(self.counters.items()))
+        informe = {"wall_seconds": round(fin - self.started, 3), "stages": etapas, "counters": contadores}
+        informe.update(extra)
+
+        stats = self.profile_stats()
+        if stats is not None:
+            salida = io.StringIO()
+            stats.stream = salida
+            stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+            informe["profile"] = salida.getvalue()
+        if self._muestreador:
+            informe["samples"] = self._muestreador.top(TOP_FUNCTIONS)
+        return informe
+
+    def write_report(self, path, informe):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(informe, f, indent=2, ensure_ascii=False, default=str)
+        stats = self.profile_stats()
+        if stats is not None:
+            stats.dump_stats(os.path.splitext(path)[0] + ".prof")
+
+
+def format_report(informe):
+    """Resumen en texto del informe, para el log y la interfaz."""
+    segundos = informe["wall_seconds"]
+    contadores = informe["counters"]
+    archivos = contadores.get("files", 0)
+    lineas = [
+        f"Tiempo total: {segundos:.1f} s; {archivos} archivos "
+        f"({archivos / segundos if segundos else 0:.1f} archivos/s)",
+        f"Copiados: {contadores.get('copied', 0)} ({contadores.get('bytes_written', 0) / 1048576:.1f} MB), "
+        f"duplicados: {contadores.get('duplicates', 0)}, sin cambios: {contadores.get('skipped', 0)}",
+    ]
+    cache = informe.get("cache")
+    if cache:
+        consultas = cache["exact_hits"] + cache["nearby_hits"] + cache["misses"]
+        aciertos = (cache["exact_hits"] + cache["nearby_hits"]) / consultas * 100 if consultas else 0
+        lineas.append(
+            f"Caché de ubicaciones: {aciertos:.0f}% de aciertos; "
+            f"llamadas a la API: {contadores.get('geocode_api_calls', 0)}"
+        )
+    for etapa, datos in informe["stages"].items():
+        lineas.append(
+            f"  {etapa}: {datos['seconds']:.2f} s en {datos['calls']} llamadas "
+            f"({datos['avg_ms']:.2f} ms de media, {datos['max_ms']:.1f} ms máx.)"
+        )
+    for grupo, datos in (informe.get("copy_devices") or {}).items():
+        segundos_grupo = datos["busy_seconds"]
+        lineas.append(
+            f"  copia {grupo}: {datos['files']} archivos con {datos['workers']} hilos, "
+            f"{datos['bytes'] / 1048576 / segundos_grupo * datos['workers'] if segundos_grupo else 0:.1f} MB/s"
+        )
+    return "\n".join(lineas)
+
+
+class Sampler:
+    """
+    Muestreo estadístico barato: cada `interval` segundos anota la función que
+    ejecuta cada hilo activo (ignorando los que esperan en una cola).
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = Counter()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def start(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._run, name="muestreo", daemon=True)
+        self._hilo.start()
+
+    def stop(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+
+    def _run(self):
+        propio = threading.get_ident()
+        while not self._detener.wait(self.interval):
+            for ident, marco in sys._current_frames().items():
+                codigo = marco.f_code
+                if ident == propio or codigo.co_filename.endswith(_ESPERA) or codigo.co_name in _ESPERA_FUNCIONES:
+                    continue
+                self.samples[f"{os.path.basename(codigo.co_filename)}:{codigo.co_name}:{marco.f_lineno}"] += 1
+
+    def top(self, n):
+        return dict(self.samples.most_common(n))
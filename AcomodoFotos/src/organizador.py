@@ -1,110 +1,401 @@
 import os
+import argparse
+import importlib
+import itertools
 import logging
 import shutil
-import re
+import sys
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from PIL import Image
-from PIL.ExifTags import TAGS
-import exifread
-from opencage.geocoder import OpenCageGeocode
-import sqlite3
+from cache_ubicaciones import LocationCache, PROXIMITY_RADIUS_M
+from geocodificacion import OPENCAGE_RATE_LIMIT, TokenBucket, reverse_geocode
+from manifiesto import MANIFEST_FILENAME, Manifest
+from deduplicacion import ContentIndex, same_content
+from transferencia import TRANSFER_MODES, Transferer
+from metadatos import (
+    CountingReader, NeedsFullParser, dms_to_decimal, read_exif_header, read_video_metadata
+)
+from sidecars import safe_read_sidecar
+from comprimidos import ARCHIVE_WORKERS, is_archive, scan_archives
+from escaner import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS, build_work_manifest, scan_media
+from indice_fechas import SIN_UBICACION, DateLocationIndex, date_folder
+from metricas import Metrics, format_report
+from particion import Finalizer, finalize, parse_shard, shard_filename, shard_of
+from plan import EXECUTOR_WORKERS, PlanWriter, apply_plan, dump_plan, summarize_plan
+from programador import ROTATIONAL_STREAMS, SCHEDULER_WINDOW, CopyScheduler
+from registro import DEFAULT_LOG_LEVEL, PeriodicSummary, progress_notifier, setup_logging
+from similares import ACTIONS as NEAR_DUPLICATE_ACTIONS, HAMMING_THRESHOLD, HASH_WORKERS, find_near_duplicates
+from vigilancia import DEBOUNCE_S, MAX_BATCH_WAIT_S, POLL_INTERVAL_S, watch
 
 # -------------------------- CONSTANTES --------------------------
-IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
-VIDEO_EXTENSIONS = ('.mp4', '.mov', '.mkv', '.avi')
+# Contenedores ISO-BMFF cuyos metadatos se leen sin tocar los datos de video
+ISO_BMFF_EXTENSIONS = ('.mp4', '.mov')
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 LOG_FILE = os.path.join(PROJECT_ROOT, "organizacion.log")
 DATABASE_FILE = os.path.join(PROJECT_ROOT, "location_cache.db")
-FECHA_REGEX_PATTERN = re.compile(r'^\d{2}-\d{2}-\d{2}$')
+
+# Hilos por etapa del pipeline y tamaño de las colas que las conectan
+METADATA_WORKERS = 4
+LOCATION_WORKERS = 2
+COPY_WORKERS = 4
+QUEUE_SIZE = 256
+# "inline": geocodifica cada archivo al llegar; "batch": deduplica y resuelve todas las coordenadas antes de copiar
+RESOLVE_MODES = ("inline", "batch")
+_FIN_DE_COLA = object()
+# Informe de métricas que se deja en la carpeta destino al terminar
+REPORT_FILENAME = ".organizador_informe.json"
+# Carpeta temporal (dentro del destino) donde se extraen los miembros de los comprimidos
+STAGING_DIRNAME = ".organizador_staging"
+
+# Dependencias pesadas que se importan al primer uso y no al cargar el módulo (ver preload())
+LAZY_MODULES = ("exifread", "opencage.geocoder")
 
 OPENCAGE_API_KEY = ""
 BASE_FOLDER = ""
 OUTPUT_FOLDER = ""
 
+
+class OrganizacionCancelada(Exception):
+    """Se lanza desde organize() cuando la organización se detiene con cancel()."""
+
+
+class _Trabajo:
+    """Archivo que avanza por las etapas del pipeline de organización."""
+    __slots__ = ("file_path", "file_name", "size", "mtime_ns", "sidecar", "source", "staged", "dev", "ino",
+                 "date", "coordinates", "location_folder", "target_folder", "dest_path", "copied")
+
+    def __init__(self, file_path, file_name, size=None, mtime_ns=None, sidecar=None, source=None,
+                 dev=None, ino=None):
+        self.file_path = file_path
+        # source: identidad en el manifiesto; si difiere de file_path, éste es una copia extraída
+        self.source = source or file_path
+        self.staged = self.source != file_path
+        self.file_name = file_name
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.sidecar = sidecar
+        # Dispositivo e inodo de file_path (del escaneo): el programador de copias agrupa y ordena por ellos
+        self.dev = dev
+        self.ino = ino
+        self.date = None
+        self.coordinates = None
+        self.location_folder = SIN_UBICACION
+        self.target_folder = None
+        self.dest_path = None
+        self.copied = False
+
+
 class PhotoVideoOrganizer:
-    def __init__(self, api_key, base_folder, output_folder, progress_callback=None):
+    def __init__(self, api_key, base_folder, output_folder, progress_callback=None,
+                 metadata_workers=METADATA_WORKERS, location_workers=LOCATION_WORKERS,
+                 copy_workers=COPY_WORKERS, cache_radius_m=PROXIMITY_RADIUS_M,
+                 resolve_mode="inline", geocoder=None, geocode_rate=OPENCAGE_RATE_LIMIT,
+                 gazetteer=None, incremental=True, transfer_mode="copy", log_level=DEFAULT_LOG_LEVEL,
+                 profile=False, sample_interval=None, archives=None, archive_workers=ARCHIVE_WORKERS,
+                 shard=None, near_duplicates=None, rotational_streams=ROTATIONAL_STREAMS, copy_buffer=None,
+                 scheduler_window=SCHEDULER_WINDOW):
+        if resolve_mode not in RESOLVE_MODES:
+            raise ValueError(f"Modo de resolución desconocido: {resolve_mode}")
+
         self.api_key = api_key
         self.base_folder = base_folder
-        self.output_folder = output_folder
-        self.progress_callback = progress_callback
+        # Absoluta: los destinos se guardan así en el manifiesto y en los planes
+        self.output_folder = os.path.abspath(output_folder)
+        # Se llama con los bytes de cada archivo terminado; también admite funciones sin argumentos
+        self.progress_callback = progress_notifier(progress_callback)
+        self.metadata_workers = max(1, metadata_workers)
+        self.location_workers = max(1, location_workers)
+        self.copy_workers = max(1, copy_workers)
+        # copy_workers vale para SSD y red; en discos giratorios se usan rotational_streams (programador.py)
+        self.rotational_streams = max(1, rotational_streams)
+        self.scheduler_window = scheduler_window
+        self.cache_radius_m = cache_radius_m
+        self.resolve_mode = resolve_mode
+        self.rate_limiter = TokenBucket(geocode_rate) if geocode_rate else None
+        self.incremental = incremental
+        self.transferer = Transferer(transfer_mode, copy_buffer)
+        # Comprimidos de Takeout (.zip/.tgz) a leer sin descomprimirlos antes; base_folder puede ser uno
+        self.archives = list(archives or [])
+        if is_archive(base_folder):
+            self.archives.insert(0, base_folder)
+        self.archive_workers = archive_workers
+        # Los miembros extraídos ya están en el sistema de archivos destino: siempre se mueven
+        self.staged_transferer = Transferer("move")
+        # (i, N): sólo se organiza la parte i de N; el reparto por fecha lo hace particion.finalize()
+        self.shard = shard
+        # "report"/"move": busca fotos casi idénticas en el destino al terminar (similares.py)
+        self.near_duplicates = near_duplicates
+        self.manifest = None
+        self.content_index = None
+        self.date_index = None
+        self.plan_writer = None
+        # profile: cProfile en cada hilo; sample_interval: segundos entre muestras del muestreador
+        self.profile = profile
+        self.sample_interval = sample_interval
+        self.last_report = None
+        self.copy_devices = {}
+        self._carpetas_creadas = set()
+        self._en_sesion = False
+        self._reset_stats()
 
-        self._init_logging()
-        self._init_database()
+        self._detener = threading.Event()
+        self._cancelado = threading.Event()
+        self._error = None
+        self._hilos = []
+        self._destinos_lock = threading.Lock()
+        self._destinos_reservados = set()
+        self._stats_lock = threading.Lock()
 
-        self.geocoder = OpenCageGeocode(self.api_key)
+        self._init_logging(log_level)
+        # La caché de ubicaciones y el geocodificador se crean al primer uso (ver location_cache y
+        # geocoder): abrir la base de datos o cargar el cliente de OpenCage retrasaba el arranque
+        self._database_file = DATABASE_FILE
+        self._location_cache = None
+        self._gazetteer = gazetteer
+        self._geocoder = geocoder
+        self._init_lock = threading.Lock()
+        if gazetteer:
+            # Backend offline: sin red ni API key, por lo que no hace falta limitar el ritmo
+            self.rate_limiter = None
 
         logging.info("PhotoVideoOrganizer inicializado.")
         logging.debug(f"Carpeta base: {self.base_folder}")
         logging.debug(f"Carpeta destino: {self.output_folder}")
 
-    def organize(self):
+    def organize(self, entries=None):
+        """
+        Organiza base_folder. entries puede ser la lista (o un generador) de MediaEntry
+        ya obtenida con escaner.scan_media para no recorrer la carpeta dos veces.
+        """
         logging.info("Iniciando organización de archivos...")
-        self._organize_files()
-        logging.info("Organización inicial completada. Unificando 'Sin_Ubicacion'...")
-        self._unir_sin_ubicacion()
+        if self.shard is not None:
+            logging.info(f"Organizando la parte {self.shard[0]} de {self.shard[1]}.")
+        os.makedirs(self.output_folder, exist_ok=True)
+        self._run(entries)
+        if self.near_duplicates and self.shard is None:
+            # Con partes, cada una ve sólo lo suyo: se busca tras "finalizar" con el comando "similares"
+            find_near_duplicates(self.output_folder, self.near_duplicates)
         logging.info("Proceso completado.")
 
-    def _init_logging(self):
-        logging.basicConfig(
-            filename=LOG_FILE,
-            level=logging.DEBUG,
-            format='%(asctime)s [%(levelname)s] %(message)s',
-            datefmt='%d-%m-%Y %H:%M:%S'
-        )
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(logging.DEBUG)
-        console_formatter = logging.Formatter(
-            '%(asctime)s [%(levelname)s] %(message)s', '%d-%m-%Y %H:%M:%S'
+    def plan(self, plan_file, entries=None):
+        """
+        Igual que organize() pero sin tocar el destino: decide dónde iría cada archivo
+        y lo guarda en plan_file (SQLite) para revisarlo o aplicarlo con plan.apply_plan.
+        """
+        if self.archives:
+            raise ValueError("La planificación no admite comprimidos como origen; extráelos primero.")
+        if self._en_sesion:
+            raise ValueError("No se puede planificar durante una sesión de vigilancia.")
+        logging.info(f"Planificando organización en {plan_file}...")
+        self.plan_writer = PlanWriter(plan_file, self.base_folder, self.output_folder, self.transferer.mode)
+        try:
+            self._run(entries)
+            logging.info(f"Plan guardado en {plan_file}: {self.plan_writer.steps} archivos.")
+        finally:
+            self.plan_writer.close()
+            self.plan_writer = None
+
+    def start_session(self):
+        """
+        Mantiene abiertos el manifiesto y los índices de contenidos y de fechas entre
+        varias llamadas a organize() (modo vigilancia): cada lote sólo carga lo suyo.
+        """
+        os.makedirs(self.output_folder, exist_ok=True)
+        self._open_manifest()
+        self._load_indexes()
+        self._en_sesion = True
+
+    def end_session(self):
+        self._en_sesion = False
+        self._close_manifest()
+
+    def relocate_unlocated(self):
+        """
+        Mueve de "Sin_Ubicacion" los archivos de ejecuciones (o lotes) anteriores
+        cuya fecha ya tiene ubicación. Sale del manifiesto: no recorre el destino.
+        """
+        movidos = Finalizer(self.output_folder).relocate(self.manifest, self.date_index)
+        for anterior, nuevo in movidos:
+            self.content_index.rename(anterior, nuevo, os.path.getsize(nuevo))
+        if movidos:
+            logging.info(f"{len(movidos)} archivos movidos de {SIN_UBICACION} a la ubicación de su fecha.")
+        return movidos
+
+    def _open_manifest(self):
+        manifest_file = os.path.join(self.output_folder, shard_filename(MANIFEST_FILENAME, self.shard))
+        if self.plan_writer is None:
+            self.manifest = Manifest(manifest_file)
+        else:
+            # También se planifica con el manifiesto (decide qué archivos no cambiaron), pero un
+            # plan no toca el destino: se trabaja con una copia en memoria, leída sin escribir
+            self.manifest = Manifest(":memory:")
+            if os.path.exists(manifest_file):
+                self.manifest.merge(manifest_file)
+        if self.shard is not None:
+            # Cada parte escribe su manifiesto, pero conoce lo que ya unió finalize()
+            self.manifest.preload(os.path.join(self.output_folder, MANIFEST_FILENAME))
+
+    def _close_manifest(self):
+        if self.manifest is not None:
+            self.manifest.close()
+            self.manifest = None
+
+    def _load_indexes(self):
+        self.content_index = ContentIndex(hash_sources=self.plan_writer is not None)
+        for destination, size in self.manifest.destinations():
+            self.content_index.add(destination, size)
+        self.date_index = DateLocationIndex()
+        for source, date, location in self.manifest.located_files():
+            self.date_index.add(source, date, location)
+
+    def _run(self, entries):
+        if not self._en_sesion:
+            self._open_manifest()
+            self._load_indexes()
+        try:
+            self._organize_files(entries)
+            if self.shard is None and self.plan_writer is None:
+                # Las partes lo dejan para particion.finalize(); un plan no mueve nada
+                self.relocate_unlocated()
+            self._log_summary()
+            self._write_report()
+        finally:
+            if self._location_cache is not None:
+                self._location_cache.flush()
+            if self._en_sesion:
+                self.manifest.flush()
+            else:
+                self._close_manifest()
+            # Quedan sólo los extraídos que resultaron duplicados
+            shutil.rmtree(self._staging_dir(), ignore_errors=True)
+
+    def cancel(self):
+        """
+        Pide detener la organización en curso. Se puede llamar desde cualquier hilo:
+        los archivos que se están copiando terminan y organize() lanza OrganizacionCancelada.
+        """
+        self._cancelado.set()
+        self._abort(OrganizacionCancelada("Organización cancelada por el usuario"))
+
+    def stop_pipeline(self):
+        """
+        Detiene y espera las etapas de la última organize(). Tras un KeyboardInterrupt
+        siguen vivas y escribiendo en el manifiesto: se llama antes de cerrarlo.
+        """
+        self._detener.set()
+        for hilo in self._hilos:
+            hilo.join()
+        self._hilos = []
+
+    def _reset_stats(self):
+        self.skipped_files = 0
+        self.sidecar_files = 0
+        self.duplicate_files = 0
+        self.duplicate_bytes = 0
+        self.renamed_files = 0
+        self.merged_files = 0
+        self.metrics = Metrics(self.profile, self.sample_interval)
+        # Por tipo de lectura ("EXIF", "video"): archivos, con parser completo, bytes y segundos
+        self.read_stats = {
+            tipo: {"files": 0, "full_parses": 0, "bytes": 0, "seconds": 0.0}
+            for tipo in ("EXIF", "video")
+        }
+
+    def _log_summary(self):
+        if self.incremental:
+            logging.info(f"Archivos sin cambios desde la ejecución anterior omitidos: {self.skipped_files}")
+        logging.info(
+            f"Duplicados por contenido: {self.duplicate_files} "
+            f"({self.duplicate_bytes / 1048576:.1f} MB no copiados); "
+            f"renombrados por colisión de nombre: {self.renamed_files}"
         )
-        console_handler.setFormatter(console_formatter)
-        logging.getLogger().addHandler(console_handler)
-
-    def _init_database(self):
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS location_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                lat REAL,
-                lon REAL,
-                city TEXT,
-                state TEXT
+        logging.info(f"Archivos con metadatos de sidecar de Takeout: {self.sidecar_files}")
+        logging.info(f"Archivos sin ubicación colocados con la ubicación de su fecha: {self.merged_files}")
+        for tipo, stats in self.read_stats.items():
+            if stats["files"]:
+                logging.info(
+                    f"{tipo}: {stats['files']} archivos, {stats['full_parses']} con el parser completo, "
+                    f"{stats['bytes'] / stats['files'] / 1024:.1f} KB y "
+                    f"{stats['seconds'] / stats['files'] * 1000:.2f} ms de media por archivo"
+                )
+        if self.transferer.counts:
+            modos = ", ".join(f"{modo}: {n}" for modo, n in sorted(self.transferer.counts.items()))
+            logging.info(f"Transferencias por modo ({self.transferer.mode} solicitado): {modos}")
+        if self.staged_transferer.counts:
+            movidos = sum(self.staged_transferer.counts.values())
+            logging.info(f"Archivos extraídos de {len(self.archives)} comprimidos y movidos a su destino: {movidos}")
+        # Sin coordenadas que resolver la caché ni siquiera se abrió
+        if self._location_cache is not None:
+            stats = self._location_cache.stats()
+            logging.info(
+                f"Caché de ubicaciones: {stats['exact_hits']} aciertos exactos, "
+                f"{stats['nearby_hits']} por cercanía, {stats['misses']} fallos; "
+                f"la búsqueda por cercanía evitó {stats['api_calls_saved']} llamadas a la API."
             )
-            """
-        )
-        conn.commit()
-        conn.close()
 
-    @staticmethod
-    def _save_location_to_cache(lat, lon, city, state):
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO location_cache (lat, lon, city, state) VALUES (?, ?, ?, ?)",
-            (lat, lon, city, state)
+    def _write_report(self):
+        """Guarda el informe de métricas (JSON) y registra su resumen en texto."""
+        informe = self.metrics.report(
+            mode="plan" if self.plan_writer is not None else "organize",
+            transfer_mode=self.transferer.mode,
+            transfers=dict(self.transferer.counts),
+            archive_transfers=dict(self.staged_transferer.counts),
+            copy_buffer=self.transferer.buffer_size,
+            copy_devices=self.copy_devices,
+            cache=self._location_cache.stats() if self._location_cache is not None else None,
+            reads=self.read_stats,
+            duplicate_bytes=self.duplicate_bytes,
+            renamed=self.renamed_files,
+            merged_by_date=self.merged_files,
+            sidecars=self.sidecar_files,
         )
-        conn.commit()
-        conn.close()
+        self.last_report = informe
+        if self.plan_writer is not None:
+            path = os.path.splitext(self.plan_writer.plan_file)[0] + "_informe.json"
+        else:
+            path = os.path.join(self.output_folder, shard_filename(REPORT_FILENAME, self.shard))
+        try:
+            self.metrics.write_report(path, informe)
+        except OSError as e:
+            logging.error(f"No se pudo guardar el informe {path}: {e}")
+        for linea in format_report(informe).splitlines():
+            logging.info(linea)
+        logging.info(f"Informe de métricas guardado en {path}")
 
-    @staticmethod
-    def _get_location_from_cache(lat, lon):
-        conn = sqlite3.connect(DATABASE_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT city, state FROM location_cache WHERE lat = ? AND lon = ?",
-            (lat, lon)
-        )
-        result = cursor.fetchone()
-        conn.close()
-        return result
+    def _init_logging(self, log_level):
+        setup_logging(LOG_FILE, log_level)
 
-    @staticmethod
-    def _dms2dd(degrees, minutes, seconds, direction):
-        dd = float(degrees) + float(minutes)/60 + float(seconds)/3600
-        if direction in ['S', 'W']:
-            dd *= -1
-        return dd
+    @property
+    def location_cache(self):
+        if self._location_cache is None:
+            with self._init_lock:
+                if self._location_cache is None:
+                    self._location_cache = LocationCache(self._database_file, radius_m=self.cache_radius_m)
+        return self._location_cache
+
+    @property
+    def geocoder(self):
+        if self._geocoder is None:
+            with self._init_lock:
+                if self._geocoder is None:
+                    self._geocoder = self._create_geocoder()
+        return self._geocoder
+
+    def _create_geocoder(self):
+        if self._gazetteer:
+            from gazetteer import OfflineGeocoder
+            return OfflineGeocoder(self._gazetteer)
+        from opencage.geocoder import OpenCageGeocode
+        return OpenCageGeocode(self.api_key)
+
+    def close(self):
+        if self._en_sesion:
+            self.end_session()
+        if self._location_cache is not None:
+            self._location_cache.close()
 
     def _parse_gps_info(self, gps_info):
         def _extract_dms(rational_list):
@@ -122,12 +413,12 @@ class PhotoVideoOrganizer:
             if "GPSLatitude" in gps_info:
                 d, m, s = _extract_dms(gps_info["GPSLatitude"].values)
                 lat_dir = lat_ref.printable if lat_ref else 'N'
-                lat = self._dms2dd(d, m, s, lat_dir)
+                lat = dms_to_decimal(d, m, s, lat_dir)
 
             if "GPSLongitude" in gps_info:
                 d, m, s = _extract_dms(gps_info["GPSLongitude"].values)
                 lon_dir = lon_ref.printable if lon_ref else 'E'
-                lon = self._dms2dd(d, m, s, lon_dir)
+                lon = dms_to_decimal(d, m, s, lon_dir)
 
             if lat is not None and lon is not None:
                 return (lat, lon)
@@ -136,13 +427,17 @@ class PhotoVideoOrganizer:
         return None
 
     def _get_city_state_name(self, lat, lon):
-        cached_location = self._get_location_from_cache(lat, lon)
+        cached_location = self.location_cache.get(lat, lon)
         if cached_location:
             city, state = cached_location
             return f"{city} - {state}"
+        return self._geocode_location(*self.location_cache.anchor(lat, lon))
 
+    def _geocode_location(self, lat, lon):
         try:
-            results = self.geocoder.reverse_geocode(lat, lon)
+            self.metrics.count("geocode_api_calls")
+            with self.metrics.timer("geocode_api"):
+                results = reverse_geocode(self.geocoder, lat, lon, self.rate_limiter)
             if results and 'components' in results[0]:
                 components = results[0]['components']
                 city = (
@@ -153,124 +448,684 @@ class PhotoVideoOrganizer:
                 )
                 state = components.get('state')
                 if city and state:
-                    self._save_location_to_cache(lat, lon, city, state)
+                    self.location_cache.put(lat, lon, city, state)
                     return f"{city} - {state}"
         except Exception as e:
             logging.error(f"Error al convertir coordenadas: {e}")
 
-        return "Sin_Ubicacion"
+        return SIN_UBICACION
+
+    def _resolve_batch(self, trabajos):
+        coordenadas = {t.coordinates for t in trabajos if t.coordinates}
+        resueltas = {}
+        grupos = {}
+        for coords in coordenadas:
+            cached_location = self.location_cache.get(*coords)
+            if cached_location:
+                resueltas[coords] = f"{cached_location[0]} - {cached_location[1]}"
+            else:
+                grupos.setdefault(self.location_cache.anchor(*coords), []).append(coords)
+
+        logging.info(
+            f"Resolución por lotes: {len(coordenadas)} coordenadas distintas, "
+            f"{len(grupos)} consultas a la API."
+        )
+
+        # Una consulta por grupo de coordenadas cercanas; el limitador regula el ritmo global
+        with ThreadPoolExecutor(max_workers=self.location_workers) as pool:
+            futuros = {
+                pool.submit(self._geocode_location, *ancla): grupo
+                for ancla, grupo in grupos.items()
+            }
+            for futuro in as_completed(futuros):
+                nombre = futuro.result()
+                for coords in futuros[futuro]:
+                    resueltas[coords] = nombre
+
+        for trabajo in trabajos:
+            if trabajo.coordinates:
+                trabajo.location_folder = resueltas[trabajo.coordinates]
 
     def _get_metadata_from_exif(self, image_path):
         date = None
         location = None
+        completo = False
+        inicio = time.perf_counter()
+        img_file = None
         try:
-            with open(image_path, 'rb') as img_file:
-                tags = exifread.process_file(img_file)
-                if "EXIF DateTimeOriginal" in tags:
-                    date_str = tags["EXIF DateTimeOriginal"].values
-                    date = datetime.strptime(date_str, "%Y:%m:%d %H:%M:%S")
-
-                gps_info = {}
-                for tag, value in tags.items():
-                    if tag.startswith("GPS"):
-                        gps_info[tag] = value
-                if gps_info:
-                    coords = self._parse_gps_info(gps_info)
-                    if coords:
-                        location = coords
+            with open(image_path, 'rb') as f:
+                img_file = CountingReader(f)
+                try:
+                    date, location = read_exif_header(img_file)
+                except NeedsFullParser as e:
+                    logging.debug("Lector EXIF rápido no aplicable a %s: %s", image_path, e)
+                    completo = True
+                    img_file.seek(0)
+                    date, location = self._get_metadata_from_exifread(img_file)
         except Exception as e:
             logging.error(f"Error al leer EXIF de {image_path}: {e}")
+
+        self._record_read("EXIF", image_path, completo, img_file, time.perf_counter() - inicio)
+        return date, location
+
+    def _get_metadata_from_video(self, video_path):
+        date = None
+        location = None
+        inicio = time.perf_counter()
+        video_file = None
+        try:
+            with open(video_path, 'rb') as f:
+                video_file = CountingReader(f)
+                date, location = read_video_metadata(video_file, os.fstat(f.fileno()).st_size)
+        except NeedsFullParser as e:
+            logging.debug("Sin metadatos de video legibles en %s: %s", video_path, e)
+        except Exception as e:
+            logging.error(f"Error al leer metadatos de video de {video_path}: {e}")
+
+        self._record_read("video", video_path, False, video_file, time.perf_counter() - inicio)
         return date, location
 
-    def _get_final_metadata(self, file_path):
+    def _record_read(self, tipo, path, completo, lector, duracion):
+        leidos = lector.bytes_read if lector else 0
+        with self._stats_lock:
+            stats = self.read_stats[tipo]
+            stats["files"] += 1
+            stats["full_parses"] += completo
+            stats["bytes"] += leidos
+            stats["seconds"] += duracion
+        # Registros por archivo con formato diferido: si DEBUG está desactivado no cuestan nada
+        logging.debug(
+            "%s %s de %s: %.2f ms, %d bytes leídos",
+            tipo, "completo" if completo else "rápido", path, duracion * 1000, leidos
+        )
+
+    def _get_metadata_from_exifread(self, img_file):
+        date = None
+        location = None
+        # Sin MakerNotes ni miniaturas: sólo se usan la fecha y el GPS
+        import exifread
+        tags = exifread.process_file(img_file, details=False, extract_thumbnail=False)
+        if "EXIF DateTimeOriginal" in tags:
+            date_str = tags["EXIF DateTimeOriginal"].values
+            date = datetime.strptime(date_str, "%Y:%m:%d %H:%M:%S")
+
+        # exifread nombra las etiquetas "GPS GPSLatitude"; _parse_gps_info espera "GPSLatitude"
+        gps_info = {}
+        for tag, value in tags.items():
+            if tag.startswith("GPS "):
+                gps_info[tag[4:]] = value
+        if gps_info:
+            coords = self._parse_gps_info(gps_info)
+            if coords:
+                location = coords
+        return date, location
+
+    def _get_final_metadata(self, file_path, sidecar=None):
         _, ext = os.path.splitext(file_path)
         ext = ext.lower()
 
         date, location = None, None
+        if sidecar:
+            # El sidecar de Takeout es la fuente principal; el archivo sólo se abre si le falta algo
+            date, location = safe_read_sidecar(sidecar)
+            with self._stats_lock:
+                self.sidecar_files += 1
+            if date is not None and location is not None:
+                return date, location
+
         if ext in IMAGE_EXTENSIONS:
-            date_exif, coords_exif = self._get_metadata_from_exif(file_path)
-            if date_exif is not None:
-                date = date_exif
-            if coords_exif is not None:
-                location = coords_exif
+            date_file, coords_file = self._get_metadata_from_exif(file_path)
+        elif ext in ISO_BMFF_EXTENSIONS:
+            date_file, coords_file = self._get_metadata_from_video(file_path)
+        else:
+            return date, location
+
+        if date is None and date_file is not None:
+            date = date_file
+        if location is None and coords_file is not None:
+            location = coords_file
 
         return date, location
 
-    def _organize_files(self):
-        if not os.path.exists(self.output_folder):
-            os.makedirs(self.output_folder)
+    def _organize_files(self, entries=None):
+        self._detener.clear()
+        self._error = None
+        self._destinos_reservados.clear()
+        self._carpetas_creadas.clear()
+        self._reset_stats()
+        if self._cancelado.is_set():
+            raise OrganizacionCancelada("Organización cancelada por el usuario")
+        self.metrics.start()
 
-        for root, _, files in os.walk(self.base_folder):
-            for file_name in files:
-                file_path = os.path.join(root, file_name)
-                ext = os.path.splitext(file_name)[1].lower()
+        # escaneo -> metadatos -> ubicación -> planificación -> copia, unidas por colas acotadas
+        cola_metadatos = queue.Queue(maxsize=QUEUE_SIZE)
+        cola_ubicacion = queue.Queue(maxsize=QUEUE_SIZE)
+        cola_planificacion = queue.Queue(maxsize=QUEUE_SIZE)
+        cola_copia = queue.Queue(maxsize=QUEUE_SIZE)
+        cola_resultados = queue.Queue()
 
-                if ext in IMAGE_EXTENSIONS or ext in VIDEO_EXTENSIONS:
-                    date, coordinates = self._get_final_metadata(file_path)
+        escaneo = threading.Thread(
+            target=self.metrics.profiled(self._scan_files), args=(cola_metadatos, cola_resultados, entries),
+            name="escaneo", daemon=True
+        )
+        # Se guardan para stop_pipeline(): un KeyboardInterrupt sale de aquí sin esperarlos
+        self._hilos = hilos = [escaneo]
+        hilos += self._start_stage(
+            "metadatos", self._extract_metadata, cola_metadatos, cola_ubicacion, self.metadata_workers
+        )
+        escaneo.start()
 
-                    location_folder = "Sin_Ubicacion"
-                    if coordinates:
-                        location_folder = self._get_city_state_name(*coordinates)
+        if self.resolve_mode == "batch":
+            # Primero se reúnen todos los metadatos, luego se geocodifica y al final se copia
+            trabajos = self._collect(cola_ubicacion)
+            if not self._detener.is_set():
+                with self.metrics.timer("ubicacion_lotes"):
+                    self._resolve_batch(trabajos)
+            alimentador = threading.Thread(
+                target=self._feed, args=(trabajos, cola_planificacion), name="alimentador", daemon=True
+            )
+            alimentador.start()
+            hilos.append(alimentador)
+        else:
+            hilos += self._start_stage(
+                "ubicacion", self._resolve_location, cola_ubicacion, cola_planificacion,
+                self.location_workers
+            )
+        planificador = threading.Thread(
+            target=self.metrics.profiled(self._plan_locations), args=(cola_planificacion, cola_copia),
+            name="planificacion", daemon=True
+        )
+        planificador.start()
+        hilos.append(planificador)
+        programador = CopyScheduler(
+            self._copy_file, cola_resultados, _FIN_DE_COLA, self._output_device(), self._detener, self._abort,
+            self.metrics, self.copy_workers, self.rotational_streams, self.scheduler_window,
+            prepare=self._prepare_folders
+        )
+        hilo_programador = threading.Thread(
+            target=self.metrics.profiled(programador.run), args=(cola_copia,), name="programador", daemon=True
+        )
+        hilo_programador.start()
+        hilos.append(hilo_programador)
 
-                    date_folder = "Sin_Fecha"
-                    if date:
-                        date_folder = date.strftime('%d-%m-%y')
+        # El callback de progreso se invoca siempre desde el hilo que llamó a organize(),
+        # una vez por archivo terminado (copiado, duplicado u omitido) con su tamaño en bytes
+        progreso = PeriodicSummary("Progreso")
+        while True:
+            trabajo = cola_resultados.get()
+            if trabajo is _FIN_DE_COLA:
+                break
+            self._record(trabajo)
+            self.metrics.count("files")
+            if trabajo.copied:
+                progreso.add("copiados", trabajo.size or 0)
+                self.metrics.count("copied")
+                self.metrics.count("bytes_written", trabajo.size or 0)
+            elif trabajo.dest_path:
+                progreso.add("duplicados", trabajo.size or 0)
+                self.metrics.count("duplicates")
+            else:
+                progreso.add("sin cambios", trabajo.size or 0)
+                self.metrics.count("skipped")
+            if self.progress_callback and not self._detener.is_set():
+                try:
+                    self.progress_callback(trabajo.size or 0)
+                except Exception as e:
+                    self._abort(e)
 
-                    target_folder = os.path.join(self.output_folder, location_folder, date_folder)
-                    os.makedirs(target_folder, exist_ok=True)
+        for hilo in hilos:
+            hilo.join()
+        self.copy_devices = programador.stats()
+        progreso.emit()
+        self.metrics.stop()
 
-                    dest_path = os.path.join(target_folder, file_name)
-                    if not os.path.exists(dest_path):
-                        shutil.copy(file_path, dest_path)
-                        logging.info(f"Copiado: {file_path} -> {target_folder}")
+        if self._error is not None:
+            raise self._error
 
-                        if self.progress_callback:
-                            self.progress_callback()
-                    else:
-                        logging.warning(
-                            f"Archivo duplicado {file_name} en {target_folder}. Ignorando..."
-                        )
+    def _start_stage(self, nombre, funcion, entrada, salida, workers):
+        restantes = [workers]
+        lock = threading.Lock()
 
-    def _unir_sin_ubicacion(self):
-        sin_ubicacion_dir = os.path.join(self.output_folder, "Sin_Ubicacion")
-        if not os.path.exists(sin_ubicacion_dir):
-            logging.info("No existe carpeta 'Sin_Ubicacion'; no se realiza la unificación.")
+        def trabajador():
+            while True:
+                trabajo = entrada.get()
+                if trabajo is _FIN_DE_COLA:
+                    # Se reinserta para que los demás hilos de la etapa también terminen
+                    entrada.put(_FIN_DE_COLA)
+                    break
+                if self._detener.is_set():
+                    continue
+                inicio = time.perf_counter()
+                try:
+                    resultado = funcion(trabajo)
+                    self.metrics.add_time(nombre, time.perf_counter() - inicio)
+                except Exception as e:
+                    logging.error(f"Error en la etapa '{nombre}' con {trabajo.file_path}: {e}")
+                    self._abort(e)
+                    continue
+                salida.put(resultado)
+
+            with lock:
+                restantes[0] -= 1
+                ultimo = restantes[0] == 0
+            if ultimo:
+                salida.put(_FIN_DE_COLA)
+
+        hilos = []
+        for i in range(workers):
+            hilo = threading.Thread(target=self.metrics.profiled(trabajador), name=f"{nombre}-{i}", daemon=True)
+            hilo.start()
+            hilos.append(hilo)
+        return hilos
+
+    def _abort(self, error):
+        if self._error is None:
+            self._error = error
+        self._detener.set()
+
+    @staticmethod
+    def _collect(entrada):
+        trabajos = []
+        while True:
+            trabajo = entrada.get()
+            if trabajo is _FIN_DE_COLA:
+                return trabajos
+            trabajos.append(trabajo)
+
+    def _feed(self, trabajos, salida):
+        for trabajo in trabajos:
+            if self._detener.is_set():
+                break
+            salida.put(trabajo)
+        salida.put(_FIN_DE_COLA)
+
+    def _plan_locations(self, entrada, salida):
+        """
+        Deja pasar los archivos con ubicación (anotándola en el índice por fecha) y
+        retiene los que tienen fecha pero no ubicación hasta conocer todas las demás.
+        Entonces los envía directamente a la ubicación de su fecha, así que no hace
+        falta mover nada de "Sin_Ubicacion" después de copiar. Una parte de una
+        ejecución repartida no ve las ubicaciones de las demás: deja esos archivos
+        en "Sin_Ubicacion" y los reparte particion.finalize().
+        """
+        retenidos = []
+        try:
+            while True:
+                trabajo = entrada.get()
+                if trabajo is _FIN_DE_COLA:
+                    break
+                if self._detener.is_set():
+                    continue
+                if trabajo.location_folder == SIN_UBICACION and trabajo.date and self.shard is None:
+                    self.date_index.discard(trabajo.source)
+                    retenidos.append(trabajo)
+                    continue
+                self.date_index.add(trabajo.source, trabajo.date, trabajo.location_folder)
+                salida.put(trabajo)
+
+            for trabajo in retenidos:
+                if self._detener.is_set():
+                    break
+                trabajo.location_folder = self.date_index.location_for(trabajo.date)
+                if trabajo.location_folder != SIN_UBICACION:
+                    self.merged_files += 1
+                salida.put(trabajo)
+        except Exception as e:
+            logging.error(f"Error al planificar ubicaciones: {e}")
+            self._abort(e)
+        finally:
+            salida.put(_FIN_DE_COLA)
+
+    def _record(self, trabajo):
+        if trabajo.dest_path and self.plan_writer is not None:
+            self.plan_writer.add(
+                trabajo.source, trabajo.dest_path, not trabajo.copied, trabajo.size, trabajo.mtime_ns,
+                trabajo.date, trabajo.coordinates, trabajo.location_folder
+            )
+        elif trabajo.dest_path:
+            self.manifest.record(
+                trabajo.source, trabajo.size, trabajo.mtime_ns, trabajo.date,
+                trabajo.coordinates, trabajo.location_folder, trabajo.dest_path
+            )
+
+    def _is_unchanged(self, entry):
+        if not self.incremental or not self.manifest.is_unchanged(entry.source, entry.size, entry.mtime_ns):
+            return False
+        # Si el archivo organizado se borró del destino hay que volver a procesarlo
+        return os.path.exists(self.manifest.destination(entry.source))
+
+    def _entries(self):
+        """Carpeta base y comprimidos, en ese orden; los miembros sin cambios no se extraen."""
+        fuentes = []
+        if not is_archive(self.base_folder):
+            fuentes.append(scan_media(self.base_folder))
+        if self.archives:
+            fuentes.append(scan_archives(
+                self.archives, self._staging_dir(), skip=self._skip_member, workers=self.archive_workers
+            ))
+        return itertools.chain.from_iterable(fuentes)
+
+    def _staging_dir(self):
+        return os.path.join(self.output_folder, shard_filename(STAGING_DIRNAME, self.shard))
+
+    def _in_shard(self, entry):
+        if self.shard is None:
+            return True
+        return shard_of(os.path.relpath(entry.source, self.base_folder), self.shard[1]) == self.shard[0]
+
+    def _skip_member(self, entry):
+        return not self._in_shard(entry) or self._is_unchanged(entry)
+
+    def _scan_files(self, salida, resultados, entries):
+        inicio = time.perf_counter()
+        # Tiempo bloqueado en la cola de salida: no es costo del escaneo
+        espera = 0.0
+        try:
+            for entry in entries if entries is not None else self._entries():
+                if self._detener.is_set():
+                    return
+                if not self._in_shard(entry):
+                    continue
+                trabajo = _Trabajo(
+                    entry.path, entry.name, entry.size, entry.mtime_ns, entry.sidecar, entry.source,
+                    entry.dev, entry.ino
+                )
+                # path=None: miembro de un comprimido que ya se omitió sin extraerlo
+                if entry.path is None or self._is_unchanged(entry):
+                    # Va directo a resultados para que cuente en el progreso
+                    self.skipped_files += 1
+                    resultados.put(trabajo)
+                    continue
+                antes = time.perf_counter()
+                salida.put(trabajo)
+                espera += time.perf_counter() - antes
+        except Exception as e:
+            logging.error(f"Error al recorrer {self.base_folder}: {e}")
+            self._abort(e)
+        finally:
+            self.metrics.add_time("escaneo", time.perf_counter() - inicio - espera)
+            salida.put(_FIN_DE_COLA)
+
+    def _extract_metadata(self, trabajo):
+        trabajo.date, trabajo.coordinates = self._get_final_metadata(trabajo.file_path, trabajo.sidecar)
+        return trabajo
+
+    def _resolve_location(self, trabajo):
+        if trabajo.coordinates:
+            trabajo.location_folder = self._get_city_state_name(*trabajo.coordinates)
+        return trabajo
+
+    def _output_device(self):
+        try:
+            return os.stat(self.output_folder).st_dev
+        except OSError:
+            # Al planificar el destino puede no existir todavía
+            return None
+
+    def _prepare_folders(self, trabajos):
+        """
+        Calcula la carpeta destino de cada trabajo y crea las que faltan de una vez,
+        en orden, antes de repartirlos entre los hilos de copia.
+        """
+        nuevas = set()
+        for trabajo in trabajos:
+            trabajo.target_folder = os.path.join(
+                self.output_folder, trabajo.location_folder, date_folder(trabajo.date)
+            )
+            if trabajo.target_folder not in self._carpetas_creadas:
+                nuevas.add(trabajo.target_folder)
+        if not nuevas:
             return
+        if self.plan_writer is None:
+            with self.metrics.timer("carpetas_destino"):
+                for carpeta in sorted(nuevas):
+                    os.makedirs(carpeta, exist_ok=True)
+        self._carpetas_creadas |= nuevas
+
+    def _copy_file(self, trabajo):
+        target_folder = trabajo.target_folder
+        existente = self.content_index.place(
+            trabajo.file_path, trabajo.size, lambda: self._transfer(trabajo, target_folder)
+        )
+        if existente is not None or not trabajo.copied:
+            trabajo.dest_path = existente or trabajo.dest_path
+            with self._stats_lock:
+                self.duplicate_files += 1
+                self.duplicate_bytes += trabajo.size
+            logging.debug("Contenido duplicado: %s ya está en %s. Ignorando...", trabajo.file_path, trabajo.dest_path)
+        return trabajo
+
+    def _transfer(self, trabajo, target_folder):
+        dest_path, identico = self._reserve_destination(trabajo, target_folder)
+        trabajo.dest_path = dest_path
+        if identico:
+            return dest_path
 
-        fechas_destinos = {}
-        for carpeta in os.listdir(self.output_folder):
-            if carpeta == "Sin_Ubicacion":
-                continue
-            ruta_carpeta = os.path.join(self.output_folder, carpeta)
-            if os.path.isdir(ruta_carpeta):
-                for subcarpeta in os.listdir(ruta_carpeta):
-                    ruta_subcarpeta = os.path.join(ruta_carpeta, subcarpeta)
-                    if os.path.isdir(ruta_subcarpeta) and FECHA_REGEX_PATTERN.match(subcarpeta):
-                        fechas_destinos[subcarpeta] = ruta_subcarpeta
-
-        for fecha_carpeta in os.listdir(sin_ubicacion_dir):
-            ruta_fecha_carpeta = os.path.join(sin_ubicacion_dir, fecha_carpeta)
-            if os.path.isdir(ruta_fecha_carpeta) and FECHA_REGEX_PATTERN.match(fecha_carpeta):
-                if fecha_carpeta in fechas_destinos:
-                    ruta_destino = fechas_destinos[fecha_carpeta]
-                    for archivo in os.listdir(ruta_fecha_carpeta):
-                        ruta_archivo = os.path.join(ruta_fecha_carpeta, archivo)
-                        if os.path.isfile(ruta_archivo):
-                            shutil.move(ruta_archivo, os.path.join(ruta_destino, archivo))
-                            logging.info(f"Movido {archivo} de {ruta_fecha_carpeta} a {ruta_destino}")
-
-                    if not os.listdir(ruta_fecha_carpeta):
-                        os.rmdir(ruta_fecha_carpeta)
-                        logging.info(f"Carpeta vacía eliminada: {ruta_fecha_carpeta}")
-
-def main(api_key, base_folder, output_folder, progress_callback=None):
+        # Al planificar sólo se reserva el nombre; copied indica que el archivo va (o iría) a dest_path
+        if self.plan_writer is None:
+            transferer = self.staged_transferer if trabajo.staged else self.transferer
+            try:
+                modo = transferer.transfer(trabajo.file_path, dest_path)
+            except OSError:
+                if self.shard is not None:
+                    # No dejar la reserva vacía de _claim_destination
+                    os.remove(dest_path)
+                raise
+            logging.debug("Copiado (%s): %s -> %s", modo, trabajo.file_path, dest_path)
+        trabajo.copied = True
+        return dest_path
+
+    def _reserve_destination(self, trabajo, target_folder):
+        """
+        Reserva un nombre libre en target_folder. Si ya existe un archivo distinto con
+        el mismo nombre se prueba "nombre (1).ext", "nombre (2).ext"...; si el existente
+        tiene el mismo contenido se devuelve con identico=True y no se copia.
+        """
+        stem, ext = os.path.splitext(trabajo.file_name)
+        intento = 0
+        while True:
+            nombre = trabajo.file_name if intento == 0 else f"{stem} ({intento}){ext}"
+            dest_path = os.path.join(target_folder, nombre)
+            with self._destinos_lock:
+                reservado = dest_path in self._destinos_reservados
+                if not reservado and self._claim_destination(dest_path):
+                    self._destinos_reservados.add(dest_path)
+                    if intento:
+                        with self._stats_lock:
+                            self.renamed_files += 1
+                        logging.debug(
+                            "Nombre repetido %s en %s; guardado como %s", trabajo.file_name, target_folder, nombre
+                        )
+                    return dest_path, False
+            if not reservado and same_content(trabajo.file_path, dest_path, trabajo.size):
+                return dest_path, True
+            intento += 1
+
+    def _claim_destination(self, dest_path):
+        if self.shard is None or self.plan_writer is not None:
+            return not os.path.exists(dest_path)
+        # Varias partes escriben en el mismo destino: el nombre se reserva creándolo vacío con
+        # O_EXCL, que es atómico también entre procesos (y en NFS); la transferencia lo reemplaza
+        try:
+            os.close(os.open(dest_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666))
+        except FileExistsError:
+            return False
+        return True
+
+
+def preload():
+    """
+    Importa las dependencias diferidas (LAZY_MODULES). La interfaz lo llama en
+    segundo plano mientras se completan los campos, para no pagarlas al empezar.
+    """
+    for modulo in LAZY_MODULES:
+        try:
+            importlib.import_module(modulo)
+        except ImportError as e:
+            # Se volverá a intentar (y a informar) cuando haga falta de verdad
+            logging.debug("No se pudo precargar %s: %s", modulo, e)
+
+
+def main(api_key, base_folder, output_folder, progress_callback=None, entries=None, plan_file=None,
+         **options):
     organizer = PhotoVideoOrganizer(
         api_key,
         base_folder,
         output_folder,
-        progress_callback
+        progress_callback,
+        **options
     )
-    organizer.organize()
+    try:
+        if plan_file:
+            organizer.plan(plan_file, entries)
+        else:
+            organizer.organize(entries)
+    finally:
+        organizer.close()
+
+
+def _shard_arg(texto):
+    try:
+        return parse_shard(texto)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def cli(argv=None):
+    """
+    Uso sin interfaz gráfica:
+
+        python organizador.py organizar ORIGEN DESTINO [--shard 1/4] [--plan plan.db]
+        python organizador.py vigilar ORIGEN DESTINO [--debounce 2]
+        python organizador.py finalizar DESTINO [--merge-cache otra_cache.db ...]
+        python organizador.py similares DESTINO [--action move]
+        python organizador.py plan plan.db [--dump] [--status pending]
+        python organizador.py aplicar plan.db
+
+    Con --shard cada proceso (o máquina) organiza su parte en el mismo DESTINO;
+    "finalizar" se ejecuta una vez cuando terminaron todas.
+    """
+    global DATABASE_FILE
+    parser = argparse.ArgumentParser(description="Organiza fotos y videos por ubicación y fecha.")
+    parser.add_argument("--log-level", default=DEFAULT_LOG_LEVEL)
+    parser.add_argument("--log-file", default=LOG_FILE)
+    parser.add_argument("--cache", default=DATABASE_FILE, help="Caché de ubicaciones (SQLite)")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    # Opciones del organizador comunes a "organizar" y "vigilar"
+    comunes = argparse.ArgumentParser(add_help=False)
+    comunes.add_argument("origen")
+    comunes.add_argument("destino")
+    comunes.add_argument("--api-key", default=os.environ.get("OPENCAGE_API_KEY", OPENCAGE_API_KEY))
+    comunes.add_argument("--gazetteer", help="Geocodificación offline con este archivo de GeoNames")
+    comunes.add_argument("--transfer-mode", choices=TRANSFER_MODES, default="copy")
+    comunes.add_argument("--resolve-mode", choices=RESOLVE_MODES, default="inline")
+    comunes.add_argument("--metadata-workers", type=int, default=METADATA_WORKERS)
+    comunes.add_argument("--location-workers", type=int, default=LOCATION_WORKERS)
+    comunes.add_argument("--copy-workers", type=int, default=COPY_WORKERS,
+                         help="Hilos de copia por dispositivo SSD o de red")
+    comunes.add_argument("--rotational-streams", type=int, default=ROTATIONAL_STREAMS,
+                         help="Copias simultáneas por disco giratorio")
+    comunes.add_argument("--copy-buffer-kb", type=int, help="Tamaño de bloque de las copias en KiB")
+    comunes.add_argument("--scheduler-window", type=int, default=SCHEDULER_WINDOW,
+                         help="Copias pendientes que se ordenan juntas por inodo o carpeta")
+    comunes.add_argument("--full", action="store_true", help="Reprocesa también los archivos sin cambios")
+    comunes.add_argument("--profile", action="store_true")
+    comunes.add_argument("--sample-interval", type=float)
+
+    organizar = comandos.add_parser(
+        "organizar", parents=[comunes], help="Organiza ORIGEN (carpeta o comprimido) en DESTINO"
+    )
+    organizar.add_argument("--shard", type=_shard_arg, help="Organiza sólo la parte i de N (i/N)")
+    organizar.add_argument("--archive", action="append", default=[], help="Comprimido de Takeout adicional")
+    organizar.add_argument("--plan", help="Sólo planifica, guardando el plan en este archivo")
+    organizar.add_argument("--near-duplicates", choices=NEAR_DUPLICATE_ACTIONS,
+                           help="Al terminar, informa (report) o aparta (move) las fotos casi idénticas")
+
+    vigilar = comandos.add_parser(
+        "vigilar", parents=[comunes], help="Organiza lo que va llegando a ORIGEN hasta Ctrl+C"
+    )
+    vigilar.add_argument("--debounce", type=float, default=DEBOUNCE_S,
+                         help="Segundos sin cambios antes de procesar un lote")
+    vigilar.add_argument("--max-wait", type=float, default=MAX_BATCH_WAIT_S)
+    vigilar.add_argument("--polling", action="store_true", help="Sondeo periódico en lugar de inotify")
+    vigilar.add_argument("--poll-interval", type=float, default=POLL_INTERVAL_S)
+
+    finalizar = comandos.add_parser("finalizar", help="Une las partes y reparte Sin_Ubicacion por fecha")
+    finalizar.add_argument("destino")
+    finalizar.add_argument("--merge-cache", action="append", default=[],
+                           help="Caché de ubicaciones de otra máquina a incorporar")
+
+    similares = comandos.add_parser("similares", help="Busca fotos casi idénticas en DESTINO")
+    similares.add_argument("destino")
+    similares.add_argument("--action", choices=NEAR_DUPLICATE_ACTIONS, default="report")
+    similares.add_argument("--threshold", type=int, default=HAMMING_THRESHOLD, help="Bits distintos admitidos (de 64)")
+    similares.add_argument("--workers", type=int, default=HASH_WORKERS)
+
+    ver_plan = comandos.add_parser("plan", help="Resume o lista un plan guardado con --plan, sin aplicarlo")
+    ver_plan.add_argument("plan")
+    ver_plan.add_argument("--dump", action="store_true",
+                          help="Un paso por línea (acción, modo, origen, destino), para revisarlo o compararlo con diff")
+    ver_plan.add_argument("--status", choices=("pending", "done"), help="Sólo los pasos en este estado")
+
+    aplicar = comandos.add_parser("aplicar", help="Aplica un plan guardado con --plan")
+    aplicar.add_argument("plan")
+    aplicar.add_argument("--workers", type=int, default=EXECUTOR_WORKERS)
+
+    args = parser.parse_args(argv)
+    DATABASE_FILE = args.cache
+    setup_logging(args.log_file, args.log_level)
+
+    if args.comando in ("organizar", "vigilar"):
+        if not args.api_key and not args.gazetteer:
+            parser.error("Hace falta --api-key (o OPENCAGE_API_KEY) o --gazetteer")
+        opciones = dict(
+            gazetteer=args.gazetteer, transfer_mode=args.transfer_mode, resolve_mode=args.resolve_mode,
+            metadata_workers=args.metadata_workers, location_workers=args.location_workers,
+            copy_workers=args.copy_workers, rotational_streams=args.rotational_streams,
+            copy_buffer=args.copy_buffer_kb * 1024 if args.copy_buffer_kb else None,
+            scheduler_window=args.scheduler_window, incremental=not args.full, log_level=args.log_level,
+            profile=args.profile, sample_interval=args.sample_interval
+        )
+    if args.comando == "organizar":
+        main(
+            args.api_key, args.origen, args.destino, plan_file=args.plan, shard=args.shard,
+            archives=args.archive, near_duplicates=args.near_duplicates, **opciones
+        )
+    elif args.comando == "vigilar":
+        organizer = PhotoVideoOrganizer(args.api_key, args.origen, args.destino, **opciones)
+        try:
+            watch(
+                organizer, debounce=args.debounce, max_wait=args.max_wait, polling=args.polling,
+                poll_interval=args.poll_interval
+            )
+        except KeyboardInterrupt:
+            logging.info("Vigilancia detenida.")
+        finally:
+            organizer.close()
+    elif args.comando == "finalizar":
+        if args.merge_cache:
+            cache = LocationCache(DATABASE_FILE)
+            try:
+                for otra in args.merge_cache:
+                    cache.merge(otra)
+            finally:
+                cache.close()
+        finalize(args.destino)
+    elif args.comando == "similares":
+        find_near_duplicates(args.destino, args.action, args.threshold, args.workers)
+    elif args.comando == "plan":
+        if not os.path.isfile(args.plan):
+            parser.error(f"No existe el plan {args.plan}")
+        if args.dump:
+            dump_plan(args.plan, sys.stdout, args.status)
+        else:
+            for clave, valor in summarize_plan(args.plan).items():
+                print(f"{clave}: {valor}")
+    else:
+        apply_plan(args.plan, workers=args.workers)
+    return 0
+
 
 if __name__ == "__main__":
-    main("", "", "")
+    sys.exit(cli())
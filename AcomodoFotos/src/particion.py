@@ -0,0 +1,166 @@
+"""
+Reparto de una organización entre varios procesos o máquinas. Cada parte
+("--shard i/N") procesa los archivos cuyo hash de ruta relativa cae en ella y
+escribe en el destino común con su propio manifiesto; finalize() se ejecuta
+una vez al terminar todas: une los manifiestos, elimina los duplicados que
+quedaron entre partes y reparte "Sin_Ubicacion" por fecha.
+"""
+import glob
+import hashlib
+import logging
+import os
+import re
+
+from deduplicacion import ContentIndex
+from indice_fechas import SIN_UBICACION, DateLocationIndex, date_folder
+from manifiesto import MANIFEST_FILENAME, Manifest
+from transferencia import Transferer
+
+# Sufijo que se añade al nombre cuando ya existe otro archivo distinto: "foto (1).jpg"
+_SUFIJO_COLISION = re.compile(r" \(\d+\)$")
+
+
+def parse_shard(texto):
+    """"i/N" (1 <= i <= N) -> (i, N)."""
+    try:
+        indice, total = (int(parte) for parte in texto.split("/"))
+    except ValueError:
+        raise ValueError(f"Partición inválida: {texto!r} (se espera i/N)") from None
+    if not 1 <= indice <= total:
+        raise ValueError(f"Partición inválida: {texto!r} (i debe estar entre 1 y N)")
+    return indice, total
+
+
+def shard_of(relative_path, total):
+    """
+    Parte (1..total) de un archivo según su ruta relativa a la carpeta base. Con
+    separadores "/" y un hash estable (no hash(), que cambia entre procesos), el
+    reparto coincide en todas las máquinas aunque la carpeta esté montada en otra ruta.
+    """
+    clave = relative_path.replace(os.sep, "/").encode("utf-8", "surrogateescape")
+    return int.from_bytes(hashlib.blake2b(clave, digest_size=8).digest(), "little") % total + 1
+
+
+def shard_filename(name, shard):
+    """Nombre propio de cada parte: ".organizador_manifest.db" -> ".organizador_manifest.parte2de4.db"."""
+    if shard is None:
+        return name
+    base, ext = os.path.splitext(name)
+    return f"{base}.parte{shard[0]}de{shard[1]}{ext}"
+
+
+def _renamed(path):
+    return _SUFIJO_COLISION.search(os.path.splitext(os.path.basename(path))[0]) is not None
+
+
+def _inside(path, folder):
+    """path está dentro de folder, sin importar si una se escribió relativa y la otra absoluta."""
+    path, folder = os.path.abspath(path), os.path.abspath(folder)
+    try:
+        return path != folder and os.path.commonpath([path, folder]) == folder
+    except ValueError:
+        # Windows: unidades distintas
+        return False
+
+
+def free_destination(folder, name, taken=()):
+    """Primer "nombre.ext", "nombre (1).ext"... que no existe en folder ni está en taken."""
+    stem, ext = os.path.splitext(name)
+    intento = 0
+    while True:
+        destino = os.path.join(folder, name if intento == 0 else f"{stem} ({intento}){ext}")
+        if destino not in taken and not os.path.lexists(destino):
+            return destino
+        intento += 1
+
+
+class Finalizer:
+    """
+    Paso único tras las partes; también sirve después de una ejecución normal.
+    Debe correr cuando ninguna parte está escribiendo en output_folder.
+    """
+    def __init__(self, output_folder):
+        # Absoluta como los destinos del manifiesto, aunque las partes se hayan lanzado con otra ruta
+        self.output_folder = os.path.abspath(output_folder)
+        self.mover = Transferer("move")
+        self.counts = {"manifests": 0, "duplicates": 0, "relocated": 0}
+
+    def run(self):
+        manifest = Manifest(os.path.join(self.output_folder, MANIFEST_FILENAME))
+        try:
+            self._merge_manifests(manifest)
+            self._remove_duplicates(manifest)
+            self.relocate(manifest)
+        finally:
+            manifest.close()
+        logging.info(
+            f"Finalización de {self.output_folder}: {self.counts['manifests']} manifiestos de partes unidos, "
+            f"{self.counts['duplicates']} duplicados entre partes eliminados, "
+            f"{self.counts['relocated']} archivos movidos desde {SIN_UBICACION}."
+        )
+        return self.counts
+
+    def _merge_manifests(self, manifest):
+        patron = os.path.join(glob.escape(self.output_folder), shard_filename(MANIFEST_FILENAME, ("*", "*")))
+        for parte in sorted(glob.glob(patron)):
+            filas = manifest.merge(parte)
+            for sufijo in ("", "-wal", "-shm"):
+                if os.path.exists(parte + sufijo):
+                    os.remove(parte + sufijo)
+            self.counts["manifests"] += 1
+            logging.info(f"Manifiesto {os.path.basename(parte)} unido: {filas} archivos.")
+
+    def _remove_duplicates(self, manifest):
+        # Las partes sólo deduplican contra lo suyo; aquí se cruzan todas. Se conserva primero el que
+        # no lleva sufijo " (n)" (una sola ejecución no lo habría renombrado) y después el primero por ruta
+        indice = ContentIndex()
+        for destino, size in sorted(manifest.destinations(), key=lambda fila: (_renamed(fila[0]), fila[0])):
+            if not os.path.exists(destino):
+                continue
+            existente = indice.place(destino, size, lambda: destino)
+            if existente is not None:
+                os.remove(destino)
+                # La ubicación pasa a ser la del que se conserva: si era "Sin_Ubicacion", relocate()
+                # intentaría mover el archivo conservado
+                ubicacion = os.path.relpath(existente, self.output_folder).split(os.sep)[0]
+                manifest.update_destination(destino, existente, ubicacion)
+                self.counts["duplicates"] += 1
+                logging.debug("Duplicado entre partes: %s ya está en %s", destino, existente)
+
+    def relocate(self, manifest, indice=None):
+        """
+        Mueve los archivos con fecha de "Sin_Ubicacion" a la ubicación de su fecha
+        según indice (por defecto, uno construido desde el manifiesto) y devuelve
+        los pares (destino anterior, destino nuevo).
+        """
+        if indice is None:
+            indice = DateLocationIndex()
+            for source, date, location in manifest.located_files():
+                indice.add(source, date, location)
+        movidos = []
+        carpetas = set()
+        sin_ubicacion = os.path.join(self.output_folder, SIN_UBICACION)
+        for destino, date in manifest.unlocated_files():
+            ubicacion = indice.location_for(date)
+            # Un duplicado sin ubicación apunta al archivo que ya estaba en otra carpeta: no se mueve
+            if ubicacion == SIN_UBICACION or not _inside(destino, sin_ubicacion) or not os.path.exists(destino):
+                continue
+            carpeta = os.path.join(self.output_folder, ubicacion, date_folder(date))
+            os.makedirs(carpeta, exist_ok=True)
+            nuevo = free_destination(carpeta, os.path.basename(destino))
+            self.mover.transfer(destino, nuevo)
+            manifest.update_destination(destino, nuevo, ubicacion)
+            carpetas.add(os.path.dirname(destino))
+            movidos.append((destino, nuevo))
+            self.counts["relocated"] += 1
+        # Las carpetas de fecha que quedaron vacías y, si también lo queda, la de Sin_Ubicacion
+        for carpeta in sorted(carpetas) + [os.path.join(self.output_folder, SIN_UBICACION)]:
+            try:
+                os.rmdir(carpeta)
+            except OSError:
+                pass
+        return movidos
+
+
+def finalize(output_folder):
+    return Finalizer(output_folder).run()
@@ -0,0 +1,309 @@
+import errno
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+
+from deduplicacion import same_content
+from manifiesto import MANIFEST_FILENAME, Manifest
+from particion import free_destination
+from registro import progress_notifier
+from transferencia import Transferer
+
+BATCH_SIZE = 500
+EXECUTOR_WORKERS = 4
+# Cada archivo se transfiere a "destino.parcial" y luego se renombra: sólo ese sufijo es del ejecutor
+PARTIAL_SUFFIX = ".parcial"
+# action: "transfer" copia/mueve/enlaza source en destination; "duplicate" ya está en destination
+# status: "pending" o "done"; al reanudar se vuelven a intentar los que no están "done"
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    action TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    date TEXT,
+    lat REAL,
+    lon REAL,
+    location TEXT,
+    status TEXT NOT NULL DEFAULT 'pending'
+);
+CREATE INDEX IF NOT EXISTS idx_steps_status ON steps (status, destination);
+"""
+_COLUMNAS = ("source", "destination", "action", "mode", "size", "mtime_ns", "date", "lat", "lon", "location")
+
+
+def _connect(plan_file):
+    conn = sqlite3.connect(plan_file, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_ESQUEMA)
+    return conn
+
+
+class PlanWriter:
+    """
+    Guarda en SQLite lo que haría una organización sin tocar el destino: origen,
+    destino, modo y los metadatos que decidieron la ubicación. Un plan nuevo
+    reemplaza al que hubiera en el mismo archivo.
+    """
+    def __init__(self, plan_file, base_folder, output_folder, mode, batch_size=BATCH_SIZE):
+        self.plan_file = plan_file
+        self.mode = mode
+        self.batch_size = batch_size
+        self.steps = 0
+        self._pendientes = []
+
+        self._conn = _connect(plan_file)
+        with self._conn:
+            self._conn.execute("DELETE FROM steps")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.executemany(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                [
+                    ("base_folder", os.path.abspath(base_folder)),
+                    ("output_folder", os.path.abspath(output_folder)),
+                    ("mode", mode),
+                    ("created", datetime.now().isoformat(timespec="seconds")),
+                ]
+            )
+
+    def add(self, source, destination, duplicate, size, mtime_ns, date, coordinates, location):
+        lat, lon = coordinates if coordinates else (None, None)
+        self._pendientes.append((
+            source, destination, "duplicate" if duplicate else "transfer", self.mode,
+            size, mtime_ns, date.isoformat() if date else None, lat, lon, location
+        ))
+        self.steps += 1
+        if len(self._pendientes) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self._pendientes:
+            return
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO steps ({', '.join(_COLUMNAS)}) VALUES ({', '.join('?' * len(_COLUMNAS))})",
+                self._pendientes
+            )
+        self._pendientes.clear()
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def read_meta(plan_file):
+    conn = _connect(plan_file)
+    try:
+        return dict(conn.execute("SELECT key, value FROM meta"))
+    finally:
+        conn.close()
+
+
+def iter_plan(plan_file, status=None):
+    """Recorre los pasos del plan ordenados por origen (como dicts), sin cargarlo entero."""
+    conn = _connect(plan_file)
+    try:
+        consulta = f"SELECT {', '.join(_COLUMNAS)}, status FROM steps"
+        parametros = ()
+        if status is not None:
+            consulta += " WHERE status = ?"
+            parametros = (status,)
+        for fila in conn.execute(consulta + " ORDER BY source", parametros):
+            yield dict(zip(_COLUMNAS + ("status",), fila))
+    finally:
+        conn.close()
+
+
+def dump_plan(plan_file, out, status=None):
+    """Escribe el plan como texto (una línea por archivo, ordenado por origen) para compararlo con diff."""
+    for paso in iter_plan(plan_file, status):
+        out.write(f"{paso['action']}\t{paso['mode']}\t{paso['source']}\t{paso['destination']}\n")
+
+
+def summarize_plan(plan_file):
+    """Metadatos del plan y cuántos pasos hay de cada acción y estado ("transfer/pending": n...)."""
+    conn = _connect(plan_file)
+    try:
+        resumen = dict(conn.execute("SELECT key, value FROM meta"))
+        for accion, estado, n, tamano in conn.execute(
+            "SELECT action, status, COUNT(*), SUM(size) FROM steps GROUP BY action, status ORDER BY action, status"
+        ):
+            resumen[f"{accion}/{estado}"] = f"{n} archivos, {(tamano or 0) / 1048576:.1f} MB"
+        return resumen
+    finally:
+        conn.close()
+
+
+class PlanExecutor:
+    """
+    Aplica un plan guardado por PlanWriter. Crea primero todas las carpetas de
+    destino (una vez cada una), luego transfiere los archivos ordenados por
+    destino con varios hilos y marca cada paso como hecho en lotes, así que un
+    plan interrumpido se puede reanudar volviendo a ejecutarlo. Un archivo distinto
+    que ocupe el destino desde que se hizo el plan no se toca: el paso se guarda
+    con el primer nombre "nombre (n).ext" libre, y los duplicados que apuntaban a
+    ese destino pasan al nuevo nombre.
+    """
+    def __init__(self, plan_file, workers=EXECUTOR_WORKERS, batch_size=BATCH_SIZE):
+        self.plan_file = plan_file
+        self.workers = max(1, workers)
+        self.batch_size = batch_size
+        self.meta = read_meta(plan_file)
+        self.output_folder = self.meta["output_folder"]
+        self._transferers = {}
+        self.counts = {"done": 0, "duplicate": 0, "error": 0, "resumed": 0, "renamed": 0}
+        # Destinos del plan aún sin aplicar y nombres ya elegidos al renombrar
+        self._ocupados = set()
+        # Pares (nuevo, planificado) de los pasos renombrados que falta guardar
+        self._renombrados = []
+        self._lock = threading.Lock()
+
+    def _transferer(self, mode):
+        transferer = self._transferers.get(mode)
+        if transferer is None:
+            transferer = self._transferers[mode] = Transferer(mode)
+        return transferer
+
+    def run(self, progress_callback=None):
+        """progress_callback(bytes) tras cada paso; también se admite sin argumentos."""
+        progress_callback = progress_notifier(progress_callback)
+        inicio = time.perf_counter()
+        conn = _connect(self.plan_file)
+        # Conexión aparte para leer: en WAL la lectura ve una instantánea y no le afectan los UPDATE
+        lectura = _connect(self.plan_file)
+        os.makedirs(self.output_folder, exist_ok=True)
+        manifest = Manifest(os.path.join(self.output_folder, MANIFEST_FILENAME))
+        try:
+            self._ocupados = {
+                destino for (destino,) in conn.execute(
+                    "SELECT DISTINCT destination FROM steps WHERE status != 'done' AND action = 'transfer'"
+                )
+            }
+            carpetas = sorted({os.path.dirname(destino) for destino in self._ocupados})
+            for carpeta in carpetas:
+                os.makedirs(carpeta, exist_ok=True)
+            logging.info(f"Plan {self.plan_file}: {len(carpetas)} carpetas de destino preparadas.")
+
+            hechos = []
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                # Los duplicados al final: para entonces su destino ya tiene el nombre definitivo
+                for accion in ("transfer", "duplicate"):
+                    pasos = lectura.execute(
+                        f"SELECT id, {', '.join(_COLUMNAS)} FROM steps "
+                        "WHERE status != 'done' AND action = ? ORDER BY destination",
+                        (accion,)
+                    )
+                    en_curso = set()
+                    for fila in pasos:
+                        paso = dict(zip(("id",) + _COLUMNAS, fila))
+                        paso["planned"] = paso["destination"]
+                        en_curso.add(pool.submit(self._apply, paso))
+                        # Acotado para no encolar 500k futuros a la vez
+                        if len(en_curso) >= self.workers * 4:
+                            terminados, en_curso = wait(en_curso, return_when=FIRST_COMPLETED)
+                            self._collect(terminados, hechos, conn, manifest, progress_callback)
+                    self._collect(en_curso, hechos, conn, manifest, progress_callback)
+                    self._mark(conn, hechos)
+        finally:
+            manifest.close()
+            lectura.close()
+            conn.close()
+
+        logging.info(
+            f"Plan aplicado en {time.perf_counter() - inicio:.1f} s: {self.counts['done']} transferidos, "
+            f"{self.counts['duplicate']} duplicados, {self.counts['resumed']} ya estaban hechos, "
+            f"{self.counts['renamed']} renombrados porque su destino estaba ocupado, "
+            f"{self.counts['error']} con error."
+        )
+        if self._transferers:
+            modos = {}
+            for transferer in self._transferers.values():
+                for modo, n in transferer.counts.items():
+                    modos[modo] = modos.get(modo, 0) + n
+            logging.info(f"Transferencias por modo: {', '.join(f'{m}: {n}' for m, n in sorted(modos.items()))}")
+
+    def _apply(self, paso):
+        """Ejecuta un paso; devuelve (paso, estado)."""
+        if paso["action"] == "duplicate":
+            return paso, "duplicate"
+        origen, destino = paso["source"], paso["destination"]
+        parcial = destino + PARTIAL_SUFFIX
+        try:
+            if not os.path.exists(origen):
+                # Un "move" interrumpido: llegó a su nombre final o quedó en el temporal
+                if os.path.lexists(parcial) and not os.path.lexists(destino):
+                    os.replace(parcial, destino)
+                if os.path.exists(destino) and os.path.getsize(destino) == paso["size"]:
+                    return paso, "resumed"
+                raise FileNotFoundError(errno.ENOENT, "El origen ya no existe", origen)
+            if os.path.lexists(parcial):
+                # Restos de un intento anterior interrumpido: nadie más escribe "*.parcial"
+                os.remove(parcial)
+            if os.path.lexists(destino):
+                if same_content(origen, destino, os.path.getsize(origen)):
+                    # Terminado antes de que se guardara su estado
+                    return paso, "resumed"
+                # Otro archivo llegó a ese nombre después de planificar: se conserva
+                paso["destination"] = destino = self._reserve(destino)
+                parcial = destino + PARTIAL_SUFFIX
+            self._transferer(paso["mode"]).transfer(origen, parcial)
+            os.replace(parcial, destino)
+            return paso, "renamed" if destino != paso["planned"] else "done"
+        except OSError as e:
+            logging.error(f"Error al aplicar {origen} -> {destino}: {e}")
+            return paso, "error"
+
+    def _reserve(self, destino):
+        carpeta, nombre = os.path.split(destino)
+        with self._lock:
+            nuevo = free_destination(carpeta, nombre, self._ocupados)
+            self._ocupados.add(nuevo)
+        logging.warning(f"{destino} ya existe con otro contenido; se guarda como {nuevo}")
+        return nuevo
+
+    def _collect(self, terminados, hechos, conn, manifest, progress_callback):
+        for futuro in terminados:
+            paso, estado = futuro.result()
+            self.counts[estado] += 1
+            if estado == "error":
+                continue
+            manifest.record(
+                paso["source"], paso["size"], paso["mtime_ns"],
+                datetime.fromisoformat(paso["date"]) if paso["date"] else None,
+                (paso["lat"], paso["lon"]) if paso["lat"] is not None else None,
+                paso["location"], paso["destination"]
+            )
+            hechos.append((paso["destination"], paso["id"]))
+            if estado == "renamed":
+                self._renombrados.append((paso["destination"], paso["planned"]))
+            if progress_callback:
+                progress_callback(paso["size"] or 0)
+        if len(hechos) >= self.batch_size:
+            self._mark(conn, hechos)
+
+    def _mark(self, conn, hechos):
+        if not hechos:
+            return
+        with conn:
+            conn.executemany("UPDATE steps SET status = 'done', destination = ? WHERE id = ?", hechos)
+            # En la misma transacción: al reanudar, los duplicados ya apuntan al nombre nuevo
+            conn.executemany(
+                "UPDATE steps SET destination = ? "
+                "WHERE status = 'pending' AND action = 'duplicate' AND destination = ?",
+                self._renombrados
+            )
+        hechos.clear()
+        self._renombrados.clear()
+
+
+def apply_plan(plan_file, progress_callback=None, workers=EXECUTOR_WORKERS):
+    PlanExecutor(plan_file, workers).run(progress_callback)
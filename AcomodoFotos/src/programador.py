@@ -0,0 +1,254 @@
+"""
+Programador de la etapa de copia. Agrupa las transferencias por par de
+dispositivos (origen, destino), ordena cada grupo por inodo (discos giratorios)
+o por carpeta, crea las carpetas de destino de una vez y limita los hilos por
+dispositivo: pocos flujos en discos giratorios, donde el paralelismo sólo
+mueve los cabezales, y más en SSD y sistemas de archivos de red.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+from contextlib import ExitStack
+
+# Flujos simultáneos por disco giratorio (origen o destino), compartidos entre grupos
+ROTATIONAL_STREAMS = 1
+# Transferencias que el programador retiene y ordena antes de repartirlas
+SCHEDULER_WINDOW = 4096
+_FIN = object()
+
+
+def device_kind(dev):
+    """
+    "rotational", "ssd", "virtual" (sin dispositivo de bloques: NFS, SMB, FUSE,
+    tmpfs, btrfs...) o "unknown" si la plataforma no lo informa (/sys es de Linux).
+    """
+    if dev is None or not hasattr(os, "major"):
+        return "unknown"
+    mayor, menor = os.major(dev), os.minor(dev)
+    if mayor == 0:
+        return "virtual"
+    ruta = f"/sys/dev/block/{mayor}:{menor}"
+    if not os.path.exists(ruta):
+        return "unknown"
+    ruta = os.path.realpath(ruta)
+    # Una partición no tiene queue/: el dato está en el disco que la contiene
+    for candidata in (ruta, os.path.dirname(ruta)):
+        try:
+            with open(os.path.join(candidata, "queue", "rotational")) as f:
+                return "rotational" if f.read().strip() == "1" else "ssd"
+        except OSError:
+            continue
+    return "unknown"
+
+
+def _dev_label(dev):
+    if dev is None:
+        return "?"
+    if hasattr(os, "major"):
+        return f"{os.major(dev)}:{os.minor(dev)}"
+    return str(dev)
+
+
+class _Grupo:
+    __slots__ = ("etiqueta", "devs", "rotational", "cola", "pendientes", "ordenado", "hilos",
+                 "files", "bytes", "seconds")
+
+    def __init__(self, etiqueta, devs, rotational, workers):
+        self.etiqueta = etiqueta
+        self.devs = devs
+        self.rotational = rotational
+        self.cola = queue.Queue(maxsize=2 * workers)
+        # Ordenados al revés: el siguiente a repartir se saca del final
+        self.pendientes = []
+        self.ordenado = True
+        self.hilos = []
+        self.files = 0
+        self.bytes = 0
+        self.seconds = 0.0
+
+
+class CopyScheduler:
+    """
+    Consume trabajos de una cola (hasta `sentinel`), llama a funcion(trabajo) con
+    los hilos de su grupo de dispositivos y deja el resultado en `salida`.
+    prepare(trabajos) se llama con cada tanda recibida antes de repartirla (p. ej.
+    para crear sus carpetas de destino juntas). Los errores se pasan a on_error y
+    el trabajo se descarta, como en las demás etapas.
+    """
+    def __init__(self, funcion, salida, sentinel, dest_dev, detener, on_error, metrics,
+                 workers, rotational_streams=ROTATIONAL_STREAMS, window=SCHEDULER_WINDOW, prepare=None):
+        self.funcion = funcion
+        self.salida = salida
+        self.sentinel = sentinel
+        self.dest_dev = dest_dev
+        self.detener = detener
+        self.on_error = on_error
+        self.metrics = metrics
+        self.workers = max(1, workers)
+        self.rotational_streams = max(1, rotational_streams)
+        self.window = max(1, window)
+        self.prepare = prepare
+        self._tipos = {}
+        self._semaforos = {}
+        self._grupos = {}
+        # Los hilos de un mismo grupo suman a sus contadores a la vez
+        self._stats_lock = threading.Lock()
+        self._recibidos = []
+        self._pendientes = 0
+
+    def _tipo(self, dev):
+        tipo = self._tipos.get(dev)
+        if tipo is None:
+            tipo = self._tipos[dev] = device_kind(dev)
+            logging.info(f"Dispositivo {_dev_label(dev)}: {tipo}")
+            if tipo == "rotational":
+                self._semaforos[dev] = threading.BoundedSemaphore(self.rotational_streams)
+        return tipo
+
+    def _grupo(self, trabajo):
+        dev = trabajo.dev
+        if dev is None:
+            dev = trabajo.dev = os.stat(trabajo.file_path).st_dev
+        grupo = self._grupos.get(dev)
+        if grupo is None:
+            origen, destino = self._tipo(dev), self._tipo(self.dest_dev)
+            rotational = origen == "rotational"
+            giratorio = rotational or destino == "rotational"
+            workers = self.rotational_streams if giratorio else self.workers
+            etiqueta = f"{_dev_label(dev)} ({origen}) -> {_dev_label(self.dest_dev)} ({destino})"
+            grupo = self._grupos[dev] = _Grupo(etiqueta, sorted({dev, self.dest_dev}, key=str), rotational, workers)
+            for i in range(workers):
+                hilo = threading.Thread(
+                    target=self.metrics.profiled(self._trabajador), args=(grupo,),
+                    name=f"copia-{_dev_label(dev)}-{i}", daemon=True
+                )
+                hilo.start()
+                grupo.hilos.append(hilo)
+            logging.info(f"Grupo de copia {etiqueta}: {workers} hilos.")
+        return grupo
+
+    def run(self, entrada):
+        """Cuerpo del hilo programador."""
+        fin = False
+        try:
+            while not fin or self._pendientes or self._recibidos:
+                # Recibe mientras quepa en la ventana; sólo espera de verdad si no hay nada que repartir
+                while not fin and self._pendientes + len(self._recibidos) < self.window:
+                    try:
+                        trabajo = entrada.get(timeout=None if not self._pendientes else 0.01)
+                    except queue.Empty:
+                        break
+                    if trabajo is self.sentinel:
+                        fin = True
+                    elif not self.detener.is_set():
+                        self._recibidos.append(trabajo)
+                    if entrada.empty():
+                        break
+                self._clasificar()
+                self._repartir(esperar=fin or self._pendientes >= self.window)
+        except Exception as e:
+            logging.error(f"Error en el programador de copias: {e}")
+            self.on_error(e)
+            # Hay que seguir vaciando la entrada para no bloquear a la etapa anterior
+            while not fin:
+                fin = entrada.get() is self.sentinel
+        finally:
+            for grupo in self._grupos.values():
+                for _ in grupo.hilos:
+                    grupo.cola.put(_FIN)
+            for grupo in self._grupos.values():
+                for hilo in grupo.hilos:
+                    hilo.join()
+            self.salida.put(self.sentinel)
+
+    def _clasificar(self):
+        if not self._recibidos:
+            return
+        recibidos, self._recibidos = self._recibidos, []
+        if self.detener.is_set():
+            return
+        if self.prepare is not None:
+            self.prepare(recibidos)
+        for trabajo in recibidos:
+            grupo = self._grupo(trabajo)
+            grupo.pendientes.append(trabajo)
+            grupo.ordenado = False
+            self._pendientes += 1
+
+    def _repartir(self, esperar):
+        if self.detener.is_set():
+            for grupo in self._grupos.values():
+                grupo.pendientes.clear()
+            self._pendientes = 0
+            return
+        repartidos = 0
+        for grupo in self._grupos.values():
+            if not grupo.ordenado:
+                # Disco giratorio: orden de inodo, que en ext4/XFS sigue de cerca al de los datos
+                if grupo.rotational:
+                    grupo.pendientes.sort(key=lambda t: (t.ino or 0, t.file_path), reverse=True)
+                else:
+                    grupo.pendientes.sort(key=lambda t: t.file_path, reverse=True)
+                grupo.ordenado = True
+            while grupo.pendientes:
+                try:
+                    grupo.cola.put_nowait(grupo.pendientes[-1])
+                except queue.Full:
+                    break
+                grupo.pendientes.pop()
+                self._pendientes -= 1
+                repartidos += 1
+        if not repartidos and esperar and self._pendientes:
+            # Todas las colas llenas: espera a que un hilo libere un lugar
+            grupo = max(self._grupos.values(), key=lambda g: len(g.pendientes))
+            try:
+                grupo.cola.put(grupo.pendientes[-1], timeout=0.1)
+            except queue.Full:
+                return
+            grupo.pendientes.pop()
+            self._pendientes -= 1
+
+    def _trabajador(self, grupo):
+        while True:
+            trabajo = grupo.cola.get()
+            if trabajo is _FIN:
+                break
+            if self.detener.is_set():
+                continue
+            inicio = time.perf_counter()
+            try:
+                with ExitStack() as pila:
+                    # Siempre en el mismo orden, para que dos grupos no se bloqueen mutuamente
+                    for dev in grupo.devs:
+                        semaforo = self._semaforos.get(dev)
+                        if semaforo is not None:
+                            pila.enter_context(semaforo)
+                    resultado = self.funcion(trabajo)
+            except Exception as e:
+                logging.error(f"Error en la etapa 'copia' con {trabajo.file_path}: {e}")
+                self.on_error(e)
+                continue
+            duracion = time.perf_counter() - inicio
+            self.metrics.add_time("copia", duracion)
+            with self._stats_lock:
+                grupo.files += 1
+                grupo.bytes += trabajo.size or 0
+                grupo.seconds += duracion
+            self.salida.put(resultado)
+
+    def stats(self):
+        with self._stats_lock:
+            return self._stats()
+
+    def _stats(self):
+        return {
+            grupo.etiqueta: {
+                "workers": len(grupo.hilos),
+                "files": grupo.files,
+                "bytes": grupo.bytes,
+                "busy_seconds": round(grupo.seconds, 3),
+            }
+            for grupo in self._grupos.values()
+        }
@@ -0,0 +1,115 @@
+import atexit
+import inspect
+import logging
+import logging.handlers
+import queue
+import time
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+LOG_DATEFMT = '%d-%m-%Y %H:%M:%S'
+DEFAULT_LOG_LEVEL = "INFO"
+# Segundos entre registros de progreso agregados
+SUMMARY_INTERVAL = 5.0
+
+_listener = None
+
+
+def parse_level(level):
+    """Acepta un nivel numérico o su nombre ("debug", "INFO"...)."""
+    if isinstance(level, int):
+        return level
+    numero = logging.getLevelName(str(level).upper())
+    if not isinstance(numero, int):
+        raise ValueError(f"Nivel de logging desconocido: {level}")
+    return numero
+
+
+def setup_logging(log_file, level=DEFAULT_LOG_LEVEL, console=True):
+    """
+    Configura el logging una sola vez por proceso: los hilos sólo encolan los
+    registros y un QueueListener los escribe en el archivo y la consola. Las
+    llamadas siguientes sólo cambian el nivel, sin duplicar handlers.
+    """
+    global _listener
+    logging.getLogger().setLevel(parse_level(level))
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATEFMT)
+    handlers = [logging.FileHandler(log_file, encoding="utf-8")]
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    cola = queue.SimpleQueue()
+    logging.getLogger().addHandler(logging.handlers.QueueHandler(cola))
+    _listener = logging.handlers.QueueListener(cola, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Escribe los registros pendientes y detiene el hilo del listener."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, logging.handlers.QueueHandler):
+                root.removeHandler(handler)
+
+
+def progress_notifier(callback):
+    """
+    Adapta un progress_callback a la forma callback(bytes) que usan el organizador y
+    el ejecutor de planes. Los llamadores anteriores pasan una función sin argumentos
+    (un archivo más, sin tamaño): se siguen aceptando. La firma se mira una sola vez.
+    """
+    if callback is None:
+        return None
+    try:
+        firma = inspect.signature(callback)
+    except (TypeError, ValueError):
+        # Sin firma que inspeccionar (algunas funciones de C): se asume la forma actual
+        return callback
+    try:
+        firma.bind(0)
+    except TypeError:
+        return lambda size: callback()
+    return callback
+
+
+class PeriodicSummary:
+    """
+    Cuenta eventos por archivo y emite un único registro INFO cada `interval`
+    segundos en lugar de uno por archivo. No es thread-safe: se usa desde el
+    hilo que consume los resultados.
+    """
+    def __init__(self, title, interval=SUMMARY_INTERVAL):
+        self.title = title
+        self.interval = interval
+        self.counts = {}
+        self.total = 0
+        self.bytes = 0
+        self._inicio = self._ultimo = time.monotonic()
+
+    def add(self, kind, size=0):
+        self.counts[kind] = self.counts.get(kind, 0) + 1
+        self.total += 1
+        self.bytes += size
+        if time.monotonic() - self._ultimo >= self.interval:
+            self.emit()
+
+    def emit(self):
+        ahora = time.monotonic()
+        self._ultimo = ahora
+        transcurrido = max(ahora - self._inicio, 1e-6)
+        detalle = ", ".join(f"{n} {kind}" for kind, n in self.counts.items())
+        logging.info(
+            f"{self.title}: {self.total} archivos ({detalle}), {self.bytes / 1048576:.1f} MB; "
+            f"{self.total / transcurrido:.1f} archivos/s"
+        )
@@ -0,0 +1,90 @@
+import json
+import logging
+import os
+import re
+from datetime import datetime
+
+SIDECAR_EXTENSION = ".json"
+SUPPLEMENTAL_SUFFIX = "supplemental-metadata"
+# Takeout recorta el nombre del sidecar (sin ".json") a unos 46-47 caracteres
+TAKEOUT_NAME_LIMITS = (46, 47)
+
+# "IMG_0001.jpg.supplemental-metadata(1)", con el sufijo posiblemente recortado
+_SUPPLEMENTAL_PATTERN = re.compile(r"^(?P<media>.+\.[^.]+)\.(?P<sufijo>s[a-z-]*)(?P<n>\(\d+\))?$")
+# "IMG_0001(1).jpg": copia numerada cuyo sidecar es "IMG_0001.jpg(1).json"
+_NUMBERED_PATTERN = re.compile(r"^(?P<stem>.*)(?P<n>\(\d+\))(?P<ext>\.[^.]*)$")
+# "IMG_0001-editado.jpg" comparte el sidecar del original
+_EDITED_PATTERN = re.compile(
+    r"^(?P<stem>.*)-(edited|editado|bearbeitet|modifié|modificato)(?P<ext>\.[^.]*)$", re.IGNORECASE
+)
+
+
+class SidecarIndex:
+    """
+    Sidecars JSON de una carpeta de Takeout, indexados por el nombre del archivo
+    multimedia al que describen, contemplando los nombres recortados, las copias
+    numeradas "(1)" y los sufijos ".supplemental-metadata".
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self._claves = {}
+
+    def add(self, json_name):
+        base = json_name[:-len(SIDECAR_EXTENSION)]
+        self._claves.setdefault(base, json_name)
+        m = _SUPPLEMENTAL_PATTERN.match(base)
+        if m and SUPPLEMENTAL_SUFFIX.startswith(m.group("sufijo")):
+            self._claves.setdefault(m.group("media") + (m.group("n") or ""), json_name)
+
+    def _candidates(self, media_name):
+        nombres = [media_name]
+        m = _NUMBERED_PATTERN.match(media_name)
+        if m:
+            nombres.append(f"{m.group('stem')}{m.group('ext')}{m.group('n')}")
+        m = _EDITED_PATTERN.match(media_name)
+        if m:
+            nombres.append(f"{m.group('stem')}{m.group('ext')}")
+        for nombre in nombres:
+            yield nombre
+            for limite in TAKEOUT_NAME_LIMITS:
+                if len(nombre) > limite:
+                    yield nombre[:limite]
+        # Exportaciones antiguas: "IMG_0001.json" para "IMG_0001.jpg"
+        yield os.path.splitext(media_name)[0]
+
+    def find(self, media_name):
+        for clave in self._candidates(media_name):
+            json_name = self._claves.get(clave)
+            if json_name is not None:
+                return os.path.join(self.folder, json_name)
+        return None
+
+
+def read_sidecar(path):
+    """Devuelve (fecha, (lat, lon)) según photoTakenTime y geoData del sidecar."""
+    with open(path, encoding="utf-8") as f:
+        datos = json.load(f)
+
+    date = None
+    timestamp = (datos.get("photoTakenTime") or {}).get("timestamp")
+    if timestamp:
+        # Takeout guarda la hora en UTC; EXIF usa hora local, así que se convierte a local
+        date = datetime.fromtimestamp(int(timestamp))
+
+    coords = None
+    for clave in ("geoData", "geoDataExif"):
+        geo = datos.get(clave) or {}
+        lat, lon = geo.get("latitude"), geo.get("longitude")
+        # Takeout escribe 0.0, 0.0 cuando no hay ubicación
+        if lat is not None and lon is not None and (lat, lon) != (0.0, 0.0):
+            coords = (float(lat), float(lon))
+            break
+    return date, coords
+
+
+def safe_read_sidecar(path):
+    try:
+        return read_sidecar(path)
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logging.error(f"Error al leer sidecar {path}: {e}")
+        return None, None
@@ -0,0 +1,267 @@
+"""
+Detección de fotos casi idénticas (ediciones, copias recomprimidas de álbumes,
+ráfagas) en una biblioteca ya organizada. Cada imagen se reduce a un dHash de
+64 bits con un proceso por núcleo; los grupos a distancia de Hamming pequeña se
+buscan con un índice multi-bloque: si dos hashes difieren en como mucho t bits,
+al partirlos en t + 1 bloques al menos uno coincide, así que sólo se comparan
+(con XOR y popcount vectorizados) los hashes que comparten algún bloque.
+"""
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from escaner import IMAGE_EXTENSIONS, scan_media
+from manifiesto import MANIFEST_FILENAME, Manifest
+from transferencia import Transferer
+
+HASH_SIZE = 8
+# Bits distintos (de 64) hasta los que dos fotos se consideran la misma
+HAMMING_THRESHOLD = 6
+HASH_WORKERS = os.cpu_count() or 2
+# Celdas de la matriz de XOR calculada de una vez (8 bytes cada una): acota la memoria
+COMPARE_CELLS = 1 << 22
+NEAR_DUPLICATES_FOLDER = "Casi_Duplicados"
+REPORT_FILENAME = ".organizador_similares.json"
+ACTIONS = ("report", "move")
+
+
+def dhash(path, size=HASH_SIZE):
+    """
+    Hash de diferencias: la imagen en grises reducida a (size + 1) x size y un bit
+    por cada par de píxeles vecinos. Con draft() el JPEG se decodifica ya reducido
+    (escalado DCT), sin pasar por la resolución completa.
+    """
+    # PIL y NumPy se importan al usarlos: el organizador carga este módulo siempre
+    from PIL import Image, ImageOps
+    with Image.open(path) as img:
+        pixeles = img.width * img.height
+        img.draft("L", ((size + 1) * 8, size * 8))
+        img = ImageOps.exif_transpose(img).convert("L").resize((size + 1, size), Image.LANCZOS)
+        datos = img.tobytes()
+    valor = 0
+    for fila in range(size):
+        base = fila * (size + 1)
+        for col in range(size):
+            valor = (valor << 1) | (datos[base + col] > datos[base + col + 1])
+    return valor, pixeles
+
+
+def _hash_image(path):
+    # En un proceso aparte (sin el logging del principal): (hash, píxeles) o (None, error)
+    try:
+        return dhash(path)
+    except Exception as e:
+        return None, str(e)
+
+
+def _bloques(threshold, bits=HASH_SIZE * HASH_SIZE):
+    """(desplazamiento, máscara) de threshold + 1 bloques de bits casi iguales."""
+    n = min(threshold + 1, bits)
+    cortes = [bits * i // n for i in range(n + 1)]
+    return [(inicio, (1 << (fin - inicio)) - 1) for inicio, fin in zip(cortes, cortes[1:])]
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def _popcount(np, valores):
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(valores)
+    # NumPy < 2.0: tabla de 256 entradas sobre los 8 bytes de cada valor
+    tabla = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return tabla[valores.view(np.uint8)].reshape(valores.shape + (8,)).sum(axis=-1)
+
+
+class _Grupos:
+    """Union-find sobre las posiciones de los hashes distintos."""
+    def __init__(self, n):
+        self.padre = list(range(n))
+
+    def raiz(self, i):
+        while self.padre[i] != i:
+            self.padre[i] = self.padre[self.padre[i]]
+            i = self.padre[i]
+        return i
+
+    def unir(self, a, b):
+        a, b = self.raiz(a), self.raiz(b)
+        if a != b:
+            self.padre[max(a, b)] = min(a, b)
+
+
+def find_clusters(hashes, threshold=HAMMING_THRESHOLD, key=None):
+    """
+    Grupos (listas de índices) cuyo primer elemento es el central: el mejor según
+    key(índice) (por defecto, el menor índice) y todos los demás a distancia
+    <= threshold de él. Los vecinos encadenados (A-B, B-C...) forman un solo
+    componente, que en una ráfaga puede unir fotos muy distintas; por eso cada
+    componente se parte en estrellas alrededor de su mejor miembro restante.
+    """
+    # Los hashes repetidos (copias exactas, fotos en negro...) se comparan una sola vez
+    unicos = sorted(set(hashes))
+    posicion = {valor: i for i, valor in enumerate(unicos)}
+    grupos = _Grupos(len(unicos))
+    np = _numpy()
+    if np is None:
+        _unir_python(unicos, threshold, grupos)
+    else:
+        _unir_numpy(np, np.array(unicos, dtype=np.uint64), threshold, grupos)
+
+    por_raiz = {}
+    for i, valor in enumerate(hashes):
+        por_raiz.setdefault(grupos.raiz(posicion[valor]), []).append(i)
+    estrellas = []
+    for miembros in por_raiz.values():
+        if len(miembros) > 1:
+            estrellas += _split_star(miembros, hashes, threshold, key)
+    return estrellas
+
+
+def _split_star(miembros, hashes, threshold, key=None):
+    restantes = sorted(miembros, key=key)
+    estrellas = []
+    while len(restantes) > 1:
+        centro = hashes[restantes[0]]
+        cerca = [i for i in restantes if bin(centro ^ hashes[i]).count("1") <= threshold]
+        if len(cerca) > 1:
+            estrellas.append(cerca)
+        restantes = [i for i in restantes if bin(centro ^ hashes[i]).count("1") > threshold]
+    return estrellas
+
+
+def _unir_numpy(np, valores, threshold, grupos):
+    for desplazamiento, mascara in _bloques(threshold):
+        claves = (valores >> np.uint64(desplazamiento)) & np.uint64(mascara)
+        orden = np.argsort(claves, kind="stable")
+        ordenadas = claves[orden]
+        # Tramos de claves iguales con al menos dos hashes: son los únicos candidatos
+        inicios = np.flatnonzero(np.r_[True, ordenadas[1:] != ordenadas[:-1]])
+        finales = np.r_[inicios[1:], len(ordenadas)]
+        for inicio, fin in zip(inicios[finales - inicios > 1], finales[finales - inicios > 1]):
+            miembros = orden[inicio:fin]
+            bloque = valores[miembros]
+            paso = max(1, COMPARE_CELLS // len(miembros))
+            for desde in range(0, len(miembros), paso):
+                # Sólo el triángulo superior: cada fila contra ella misma y las siguientes
+                filas = bloque[desde:desde + paso]
+                distancias = _popcount(np, filas[:, None] ^ bloque[None, desde:])
+                for i, j in zip(*np.nonzero(distancias <= threshold)):
+                    if i < j:
+                        grupos.unir(int(miembros[desde + i]), int(miembros[desde + j]))
+
+
+def _unir_python(hashes, threshold, grupos):
+    # Sin NumPy: los mismos bloques con diccionarios y comparación uno a uno
+    for desplazamiento, mascara in _bloques(threshold):
+        cubetas = {}
+        for i, valor in enumerate(hashes):
+            cubetas.setdefault((valor >> desplazamiento) & mascara, []).append(i)
+        for miembros in cubetas.values():
+            for a in range(len(miembros)):
+                for b in range(a + 1, len(miembros)):
+                    if bin(hashes[miembros[a]] ^ hashes[miembros[b]]).count("1") <= threshold:
+                        grupos.unir(miembros[a], miembros[b])
+
+
+class NearDuplicateFinder:
+    """
+    Busca fotos casi idénticas en output_folder. Con action="report" sólo deja el
+    informe; con "move" conserva en su sitio la mejor copia de cada grupo (más
+    píxeles, luego más bytes) y mueve las demás a "Casi_Duplicados/<grupo>/",
+    actualizando el manifiesto para que no se vuelvan a organizar.
+    """
+    def __init__(self, output_folder, threshold=HAMMING_THRESHOLD, workers=HASH_WORKERS):
+        # Absoluta, como los destinos del manifiesto que se actualizan al mover
+        self.output_folder = os.path.abspath(output_folder)
+        self.threshold = threshold
+        self.workers = max(1, workers)
+
+    def _images(self):
+        imagenes = []
+        for entry in scan_media(self.output_folder):
+            primera = os.path.relpath(entry.path, self.output_folder).split(os.sep)[0]
+            # Ni las carpetas internas (".organizador_*") ni lo ya apartado
+            if primera.startswith(".") or primera == NEAR_DUPLICATES_FOLDER:
+                continue
+            if os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS:
+                imagenes.append(entry)
+        return imagenes
+
+    def run(self, action="report"):
+        if action not in ACTIONS:
+            raise ValueError(f"Acción desconocida: {action}")
+        inicio = time.perf_counter()
+        imagenes = self._images()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            resultados = list(pool.map(_hash_image, [e.path for e in imagenes], chunksize=64))
+        hashes = time.perf_counter() - inicio
+
+        validas = []
+        for entry, (h, dato) in zip(imagenes, resultados):
+            if h is None:
+                logging.debug("No se pudo calcular el hash de %s: %s", entry.path, dato)
+            else:
+                validas.append((entry, h, dato))
+        # La mejor copia: más resolución, luego menos compresión; a igualdad, la primera ruta
+        grupos = find_clusters(
+            [h for _, h, _ in validas], self.threshold,
+            key=lambda i: (-validas[i][2], -validas[i][0].size, validas[i][0].path)
+        )
+        informe = []
+        for indices in sorted(grupos, key=lambda g: validas[min(g)][0].path):
+            miembros = [validas[i] for i in indices]
+            informe.append({
+                "keep": miembros[0][0].path,
+                "others": [entry.path for entry, _, _ in miembros[1:]],
+                "max_distance": max(bin(miembros[0][1] ^ h).count("1") for _, h, _ in miembros[1:]),
+            })
+
+        if action == "move" and informe:
+            self._move(informe)
+        path = os.path.join(self.output_folder, REPORT_FILENAME)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"threshold": self.threshold, "action": action, "groups": informe}, f,
+                      indent=2, ensure_ascii=False)
+        logging.info(
+            f"Casi duplicados: {len(validas)} imágenes con hash ({hashes:.1f} s), {len(informe)} grupos, "
+            f"{sum(len(g['others']) for g in informe)} copias de más; informe en {path} "
+            f"({time.perf_counter() - inicio:.1f} s en total)."
+        )
+        return informe
+
+    def _move(self, informe):
+        # Cada copia apartada debe parecerse a la que se conserva, no sólo a otra del grupo
+        for grupo in informe:
+            if grupo["max_distance"] > self.threshold:
+                raise ValueError(
+                    f"Grupo de {grupo['keep']} con distancia {grupo['max_distance']} > {self.threshold}"
+                )
+        mover = Transferer("move")
+        base = os.path.join(self.output_folder, NEAR_DUPLICATES_FOLDER)
+        # Los grupos de ejecuciones anteriores se conservan: se numera a continuación
+        previos = [int(nombre) for nombre in os.listdir(base) if nombre.isdigit()] if os.path.isdir(base) else []
+        manifest = Manifest(os.path.join(self.output_folder, MANIFEST_FILENAME))
+        try:
+            for n, grupo in enumerate(informe, max(previos, default=0) + 1):
+                carpeta = os.path.join(base, f"{n:05d}")
+                os.makedirs(carpeta, exist_ok=True)
+                grupo["moved_to"] = []
+                for i, origen in enumerate(grupo["others"]):
+                    # Prefijo por posición: dos copias del grupo pueden llamarse igual
+                    destino = os.path.join(carpeta, f"{i:02d}_{os.path.basename(origen)}")
+                    mover.transfer(origen, destino)
+                    manifest.update_destination(origen, destino)
+                    grupo["moved_to"].append(destino)
+        finally:
+            manifest.close()
+
+
+def find_near_duplicates(output_folder, action="report", threshold=HAMMING_THRESHOLD, workers=HASH_WORKERS):
+    return NearDuplicateFinder(output_folder, threshold, workers).run(action)
@@ -0,0 +1,148 @@
+import errno
+import logging
+import os
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# copy: copia normal; move: mueve (rename si es el mismo dispositivo);
+# hardlink: enlace duro; reflink: clon copy-on-write (Btrfs, XFS...);
+# fastcopy: copia dentro del kernel con copy_file_range/sendfile
+TRANSFER_MODES = ("copy", "move", "hardlink", "reflink", "fastcopy")
+# ioctl FICLONE de Linux (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _reflink(src, dest):
+    if fcntl is None:
+        raise OSError(errno.EOPNOTSUPP, "reflink no disponible en este sistema")
+    with open(src, "rb") as origen, open(dest, "wb") as destino:
+        fcntl.ioctl(destino.fileno(), FICLONE, origen.fileno())
+
+
+def _link(src, dest):
+    try:
+        os.link(src, dest)
+    except FileExistsError:
+        # dest es una reserva vacía: se enlaza con otro nombre y se reemplaza de forma atómica
+        temporal = dest + ".enlace"
+        os.link(src, temporal)
+        os.replace(temporal, dest)
+
+
+def _buffered_copy(src, dest, buffer_size):
+    """Copia por bloques de buffer_size: en recursos de red, bloques grandes ahorran idas y vueltas."""
+    with open(src, "rb") as origen, open(dest, "wb") as destino:
+        shutil.copyfileobj(origen, destino, buffer_size)
+    shutil.copymode(src, dest)
+
+
+def _kernel_copy(src, dest, chunk_size=CHUNK_SIZE):
+    """Copia sin pasar los datos por espacio de usuario (copy_file_range o sendfile)."""
+    with open(src, "rb") as origen, open(dest, "wb") as destino:
+        restante = os.fstat(origen.fileno()).st_size
+        copiar = getattr(os, "copy_file_range", None)
+        while restante > 0:
+            if copiar is not None:
+                try:
+                    enviados = copiar(origen.fileno(), destino.fileno(), min(restante, chunk_size))
+                except OSError as e:
+                    if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EOPNOTSUPP, errno.EINVAL):
+                        raise
+                    copiar = None
+                    continue
+            else:
+                enviados = os.sendfile(destino.fileno(), origen.fileno(), None, min(restante, chunk_size))
+            if enviados == 0:
+                break
+            restante -= enviados
+    shutil.copymode(src, dest)
+
+
+class Transferer:
+    """
+    Lleva cada archivo a su destino según el modo elegido. Los modos que sólo
+    funcionan dentro de un mismo sistema de archivos (move por rename, hardlink,
+    reflink) se degradan a una copia cuando origen y destino están en dispositivos
+    distintos o el sistema de archivos no los soporta. buffer_size (bytes) fija el
+    bloque de las copias; sin él se usa el de shutil y CHUNK_SIZE en el kernel.
+    """
+    def __init__(self, mode="copy", buffer_size=None):
+        if mode not in TRANSFER_MODES:
+            raise ValueError(f"Modo de transferencia desconocido: {mode}")
+        self.mode = mode
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._dispositivos = {}
+        self.counts = {}
+
+    def _device(self, folder):
+        with self._lock:
+            dispositivo = self._dispositivos.get(folder)
+        if dispositivo is None:
+            dispositivo = os.stat(folder).st_dev
+            with self._lock:
+                self._dispositivos[folder] = dispositivo
+        return dispositivo
+
+    def same_device(self, src, dest):
+        return os.stat(src).st_dev == self._device(os.path.dirname(dest))
+
+    def transfer(self, src, dest):
+        """Transfiere src a dest y devuelve el modo que realmente se usó."""
+        usado = self._transfer(src, dest)
+        with self._lock:
+            self.counts[usado] = self.counts.get(usado, 0) + 1
+        return usado
+
+    def _copy(self, src, dest):
+        if self.buffer_size:
+            _buffered_copy(src, dest, self.buffer_size)
+        else:
+            shutil.copy(src, dest)
+
+    def _transfer(self, src, dest):
+        if self.mode == "copy":
+            self._copy(src, dest)
+            return "copy"
+
+        mismo_dispositivo = self.same_device(src, dest)
+        if self.mode == "move":
+            if mismo_dispositivo:
+                # replace: dest puede ser la reserva vacía de una ejecución por partes
+                os.replace(src, dest)
+                return "move"
+            self._copy(src, dest)
+            os.remove(src)
+            return "move-copy"
+
+        if mismo_dispositivo and self.mode == "hardlink":
+            try:
+                _link(src, dest)
+                return "hardlink"
+            except OSError as e:
+                logging.debug("No se pudo crear enlace duro %s: %s", dest, e)
+        elif mismo_dispositivo and self.mode == "reflink":
+            try:
+                _reflink(src, dest)
+                return "reflink"
+            except OSError as e:
+                logging.debug("No se pudo clonar %s: %s", src, e)
+                # Se vacía en su sitio, sin borrarlo: puede ser la reserva de una parte (ver
+                # _claim_destination en organizador.py) y otra parte podría tomar el nombre
+                if os.path.exists(dest):
+                    os.truncate(dest, 0)
+
+        if hasattr(os, "sendfile"):
+            try:
+                _kernel_copy(src, dest, self.buffer_size or CHUNK_SIZE)
+                return "fastcopy"
+            except OSError as e:
+                logging.debug("Copia en kernel no disponible para %s: %s", src, e)
+        self._copy(src, dest)
+        return "copy"
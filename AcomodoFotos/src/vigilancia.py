@@ -0,0 +1,273 @@
+"""
+Modo vigilancia: organiza los archivos a medida que llegan a la carpeta base.
+En Linux usa inotify (vía ctypes, sin dependencias); en otros sistemas, o si
+inotify no está disponible, recorre la carpeta periódicamente. Los cambios se
+agrupan en lotes tras un tiempo sin novedades y cada lote pasa por el mismo
+pipeline que organize(), con el manifiesto, la caché de ubicaciones y los
+índices de contenidos y de fechas ya cargados en memoria.
+"""
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from escaner import MEDIA_EXTENSIONS, scan_folder
+from sidecars import SIDECAR_EXTENSION
+
+# Segundos sin eventos nuevos antes de procesar el lote, y espera máxima de un lote
+DEBOUNCE_S = 2.0
+MAX_BATCH_WAIT_S = 30.0
+POLL_INTERVAL_S = 1.0
+# Cada cuánto se revisa si hay que detenerse mientras no llegan eventos
+_ESPERA_S = 0.5
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+# Un archivo está listo al cerrarse tras escribirlo o al llegar movido; las carpetas, al crearse
+_MASCARA = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENTO = struct.Struct("iIII")
+
+
+def _relevante(nombre):
+    nombre = nombre.lower()
+    return nombre.endswith(SIDECAR_EXTENSION) or os.path.splitext(nombre)[1] in MEDIA_EXTENSIONS
+
+
+class _Arbol:
+    def __init__(self, root, excluir):
+        self.root = root
+        self.excluir = excluir
+
+    def _excluida(self, carpeta):
+        return any(carpeta == e or carpeta.startswith(e + os.sep) for e in self.excluir)
+
+    def _recorrer(self, root, al_entrar=None):
+        """Archivos relevantes bajo root (os.DirEntry); al_entrar(carpeta) se llama en cada carpeta."""
+        pendientes = [root]
+        while pendientes:
+            carpeta = pendientes.pop()
+            if self._excluida(carpeta):
+                continue
+            if al_entrar is not None:
+                al_entrar(carpeta)
+            try:
+                with os.scandir(carpeta) as it:
+                    for entrada in it:
+                        if entrada.is_dir(follow_symlinks=False):
+                            pendientes.append(entrada.path)
+                        elif _relevante(entrada.name):
+                            yield entrada
+            except OSError as e:
+                logging.warning(f"No se pudo leer la carpeta {carpeta}: {e}")
+
+
+class _Inotify(_Arbol):
+    """Eventos de inotify con un watch por carpeta; las carpetas nuevas se vigilan al crearse."""
+    def __init__(self, root, excluir):
+        super().__init__(root, excluir)
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        self._carpetas = {}
+        try:
+            for _ in self._recorrer(root, self._vigilar):
+                pass
+        except OSError:
+            os.close(self._fd)
+            raise
+        logging.info(f"Vigilando {len(self._carpetas)} carpetas con inotify.")
+
+    def _vigilar(self, carpeta):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(carpeta), _MASCARA)
+        if wd < 0:
+            error = ctypes.get_errno()
+            if error == errno.ENOSPC:
+                raise OSError(error, "Límite de carpetas vigiladas alcanzado (fs.inotify.max_user_watches)")
+            logging.warning(f"No se puede vigilar {carpeta}: {os.strerror(error)}")
+            return
+        self._carpetas[wd] = carpeta
+
+    def poll(self, timeout):
+        """Archivos listos desde la última llamada, o None si se perdieron eventos."""
+        if not select.select([self._fd], [], [], timeout)[0]:
+            return set()
+        try:
+            datos = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        rutas = set()
+        desbordado = False
+        pos = 0
+        while pos < len(datos):
+            wd, mascara, _, largo = _EVENTO.unpack_from(datos, pos)
+            nombre = datos[pos + _EVENTO.size:pos + _EVENTO.size + largo].rstrip(b"\0")
+            pos += _EVENTO.size + largo
+            if mascara & _IN_Q_OVERFLOW:
+                desbordado = True
+                continue
+            if mascara & _IN_IGNORED:
+                self._carpetas.pop(wd, None)
+                continue
+            carpeta = self._carpetas.get(wd)
+            if carpeta is None or not nombre:
+                continue
+            ruta = os.path.join(carpeta, os.fsdecode(nombre))
+            if mascara & _IN_ISDIR:
+                # Lo escrito en la carpeta antes de vigilarla no genera eventos: se recoge ahora
+                rutas.update(entrada.path for entrada in self._recorrer(ruta, self._vigilar))
+            elif mascara & (_IN_CLOSE_WRITE | _IN_MOVED_TO) and _relevante(ruta):
+                rutas.add(ruta)
+        return None if desbordado else rutas
+
+    def close(self):
+        os.close(self._fd)
+
+
+class _Sondeo(_Arbol):
+    """Alternativa portable: recorre el árbol cada `interval` segundos y compara tamaño y mtime."""
+    def __init__(self, root, excluir, interval=POLL_INTERVAL_S):
+        super().__init__(root, excluir)
+        self.interval = interval
+        self._estado = self._instantanea()
+        self._siguiente = time.monotonic() + interval
+        logging.info(f"Vigilando {root} por sondeo cada {interval:g} s.")
+
+    def _instantanea(self):
+        estado = {}
+        for entrada in self._recorrer(self.root):
+            try:
+                st = entrada.stat()
+            except OSError:
+                continue
+            estado[entrada.path] = (st.st_size, st.st_mtime_ns)
+        return estado
+
+    def poll(self, timeout):
+        espera = self._siguiente - time.monotonic()
+        if espera > timeout:
+            time.sleep(timeout)
+            return set()
+        time.sleep(max(0.0, espera))
+        self._siguiente = time.monotonic() + self.interval
+        nuevo = self._instantanea()
+        cambiados = {ruta for ruta, estado in nuevo.items() if self._estado.get(ruta) != estado}
+        self._estado = nuevo
+        return cambiados
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, excluir=(), polling=False, interval=POLL_INTERVAL_S):
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return _Inotify(root, list(excluir))
+        except (OSError, AttributeError) as e:
+            logging.warning(f"inotify no disponible ({e}); se usa sondeo.")
+    return _Sondeo(root, list(excluir), interval)
+
+
+class Watcher:
+    """
+    Vigila organizer.base_folder hasta stop(). Cada archivo (o sidecar) nuevo o
+    modificado espera a que pasen `debounce` segundos sin más cambios, o como
+    mucho `max_wait`, y entonces el lote se organiza en una sola llamada, que
+    al terminar mueve lo que quedó en "Sin_Ubicacion" si su fecha ya tiene
+    ubicación. Un sidecar que llega después de su foto ya organizada no la mueve.
+    """
+    def __init__(self, organizer, debounce=DEBOUNCE_S, max_wait=MAX_BATCH_WAIT_S, polling=False,
+                 poll_interval=POLL_INTERVAL_S):
+        if organizer.archives:
+            raise ValueError("El modo vigilancia necesita una carpeta como origen, no un comprimido.")
+        self.organizer = organizer
+        self.debounce = debounce
+        self.max_wait = max_wait
+        self.polling = polling
+        self.poll_interval = poll_interval
+        self.batches = 0
+        self._detener = threading.Event()
+
+    def stop(self):
+        """Se puede llamar desde otro hilo: el lote en curso se cancela."""
+        self._detener.set()
+        self.organizer.cancel()
+
+    def run(self):
+        root = os.path.abspath(self.organizer.base_folder)
+        # El destino puede estar dentro del origen: lo que se copia allí no es una llegada nueva
+        vigilante = open_watcher(root, [os.path.abspath(self.organizer.output_folder)], self.polling,
+                                 self.poll_interval)
+        self.organizer.start_session()
+        try:
+            # Lo que llegó mientras no se vigilaba; el manifiesto salta lo que no cambió
+            self._organize(None)
+            pendientes = set()
+            todo = False
+            primero = ultimo = None
+            while not self._detener.is_set():
+                cambios = vigilante.poll(_ESPERA_S)
+                ahora = time.monotonic()
+                if cambios is None or cambios:
+                    if cambios is None:
+                        logging.warning("Se perdieron eventos de la carpeta vigilada; se revisará completa.")
+                        todo = True
+                    else:
+                        pendientes |= cambios
+                    primero = primero or ahora
+                    ultimo = ahora
+                if primero is not None and (ahora - ultimo >= self.debounce or ahora - primero >= self.max_wait):
+                    self._organize(None if todo else self._entries(pendientes))
+                    pendientes = set()
+                    todo = False
+                    primero = ultimo = None
+        except KeyboardInterrupt:
+            # El lote interrumpido deja hilos del pipeline escribiendo; end_session() cierra el manifiesto
+            self.stop()
+            self.organizer.stop_pipeline()
+            raise
+        finally:
+            vigilante.close()
+            self.organizer.end_session()
+
+    @staticmethod
+    def _entries(rutas):
+        """MediaEntry de los archivos del lote; un sidecar trae consigo la foto que describe."""
+        entries = []
+        for carpeta in sorted({os.path.dirname(ruta) for ruta in rutas}):
+            for entry in scan_folder(carpeta):
+                if entry.path in rutas or entry.sidecar in rutas:
+                    entries.append(entry)
+        return entries
+
+    def _organize(self, entries):
+        if entries is not None and not entries:
+            return
+        self.batches += 1
+        inicio = time.perf_counter()
+        try:
+            self.organizer.organize(entries)
+        except Exception as e:
+            if self._detener.is_set():
+                return
+            # Un lote fallido no detiene la vigilancia; sus archivos se reintentan si vuelven a cambiar
+            logging.error(f"Error al organizar el lote {self.batches}: {e}")
+            return
+        logging.info(
+            f"Lote {self.batches}: {'carpeta completa' if entries is None else f'{len(entries)} archivos'} "
+            f"en {time.perf_counter() - inicio:.2f} s."
+        )
+
+
+def watch(organizer, **options):
+    Watcher(organizer, **options).run()
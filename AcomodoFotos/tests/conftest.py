@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+# Los módulos del proyecto son archivos sueltos en src/ y se importan por su nombre
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+
+@pytest.fixture
+def crear_organizador(tmp_path, monkeypatch):
+    """
+    Fábrica de PhotoVideoOrganizer con FakeGeocoder, sin límite de ritmo y con la
+    caché de ubicaciones y el log en tmp_path; los organizadores se cierran al final.
+    """
+    import organizador
+    from geocodificacion import FakeGeocoder
+    monkeypatch.setattr(organizador, "LOG_FILE", str(tmp_path / "organizacion.log"))
+    monkeypatch.setattr(organizador, "DATABASE_FILE", str(tmp_path / "location_cache.db"))
+    creados = []
+
+    def crear(base_folder, output_folder, **kwargs):
+        kwargs.setdefault("geocoder", FakeGeocoder(latency=0))
+        kwargs.setdefault("geocode_rate", None)
+        kwargs.setdefault("log_level", "WARNING")
+        creado = organizador.PhotoVideoOrganizer("", str(base_folder), str(output_folder), **kwargs)
+        creados.append(creado)
+        return creado
+
+    yield crear
+    for creado in creados:
+        creado.close()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    """Takeout sintético pequeño (corpus_sintetico) en tmp_path/corpus; devuelve (carpeta, resumen)."""
+    from corpus_sintetico import generate
+    carpeta = tmp_path / "corpus"
+    resumen = generate(str(carpeta), files=40, photo_kb=2, video_kb=4, cities=4)
+    return carpeta, resumen
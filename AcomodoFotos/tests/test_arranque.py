@@ -0,0 +1,15 @@
+import pytest
+
+from benchmark import STARTUP_BUDGET_MS, startup_check
+
+
+def test_puntos_de_entrada_dentro_del_presupuesto():
+    resultados = startup_check()
+    assert set(resultados) == set(STARTUP_BUDGET_MS)
+    medidos = {modulo: r for modulo, r in resultados.items() if not r.get("skipped")}
+    if not medidos:
+        pytest.skip("Ningún punto de entrada se pudo importar aquí")
+    for modulo, r in medidos.items():
+        assert r["forbidden_loaded"] == [], f"{modulo} importa al arrancar: {r['forbidden_loaded']}"
+        assert r["median_ms"] <= r["budget_ms"], f"{modulo}: {r['median_ms']} ms (presupuesto {r['budget_ms']} ms)"
+        assert r["ok"]
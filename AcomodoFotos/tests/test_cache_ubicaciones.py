@@ -0,0 +1,57 @@
+from cache_ubicaciones import LocationCache
+
+
+def _cache(tmp_path, nombre="cache.db", radius_m=250):
+    return LocationCache(str(tmp_path / nombre), radius_m=radius_m)
+
+
+def test_coordenadas_de_una_celda_comparten_ancla(tmp_path):
+    cache = _cache(tmp_path)
+    try:
+        assert cache.anchor(-34.60001, -58.40001) == cache.anchor(-34.60002, -58.40002)
+        assert cache.anchor(-34.6, -58.4) != cache.anchor(-34.61, -58.4)
+    finally:
+        cache.close()
+
+
+def test_la_respuesta_no_depende_del_orden(tmp_path):
+    # Dos fotos de la misma celda, resueltas en órdenes distintos en dos cachés
+    a, b = (-34.60001, -58.40001), (-34.60002, -58.40002)
+    respuestas = []
+    for nombre, orden in (("uno.db", (a, b)), ("dos.db", (b, a))):
+        cache = _cache(tmp_path, nombre)
+        try:
+            for coords in orden:
+                if cache.get(*coords) is None:
+                    ancla = cache.anchor(*coords)
+                    cache.put(*ancla, f"Ciudad {ancla[0]}", "Estado")
+            respuestas.append({coords: cache.get(*coords) for coords in (a, b)})
+        finally:
+            cache.close()
+    assert respuestas[0] == respuestas[1]
+    assert respuestas[0][a] == respuestas[0][b]
+
+
+def test_ahorro_cuenta_solo_la_cercania(tmp_path):
+    cache = _cache(tmp_path)
+    try:
+        cache.put(1.0, 2.0, "Ciudad", "Estado")
+        cache.put(*cache.anchor(5.0, 5.0), "Otra", "Estado")
+        assert cache.get(1.0, 2.0) == ("Ciudad", "Estado")
+        assert cache.get(5.00001, 5.00001) == ("Otra", "Estado")
+        assert cache.get(40.0, 40.0) is None
+        stats = cache.stats()
+        assert (stats["exact_hits"], stats["nearby_hits"], stats["misses"]) == (1, 1, 1)
+        assert stats["api_calls_saved"] == 1
+    finally:
+        cache.close()
+
+
+def test_sin_radio_solo_responde_la_coordenada_exacta(tmp_path):
+    cache = _cache(tmp_path, radius_m=0)
+    try:
+        cache.put(1.0, 2.0, "Ciudad", "Estado")
+        assert cache.anchor(1.00001, 2.0) == (1.00001, 2.0)
+        assert cache.get(1.00001, 2.0) is None
+    finally:
+        cache.close()
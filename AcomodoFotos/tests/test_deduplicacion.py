@@ -0,0 +1,69 @@
+import os
+from datetime import datetime
+
+from corpus_sintetico import jpeg_bytes
+from deduplicacion import PARTIAL_CHUNK, ContentIndex
+
+FECHA = datetime(2021, 5, 1, 12, 0, 0)
+COORDS = (-34.6, -58.4)
+
+
+def _escribir(path, datos):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(datos)
+    return str(path)
+
+
+def _archivos(carpeta):
+    return sorted(
+        os.path.relpath(os.path.join(d, f), carpeta)
+        for d, _, fs in os.walk(carpeta) for f in fs if not f.startswith(".organizador")
+    )
+
+
+def test_indice_distingue_contenidos_del_mismo_tamano(tmp_path):
+    # Mismo principio y final: sólo el hash completo los separa
+    tamano = 3 * PARTIAL_CHUNK
+    base = bytearray(tamano)
+    otro = bytearray(base)
+    otro[tamano // 2] = 1
+    a = _escribir(tmp_path / "a", bytes(base))
+    copia = _escribir(tmp_path / "copia", bytes(base))
+    b = _escribir(tmp_path / "b", bytes(otro))
+
+    indice = ContentIndex()
+    assert indice.place(a, tamano, lambda: a) is None
+    assert indice.place(b, tamano, lambda: b) is None
+    assert indice.place(copia, tamano, lambda: copia) == a
+
+
+def test_indice_olvida_lo_que_ya_no_esta(tmp_path):
+    a = _escribir(tmp_path / "a", b"x" * 10)
+    copia = _escribir(tmp_path / "copia", b"x" * 10)
+    indice = ContentIndex()
+    indice.add(a, 10)
+    os.remove(a)
+    assert indice.place(copia, 10, lambda: copia) is None
+
+
+def test_copias_identicas_se_guardan_una_vez(crear_organizador, tmp_path):
+    origen = tmp_path / "origen"
+    foto = jpeg_bytes(FECHA, COORDS, b"misma")
+    _escribir(origen / "Photos from 2021" / "IMG_0001.jpg", foto)
+    _escribir(origen / "Album 1" / "IMG_0001.jpg", foto)
+    # Mismo nombre y fecha pero otro contenido
+    _escribir(origen / "Album 2" / "IMG_0001.jpg", jpeg_bytes(FECHA, COORDS, b"otra"))
+
+    organizer = crear_organizador(origen, tmp_path / "salida")
+    organizer.organize()
+    assert organizer.duplicate_files == 1
+    assert organizer.renamed_files == 1
+    archivos = _archivos(tmp_path / "salida")
+    assert sorted(os.path.basename(f) for f in archivos) == ["IMG_0001 (1).jpg", "IMG_0001.jpg"]
+
+    # Otra ejecución completa tampoco vuelve a copiarlos
+    otra = crear_organizador(origen, tmp_path / "salida", incremental=False)
+    otra.organize()
+    assert otra.duplicate_files == 3
+    assert _archivos(tmp_path / "salida") == archivos
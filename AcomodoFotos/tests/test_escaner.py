@@ -0,0 +1,50 @@
+import os
+
+from escaner import build_work_manifest, scan_folder, scan_media
+
+
+def _crear(raiz, *rutas):
+    for ruta in rutas:
+        path = os.path.join(raiz, ruta)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(ruta.encode())
+
+
+def test_escaneo_recursivo_con_sidecars(tmp_path):
+    _crear(
+        tmp_path,
+        "IMG_0001.JPG", "IMG_0001.JPG.json", "notas.txt",
+        os.path.join("Album", "VID_0001.mp4"), os.path.join("Album", "VID_0001.mp4.supplemental-metadata.json"),
+        os.path.join("Album", "Sub", "foto.png"),
+    )
+    entries = {os.path.relpath(e.path, tmp_path): e for e in scan_media(str(tmp_path))}
+    assert sorted(entries) == sorted([
+        "IMG_0001.JPG", os.path.join("Album", "VID_0001.mp4"), os.path.join("Album", "Sub", "foto.png")
+    ])
+
+    foto = entries["IMG_0001.JPG"]
+    st = os.stat(foto.path)
+    assert (foto.name, foto.size, foto.mtime_ns, foto.ino) == ("IMG_0001.JPG", st.st_size, st.st_mtime_ns, st.st_ino)
+    assert foto.source == foto.path
+    assert foto.sidecar == str(tmp_path / "IMG_0001.JPG.json")
+    assert entries[os.path.join("Album", "VID_0001.mp4")].sidecar == str(
+        tmp_path / "Album" / "VID_0001.mp4.supplemental-metadata.json"
+    )
+    assert entries[os.path.join("Album", "Sub", "foto.png")].sidecar is None
+
+
+def test_scan_folder_no_entra_en_subcarpetas(tmp_path):
+    _crear(tmp_path, "a.jpg", os.path.join("Album", "b.jpg"))
+    assert [e.name for e in scan_folder(str(tmp_path))] == ["a.jpg"]
+
+
+def test_carpeta_inexistente_no_falla(tmp_path):
+    assert build_work_manifest(str(tmp_path / "no_existe")) == []
+
+
+def test_el_manifiesto_de_trabajo_tiene_todo_el_corpus(corpus):
+    carpeta, resumen = corpus
+    entries = build_work_manifest(str(carpeta))
+    assert len(entries) == resumen["files"]
+    assert sum(e.sidecar is not None for e in entries) == resumen["sidecars"]
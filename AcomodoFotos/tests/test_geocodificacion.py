@@ -0,0 +1,119 @@
+import time
+
+import pytest
+
+import geocodificacion
+from geocodificacion import FakeGeocoder, TokenBucket, reverse_geocode
+from indice_fechas import SIN_UBICACION
+
+
+class _GeocoderConFallos(FakeGeocoder):
+    """FakeGeocoder que lanza `error` en las primeras `fallos` llamadas."""
+    def __init__(self, error, fallos):
+        super().__init__(latency=0)
+        self.error = error
+        self.fallos = fallos
+
+    def reverse_geocode(self, lat, lng, **kwargs):
+        if self.fallos:
+            self.fallos -= 1
+            with self._lock:
+                self.calls += 1
+            raise self.error
+        return super().reverse_geocode(lat, lng, **kwargs)
+
+
+@pytest.fixture
+def esperas(monkeypatch):
+    """Registra las esperas del backoff sin dormir; el jitter queda fijo en 1."""
+    registradas = []
+    monkeypatch.setattr(geocodificacion.time, "sleep", registradas.append)
+    monkeypatch.setattr(geocodificacion.random, "uniform", lambda a, b: 1.0)
+    return registradas
+
+
+def test_reintenta_errores_transitorios_con_backoff(esperas):
+    geocoder = _GeocoderConFallos(ConnectionError("sin red"), fallos=3)
+    resultado = reverse_geocode(geocoder, -34.6, -58.4)
+    assert resultado == FakeGeocoder(latency=0).reverse_geocode(-34.6, -58.4)
+    assert geocoder.calls == 4
+    base = geocodificacion.BACKOFF_BASE
+    assert esperas == [base, base * 2, base * 4]
+
+
+def test_abandona_tras_max_reintentos(esperas):
+    geocoder = _GeocoderConFallos(ConnectionError("sin red"), fallos=10)
+    with pytest.raises(ConnectionError):
+        reverse_geocode(geocoder, 0, 0, retries=2)
+    assert geocoder.calls == 3
+    assert len(esperas) == 2
+
+
+def test_no_reintenta_errores_definitivos(esperas):
+    opencage = pytest.importorskip("opencage.geocoder")
+    geocoder = _GeocoderConFallos(opencage.NotAuthorizedError(), fallos=1)
+    with pytest.raises(opencage.NotAuthorizedError):
+        reverse_geocode(geocoder, 0, 0)
+    assert geocoder.calls == 1
+    assert esperas == []
+
+
+def test_token_bucket_respeta_el_ritmo():
+    limitador = TokenBucket(rate=20)
+    inicio = time.monotonic()
+    for _ in range(11):
+        limitador.acquire()
+    # La primera petición sale de la ráfaga inicial; las otras 10 esperan 1/20 s cada una
+    assert time.monotonic() - inicio >= 10 / 20 * 0.95
+
+
+def test_token_bucket_con_limitador_en_reverse_geocode(esperas):
+    geocoder = FakeGeocoder(latency=0)
+    llamadas = []
+
+    class _Limitador:
+        def acquire(self):
+            llamadas.append(geocoder.calls)
+
+    for _ in range(3):
+        reverse_geocode(geocoder, 1.0, 2.0, rate_limiter=_Limitador())
+    # Se pide permiso antes de cada llamada al geocodificador
+    assert llamadas == [0, 1, 2]
+
+
+def _trabajos(coordenadas):
+    from organizador import _Trabajo
+    trabajos = []
+    for i, coords in enumerate(coordenadas):
+        trabajo = _Trabajo(f"/origen/IMG_{i:04d}.jpg", f"IMG_{i:04d}.jpg")
+        trabajo.coordinates = coords
+        trabajos.append(trabajo)
+    return trabajos
+
+
+def test_resolve_batch_una_consulta_por_celda(crear_organizador, tmp_path):
+    geocoder = FakeGeocoder(latency=0)
+    organizer = crear_organizador(tmp_path, tmp_path / "salida", geocoder=geocoder, resolve_mode="batch")
+    # Diez fotos a pocos metros (una celda de 250 m), dos repetidas y una sin coordenadas
+    coordenadas = [(-34.60001 + i * 1e-5, -58.40001) for i in range(10)]
+    trabajos = _trabajos(coordenadas + coordenadas[:2] + [None])
+    organizer._resolve_batch(trabajos)
+    assert geocoder.calls == 1
+    assert len({t.location_folder for t in trabajos[:-1]}) == 1
+    assert trabajos[-1].location_folder == SIN_UBICACION
+
+    # Una segunda tanda de la misma celda ya sale de la caché
+    organizer._resolve_batch(_trabajos([(-34.60005, -58.40005)]))
+    assert geocoder.calls == 1
+
+
+def test_resolve_batch_consulta_las_celdas_en_paralelo(crear_organizador, tmp_path):
+    geocoder = FakeGeocoder(latency=0.2)
+    organizer = crear_organizador(tmp_path, tmp_path / "salida", geocoder=geocoder, location_workers=8)
+    # Ocho ciudades distintas: ocho consultas que se solapan en vez de sumarse
+    trabajos = _trabajos([(-34.6 + i, -58.4) for i in range(8)])
+    inicio = time.monotonic()
+    organizer._resolve_batch(trabajos)
+    assert geocoder.calls == 8
+    assert time.monotonic() - inicio < 8 * 0.2 / 2
+    assert len({t.location_folder for t in trabajos}) == 8
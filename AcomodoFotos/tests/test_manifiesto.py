@@ -0,0 +1,59 @@
+import os
+from datetime import datetime
+
+from manifiesto import MANIFEST_FILENAME, Manifest
+
+FECHA = datetime(2021, 5, 1, 12, 0, 0)
+
+
+def test_el_manifiesto_persiste_entre_aperturas(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    manifest = Manifest(str(tmp_path / MANIFEST_FILENAME))
+    manifest.record("/origen/a.jpg", 10, 111, FECHA, (1.0, 2.0), "Ciudad, Estado", os.path.join("salida", "a.jpg"))
+    manifest.close()
+
+    manifest = Manifest(str(tmp_path / MANIFEST_FILENAME))
+    try:
+        assert manifest.is_unchanged("/origen/a.jpg", 10, 111)
+        assert not manifest.is_unchanged("/origen/a.jpg", 10, 222)
+        assert not manifest.is_unchanged("/origen/b.jpg", 10, 111)
+        # El destino se guarda absoluto aunque se registrara relativo
+        assert manifest.destination("/origen/a.jpg") == str(tmp_path / "salida" / "a.jpg")
+        assert [source for source, _, _ in manifest.located_files()] == ["/origen/a.jpg"]
+    finally:
+        manifest.close()
+
+
+def test_segunda_ejecucion_salta_lo_que_no_cambio(crear_organizador, corpus, tmp_path):
+    carpeta, resumen = corpus
+    destino = tmp_path / "salida"
+    primera = crear_organizador(carpeta, destino)
+    primera.organize()
+    assert primera.metrics.counters["copied"] > 0
+
+    segunda = crear_organizador(carpeta, destino)
+    segunda.organize()
+    assert segunda.skipped_files == resumen["files"]
+    assert segunda.metrics.counters["copied"] == 0
+
+    # Un archivo modificado vuelve a procesarse; los demás no
+    cambiado = next(
+        os.path.join(d, f) for d, _, fs in sorted(os.walk(carpeta)) for f in sorted(fs) if f.endswith(".jpg")
+    )
+    st = os.stat(cambiado)
+    os.utime(cambiado, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    tercera = crear_organizador(carpeta, destino)
+    tercera.organize()
+    assert tercera.skipped_files == resumen["files"] - 1
+    assert tercera.metrics.counters["files"] == resumen["files"]
+
+
+def test_sin_incremental_revisa_todo(crear_organizador, corpus, tmp_path):
+    carpeta, _ = corpus
+    destino = tmp_path / "salida"
+    crear_organizador(carpeta, destino).organize()
+    completa = crear_organizador(carpeta, destino, incremental=False)
+    completa.organize()
+    assert completa.skipped_files == 0
+    # Todo estaba ya en el destino: nada se copia otra vez
+    assert completa.metrics.counters["copied"] == 0
@@ -0,0 +1,40 @@
+import io
+import struct
+from datetime import datetime
+
+import pytest
+
+from corpus_sintetico import jpeg_bytes
+from metadatos import _parse_apple_date, read_exif_header
+
+FECHA = datetime(2021, 5, 1, 12, 0, 0)
+
+
+def test_lee_fecha_y_gps_del_app1():
+    date, coords = read_exif_header(io.BytesIO(jpeg_bytes(FECHA, (-34.6, -58.4), b"")))
+    assert date == FECHA
+    assert coords == pytest.approx((-34.6, -58.4), abs=1e-3)
+
+
+def test_gps_incompleto_conserva_la_fecha():
+    # GPSLatitude con dos racionales (grados y minutos) en vez de tres
+    datos = jpeg_bytes(FECHA, (-34.6, -58.4), b"")
+    entrada = struct.pack(">HHI", 2, 5, 3)
+    assert datos.count(entrada) == 1
+    datos = datos.replace(entrada, struct.pack(">HHI", 2, 5, 2))
+    assert read_exif_header(io.BytesIO(datos)) == (FECHA, None)
+
+
+@pytest.mark.parametrize("texto", [
+    "2021-05-01T12:00:00+0300",
+    "2021-05-01T12:00:00+03:00",
+    "2021-05-01T12:00:00.125-03:00",
+    "2021-05-01T12:00:00Z\x00",
+])
+def test_fecha_de_apple_con_cualquier_desplazamiento(texto):
+    # Hora local de la cámara: el desplazamiento se valida pero no se aplica
+    assert _parse_apple_date(texto) == FECHA
+
+
+def test_fecha_de_apple_invalida():
+    assert _parse_apple_date("mayo de 2021") is None
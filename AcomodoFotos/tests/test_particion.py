@@ -0,0 +1,57 @@
+import os
+from datetime import datetime
+
+from corpus_sintetico import jpeg_bytes
+from indice_fechas import SIN_UBICACION
+from particion import finalize, shard_of
+
+FECHA = datetime(2021, 5, 1, 12, 0, 0)
+
+
+def _archivos(carpeta):
+    return sorted(
+        os.path.relpath(os.path.join(d, f), carpeta)
+        for d, _, fs in os.walk(carpeta) for f in fs if not f.startswith(".organizador")
+    )
+
+
+def _foto(path, coords):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(jpeg_bytes(FECHA, coords, os.path.basename(path).encode()))
+
+
+def test_partes_y_finalizar_igual_que_una_ejecucion(crear_organizador, corpus, tmp_path):
+    carpeta, _ = corpus
+    crear_organizador(carpeta, tmp_path / "una").organize()
+    for i in range(1, 4):
+        crear_organizador(carpeta, tmp_path / "partes", shard=(i, 3)).organize()
+    finalize(str(tmp_path / "partes"))
+    assert _archivos(tmp_path / "partes") == _archivos(tmp_path / "una")
+    # finalize() une los manifiestos de las partes y los borra
+    assert not [f for f in os.listdir(tmp_path / "partes") if f.startswith(".organizador_manifest.parte")]
+
+
+def test_finalizar_con_otra_ruta_al_destino(crear_organizador, tmp_path, monkeypatch):
+    origen = tmp_path / "origen"
+    # Misma fecha, una con GPS y otra sin él, en partes distintas
+    con_gps = os.path.join("a", "IMG_0001.jpg")
+    sin_gps = next(
+        os.path.join("b", f"IMG_{n:04d}.jpg") for n in range(2, 100)
+        if shard_of(os.path.join("b", f"IMG_{n:04d}.jpg"), 2) != shard_of(con_gps, 2)
+    )
+    _foto(str(origen / con_gps), (-34.6, -58.4))
+    _foto(str(origen / sin_gps), None)
+
+    # Las partes se lanzan con el destino relativo; finalize() recibe la ruta absoluta
+    monkeypatch.chdir(tmp_path)
+    for i in (1, 2):
+        crear_organizador(origen, "salida", shard=(i, 2)).organize()
+    assert any(ruta.startswith(SIN_UBICACION + os.sep) for ruta in _archivos(tmp_path / "salida"))
+
+    conteos = finalize(str(tmp_path / "salida"))
+    assert conteos["relocated"] == 1
+    archivos = _archivos(tmp_path / "salida")
+    assert len(archivos) == 2
+    assert len({os.path.dirname(ruta) for ruta in archivos}) == 1
+    assert not any(ruta.startswith(SIN_UBICACION) for ruta in archivos)
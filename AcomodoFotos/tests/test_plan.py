@@ -0,0 +1,113 @@
+import os
+from datetime import datetime
+
+import organizador
+from corpus_sintetico import jpeg_bytes
+from plan import PARTIAL_SUFFIX, PlanExecutor, iter_plan
+
+FECHA = datetime(2021, 5, 1, 12, 0, 0)
+COORDS = (-34.6, -58.4)
+
+
+def _foto(path, relleno=b""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(jpeg_bytes(FECHA, COORDS, relleno))
+
+
+def _archivos(carpeta):
+    return {
+        os.path.relpath(os.path.join(d, f), carpeta): os.path.getsize(os.path.join(d, f))
+        for d, _, fs in os.walk(carpeta) for f in fs
+    }
+
+
+def _planificar(crear_organizador, origen, destino, plan_file):
+    organizer = crear_organizador(origen, destino)
+    organizer.plan(str(plan_file))
+    return {paso["source"]: paso for paso in iter_plan(str(plan_file))}
+
+
+def test_planificar_no_toca_un_destino_existente(crear_organizador, corpus, tmp_path):
+    carpeta, _ = corpus
+    destino = tmp_path / "salida"
+    crear_organizador(carpeta, destino).organize()
+    antes = _archivos(destino)
+    with open(destino / organizador.MANIFEST_FILENAME, "rb") as f:
+        manifiesto = f.read()
+
+    _foto(str(carpeta / "nuevas" / "IMG_9999.jpg"), b"nueva")
+    pasos = _planificar(crear_organizador, carpeta, destino, tmp_path / "plan.db")
+    # Sólo lo nuevo: lo ya organizado sale del manifiesto, leído sin modificarlo
+    assert [os.path.basename(p) for p in pasos] == ["IMG_9999.jpg"]
+    assert _archivos(destino) == antes
+    with open(destino / organizador.MANIFEST_FILENAME, "rb") as f:
+        assert f.read() == manifiesto
+
+
+def test_aplicar_y_reanudar(crear_organizador, corpus, tmp_path):
+    carpeta, _ = corpus
+    destino = tmp_path / "salida"
+    plan_file = tmp_path / "plan.db"
+    pasos = _planificar(crear_organizador, carpeta, destino, plan_file)
+    transferencias = sorted(p["destination"] for p in pasos.values() if p["action"] == "transfer")
+    assert not destino.exists()
+
+    # Interrumpido: uno ya copiado sin marcar y otro a medias en su ".parcial"
+    hecho, a_medias = transferencias[0], transferencias[1]
+    origen_hecho = next(p["source"] for p in pasos.values() if p["destination"] == hecho)
+    os.makedirs(os.path.dirname(hecho), exist_ok=True)
+    os.makedirs(os.path.dirname(a_medias), exist_ok=True)
+    with open(origen_hecho, "rb") as f, open(hecho, "wb") as g:
+        g.write(f.read())
+    with open(a_medias + PARTIAL_SUFFIX, "wb") as f:
+        f.write(b"a medias")
+
+    ejecutor = PlanExecutor(str(plan_file))
+    ejecutor.run()
+    assert ejecutor.counts["resumed"] == 1
+    assert ejecutor.counts["error"] == 0
+    assert all(os.path.exists(d) for d in transferencias)
+    assert not any(f.endswith(PARTIAL_SUFFIX) for f in _archivos(destino))
+    assert list(iter_plan(str(plan_file), "pending")) == []
+
+    # Volver a aplicarlo no hace nada
+    otra = PlanExecutor(str(plan_file))
+    otra.run()
+    assert sum(otra.counts.values()) == 0
+
+
+def test_destino_ocupado_se_renombra_y_los_duplicados_lo_siguen(crear_organizador, tmp_path):
+    origen = tmp_path / "origen"
+    _foto(str(origen / "Album 1" / "IMG_0001.jpg"))
+    _foto(str(origen / "Album 2" / "IMG_0001.jpg"))
+    plan_file = tmp_path / "plan.db"
+    pasos = _planificar(crear_organizador, origen, tmp_path / "salida", plan_file)
+    acciones = sorted(p["action"] for p in pasos.values())
+    assert acciones == ["duplicate", "transfer"]
+    planificado = next(p["destination"] for p in pasos.values() if p["action"] == "transfer")
+
+    # Otro archivo llega a ese nombre entre el plan y su aplicación
+    os.makedirs(os.path.dirname(planificado))
+    with open(planificado, "wb") as f:
+        f.write(b"ajeno")
+
+    ejecutor = PlanExecutor(str(plan_file))
+    ejecutor.run()
+    with open(planificado, "rb") as f:
+        assert f.read() == b"ajeno"
+    renombrado = os.path.join(os.path.dirname(planificado), "IMG_0001 (1).jpg")
+    destinos = {p["action"]: p["destination"] for p in iter_plan(str(plan_file))}
+    assert destinos == {"transfer": renombrado, "duplicate": renombrado}
+    assert ejecutor.counts["renamed"] == 1
+
+
+def test_cli_muestra_el_plan(crear_organizador, corpus, tmp_path, capsys):
+    carpeta, _ = corpus
+    plan_file = tmp_path / "plan.db"
+    pasos = _planificar(crear_organizador, carpeta, tmp_path / "salida", plan_file)
+    organizador.cli(["--log-file", str(tmp_path / "cli.log"), "plan", str(plan_file), "--dump"])
+    lineas = capsys.readouterr().out.splitlines()
+    assert len(lineas) == len(pasos)
+    accion, modo, origen, destino = lineas[0].split("\t")
+    assert pasos[origen]["destination"] == destino
@@ -0,0 +1,25 @@
+from registro import progress_notifier
+
+
+def test_callback_con_tamano_se_usa_tal_cual():
+    recibidos = []
+    agregar = recibidos.append
+    assert progress_notifier(agregar) is agregar
+    assert progress_notifier(None) is None
+
+
+def test_callback_sin_argumentos_sigue_funcionando():
+    llamadas = []
+    notificar = progress_notifier(lambda: llamadas.append(1))
+    notificar(1024)
+    notificar(0)
+    assert llamadas == [1, 1]
+
+
+def test_organizador_acepta_callback_sin_argumentos(crear_organizador, corpus, tmp_path):
+    carpeta, _ = corpus
+    llamadas = []
+    organizer = crear_organizador(carpeta, tmp_path / "salida", progress_callback=lambda: llamadas.append(1))
+    organizer.organize()
+    assert llamadas
+    assert len(llamadas) == organizer.last_report["counters"]["files"]
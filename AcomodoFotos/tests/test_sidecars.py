@@ -0,0 +1,74 @@
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from corpus_sintetico import jpeg_bytes, sidecar_json
+from indice_fechas import SIN_UBICACION, date_folder
+from sidecars import SidecarIndex, read_sidecar
+
+FECHA = datetime(2021, 5, 1, 12, 0, 0)
+NOMBRE_LARGO = "Screenshot_20210501-120000_Aplicacion_de_fotos.jpg"
+
+
+@pytest.mark.parametrize("media, sidecar", [
+    ("IMG_0001.jpg", "IMG_0001.jpg.json"),
+    ("IMG_0001.jpg", "IMG_0001.jpg.supplemental-metadata.json"),
+    # Sufijo recortado por el límite de Takeout
+    ("IMG_20210501_120000123.jpg", "IMG_20210501_120000123.jpg.supplemental-meta.json"),
+    ("IMG_0001(1).jpg", "IMG_0001.jpg(1).json"),
+    ("IMG_0001(1).jpg", "IMG_0001.jpg.supplemental-metadata(1).json"),
+    ("IMG_0001-editado.jpg", "IMG_0001.jpg.json"),
+    (NOMBRE_LARGO, NOMBRE_LARGO[:46] + ".json"),
+    ("IMG_0001.jpg", "IMG_0001.json"),
+])
+def test_indice_encuentra_el_sidecar(media, sidecar):
+    indice = SidecarIndex("carpeta")
+    indice.add(sidecar)
+    indice.add("OTRA_FOTO.jpg.json")
+    assert indice.find(media) == os.path.join("carpeta", sidecar)
+
+
+def test_indice_no_confunde_fotos_distintas():
+    indice = SidecarIndex("carpeta")
+    indice.add("IMG_0001.jpg.json")
+    assert indice.find("IMG_0002.jpg") is None
+    assert indice.find("IMG_0001(1).jpg") is None
+
+
+def test_leer_sidecar_ignora_la_ubicacion_vacia(tmp_path):
+    path = tmp_path / "IMG_0001.jpg.json"
+    path.write_text(
+        '{"photoTakenTime": {"timestamp": "1619870400"},'
+        ' "geoData": {"latitude": 0.0, "longitude": 0.0},'
+        ' "geoDataExif": {"latitude": -34.6, "longitude": -58.4}}',
+        encoding="utf-8"
+    )
+    fecha, coords = read_sidecar(str(path))
+    assert fecha == datetime.fromtimestamp(1619870400)
+    assert coords == (-34.6, -58.4)
+
+
+def test_el_sidecar_da_fecha_y_ubicacion_a_la_foto(crear_organizador, tmp_path):
+    carpeta = tmp_path / "origen" / "Photos from 2021"
+    carpeta.mkdir(parents=True)
+    # Sin EXIF: todo sale del sidecar
+    (carpeta / "IMG_0001.jpg").write_bytes(jpeg_bytes(None, None, b"sin exif"))
+    (carpeta / "IMG_0001.jpg.supplemental-metadata.json").write_text(
+        sidecar_json("IMG_0001.jpg", FECHA, (-34.6, -58.4)), encoding="utf-8"
+    )
+
+    organizer = crear_organizador(tmp_path / "origen", tmp_path / "salida")
+    organizer.organize()
+    assert organizer.sidecar_files == 1
+    archivos = [
+        os.path.relpath(os.path.join(d, f), tmp_path / "salida")
+        for d, _, fs in os.walk(tmp_path / "salida") for f in fs if not f.startswith(".organizador")
+    ]
+    assert len(archivos) == 1
+    ubicacion, carpeta_fecha, nombre = archivos[0].split(os.sep)
+    assert ubicacion != SIN_UBICACION
+    assert nombre == "IMG_0001.jpg"
+    # Takeout guarda la hora en UTC; se organiza por la hora local
+    local = datetime.fromtimestamp(FECHA.replace(tzinfo=timezone.utc).timestamp())
+    assert carpeta_fecha == date_folder(local)
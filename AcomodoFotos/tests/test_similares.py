@@ -0,0 +1,35 @@
+import random
+
+from similares import find_clusters
+
+
+def _distancia(a, b):
+    return bin(a ^ b).count("1")
+
+
+def test_cadena_no_une_fotos_lejanas():
+    # Ráfaga: cada foto difiere 4 bits de la anterior, pero los extremos difieren 44
+    hashes = [0]
+    for paso in range(11):
+        hashes.append(hashes[-1] ^ (0b1111 << (4 * paso)))
+    assert _distancia(hashes[0], hashes[-1]) == 44
+    grupos = find_clusters(hashes, threshold=6)
+    assert grupos
+    for grupo in grupos:
+        assert all(_distancia(hashes[grupo[0]], hashes[i]) <= 6 for i in grupo)
+    # Cada foto está como mucho en un grupo
+    todos = [i for grupo in grupos for i in grupo]
+    assert len(todos) == len(set(todos))
+
+
+def test_el_central_es_el_mejor_segun_key():
+    hashes = [0b0, 0b1, 0b11]
+    grupos = find_clusters(hashes, threshold=2, key=lambda i: -i)
+    assert grupos == [[2, 1, 0]]
+
+
+def test_hashes_lejanos_no_se_agrupan():
+    rng = random.Random(3)
+    hashes = [rng.getrandbits(64) for _ in range(200)]
+    grupos = find_clusters(hashes + [hashes[0] ^ 1], threshold=6)
+    assert grupos == [[0, 200]]
@@ -0,0 +1,17 @@
+import os
+
+from transferencia import Transferer
+
+
+def test_reflink_fallido_escribe_sobre_la_reserva(tmp_path):
+    origen = tmp_path / "origen.jpg"
+    origen.write_bytes(b"foto" * 1000)
+    # Reserva vacía como la de _claim_destination; el enlace duro deja ver si se reemplazó
+    destino = tmp_path / "destino.jpg"
+    destino.write_bytes(b"")
+    testigo = tmp_path / "testigo"
+    os.link(destino, testigo)
+
+    Transferer("reflink").transfer(str(origen), str(destino))
+    assert destino.read_bytes() == origen.read_bytes()
+    assert testigo.read_bytes() == origen.read_bytes()
@@ -0,0 +1,22 @@
+import threading
+
+import pytest
+
+from vigilancia import Watcher
+
+
+def test_ctrl_c_detiene_el_pipeline_antes_de_cerrar_el_manifiesto(crear_organizador, corpus, tmp_path):
+    carpeta, _ = corpus
+
+    def interrumpir():
+        raise KeyboardInterrupt
+
+    organizer = crear_organizador(carpeta, tmp_path / "salida", progress_callback=interrumpir)
+    watcher = Watcher(organizer, polling=True)
+    with pytest.raises(KeyboardInterrupt):
+        watcher.run()
+    vivos = [h.name for h in threading.enumerate() if h is not threading.main_thread() and h.is_alive()]
+    assert not [nombre for nombre in vivos if nombre.split("-")[0] in (
+        "escaneo", "metadatos", "ubicacion", "planificacion", "programador", "alimentador", "copia"
+    )]
+    assert organizer.manifest is None